@@ -7,6 +7,7 @@ from disnake.ext import commands, tasks
 
 from core.config import Config
 from core.database import db
+from core.economy import InsufficientPoints, debit, user_lock
 
 DEFAULT_AUTOREPLY_COST = 200
 DEFAULT_AUTOREPLY_DURATION = 2  # minutes
@@ -168,8 +169,8 @@ class AutoReply(commands.Cog):
                 )
                 return
 
-        # Get cost and duration from database
-        async with db.pool.acquire() as conn:
+        # Get cost and duration from database, charge under the user's lock
+        async with user_lock(inter.author.id), db.pool.acquire() as conn:
             cost_row = await conn.fetchval(
                 "SELECT value FROM bot_settings WHERE key = 'autoreply_cost'"
             )
@@ -182,25 +183,16 @@ class AutoReply(commands.Cog):
 
             # Mods/admins are free
             if not is_mod and not is_admin:
-                user_points = await conn.fetchval(
-                    "SELECT points FROM users WHERE user_id = $1", inter.author.id
-                )
-                user_points = user_points or 0
-
-                if user_points < cost:
+                # Deduct cost (guarded)
+                try:
+                    await debit(conn, inter.author.id, cost, "autoreply_cost")
+                except InsufficientPoints as e:
                     await inter.response.send_message(
-                        f"Not enough {Config.POINT_NAME}. Cost: {cost}, you have: {user_points}",
+                        f"Not enough {Config.POINT_NAME}. Cost: {cost}, you have: {e.balance or 0}",
                         ephemeral=True,
                     )
                     return
 
-                # Deduct cost
-                await conn.execute(
-                    "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                    cost,
-                    inter.author.id,
-                )
-
         # Set auto-reply with reply counter starting at 0
         expires_at = datetime.datetime.now() + datetime.timedelta(minutes=duration)
         key = (channel.id, user.id)
@@ -271,42 +263,37 @@ class AutoReply(commands.Cog):
             )
             return
 
-        _, _, creator_id, _ = self.active_replies[key]
+        reply = self.active_replies[key]
+        _, _, creator_id, _ = reply
 
         # Mods/admins can stop for free
         # Creator can stop for free
         # Anyone else pays 1.5x cost
+        # Claim the auto-reply before awaiting, so two paid stops can't both be charged
+        del self.active_replies[key]
+
         stop_cost = 0
         if not is_mod and not is_admin and inter.author.id != creator_id:
             # Get base cost and calculate 1.5x
-            async with db.pool.acquire() as conn:
+            async with user_lock(inter.author.id), db.pool.acquire() as conn:
                 cost_row = await conn.fetchval(
                     "SELECT value FROM bot_settings WHERE key = 'autoreply_cost'"
                 )
                 base_cost = int(cost_row) if cost_row else DEFAULT_AUTOREPLY_COST
                 stop_cost = int(base_cost * 1.5)
 
-                user_points = await conn.fetchval(
-                    "SELECT points FROM users WHERE user_id = $1", inter.author.id
-                )
-                user_points = user_points or 0
-
-                if user_points < stop_cost:
+                # Deduct cost (guarded)
+                try:
+                    await debit(conn, inter.author.id, stop_cost, "autoreply_stop_cost")
+                except InsufficientPoints as e:
+                    # Not stopped: put the auto-reply back (unless it was replaced meanwhile)
+                    self.active_replies.setdefault(key, reply)
                     await inter.response.send_message(
-                        f"Not enough {Config.POINT_NAME}. Stopping someone else's auto-reply costs {stop_cost} (1.5x). You have: {user_points}",
+                        f"Not enough {Config.POINT_NAME}. Stopping someone else's auto-reply costs {stop_cost} (1.5x). You have: {e.balance or 0}",
                         ephemeral=True,
                     )
                     return
 
-                # Deduct cost
-                await conn.execute(
-                    "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                    stop_cost,
-                    inter.author.id,
-                )
-
-        del self.active_replies[key]
-
         cost_text = f" (Cost: {stop_cost} {Config.POINT_NAME})" if stop_cost > 0 else ""
         await inter.response.send_message(
             f"✅ Auto-reply stopped for {user.mention} in {channel.mention}.{cost_text}",
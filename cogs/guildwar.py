@@ -8,6 +8,7 @@ from disnake.ext import commands
 
 from core.config import Config
 from core.database import db
+from core.economy import InsufficientPoints, bulk_payout, debit, ledger, user_lock
 
 
 class GuildWarView(disnake.ui.View):
@@ -95,6 +96,7 @@ class GuildWarView(disnake.ui.View):
                 refund_amount,
                 user_id,
             )
+            ledger.record(user_id, "guildwar_leave", refund_amount, ref_id=self.war_id)
 
             # Remove from war
             await conn.execute(
@@ -116,7 +118,8 @@ class GuildWarView(disnake.ui.View):
     ):
         user_id = interaction.author.id
 
-        async with db.pool.acquire() as conn:
+        # One join/switch at a time per user (double clicks queue here)
+        async with user_lock(user_id), db.pool.acquire() as conn:
             # Get war details
             war = await conn.fetchrow(
                 "SELECT * FROM guild_wars WHERE id = $1", self.war_id
@@ -134,19 +137,7 @@ class GuildWarView(disnake.ui.View):
                 )
                 return
 
-            # Check if user has enough points
-            user_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", user_id
-            )
-            user_points = user_points or 0
-
             entry_cost = war["entry_cost"]
-            if user_points < entry_cost:
-                await interaction.response.send_message(
-                    f"You need at least {entry_cost} {Config.POINT_NAME} to join this war.",
-                    ephemeral=True,
-                )
-                return
 
             # Check if already in a team
             existing = await conn.fetchrow(
@@ -173,21 +164,23 @@ class GuildWarView(disnake.ui.View):
                         f"You switched to Team {team_number}!", ephemeral=True
                     )
             else:
-                # Join team
-                await conn.execute(
-                    "INSERT INTO guild_war_members (war_id, user_id, team_number, points_bet) VALUES ($1, $2, $3, $4)",
-                    self.war_id,
-                    user_id,
-                    team_number,
-                    entry_cost,
-                )
-
-                # Deduct points
-                await conn.execute(
-                    "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                    entry_cost,
-                    user_id,
-                )
+                # Deduct points (guarded) and join team together
+                try:
+                    async with ledger.transaction(conn):
+                        await debit(conn, user_id, entry_cost, "guildwar_entry", ref_id=self.war_id)
+                        await conn.execute(
+                            "INSERT INTO guild_war_members (war_id, user_id, team_number, points_bet) VALUES ($1, $2, $3, $4)",
+                            self.war_id,
+                            user_id,
+                            team_number,
+                            entry_cost,
+                        )
+                except InsufficientPoints:
+                    await interaction.response.send_message(
+                        f"You need at least {entry_cost} {Config.POINT_NAME} to join this war.",
+                        ephemeral=True,
+                    )
+                    return
 
                 await interaction.response.send_message(
                     f"You joined Team {team_number}! (-{entry_cost} {Config.POINT_NAME})",
@@ -309,7 +302,8 @@ class PotionShopView(disnake.ui.View):
     ):
         user_id = interaction.author.id
 
-        async with db.pool.acquire() as conn:
+        # One purchase at a time per user (double clicks queue here)
+        async with user_lock(user_id), db.pool.acquire() as conn:
             # Get war details
             war = await conn.fetchrow(
                 "SELECT * FROM guild_wars WHERE id = $1", self.war_id
@@ -327,19 +321,6 @@ class PotionShopView(disnake.ui.View):
                 )
                 return
 
-            # Check user points
-            user_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", user_id
-            )
-            user_points = user_points or 0
-
-            if user_points < self.potion_cost:
-                await interaction.response.send_message(
-                    f"You need {self.potion_cost} {Config.POINT_NAME} to buy a potion.",
-                    ephemeral=True,
-                )
-                return
-
             # Check potion limit
             column_name = f"team{team}_{potion_type}_potions"
             current_potions = war[column_name] or 0
@@ -351,17 +332,31 @@ class PotionShopView(disnake.ui.View):
                 )
                 return
 
-            # Deduct points and add potion
-            await conn.execute(
-                "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                self.potion_cost,
-                user_id,
-            )
+            # Add potion (re-checking the cap and status) and deduct points together;
+            # a failed debit rolls the potion back
+            try:
+                async with ledger.transaction(conn):
+                    added = await conn.fetchval(
+                        f"""UPDATE guild_wars SET {column_name} = COALESCE({column_name}, 0) + 1
+                           WHERE id = $1 AND status = 'recruiting' AND COALESCE({column_name}, 0) < 3
+                           RETURNING {column_name}""",
+                        self.war_id,
+                    )
+                    if added is not None:
+                        await debit(conn, user_id, self.potion_cost, "guildwar_potion", ref_id=self.war_id)
+            except InsufficientPoints:
+                await interaction.response.send_message(
+                    f"You need {self.potion_cost} {Config.POINT_NAME} to buy a potion.",
+                    ephemeral=True,
+                )
+                return
 
-            await conn.execute(
-                f"UPDATE guild_wars SET {column_name} = {column_name} + 1 WHERE id = $1",
-                self.war_id,
-            )
+            if added is None:
+                await interaction.response.send_message(
+                    f"This team already has the maximum (3) {potion_type.upper()} potions!",
+                    ephemeral=True,
+                )
+                return
 
             team_name = war["team1_name"] if team == 1 else war["team2_name"]
             potion_emoji = "💚" if potion_type == "hp" else "⚔️"
@@ -693,6 +688,7 @@ class GuildWar(commands.Cog):
                     member["points_bet"],
                     member["user_id"],
                 )
+                ledger.record(member["user_id"], "guildwar_refund", member["points_bet"], ref_id=war_id)
 
             # Update war status
             await conn.execute(
@@ -1255,13 +1251,16 @@ class GuildWar(commands.Cog):
         if winner_count > 0:
             reward_per_winner = prize_pool // winner_count
 
-            async with db.pool.acquire() as conn:
-                for winner in winners:
-                    await conn.execute(
-                        "UPDATE users SET points = points + $1, profit_guildwar = profit_guildwar + $1 WHERE user_id = $2",
-                        reward_per_winner,
-                        winner["user_id"],
-                    )
+            async with db.pool.acquire() as conn, ledger.transaction(conn):
+                await bulk_payout(
+                    conn,
+                    [
+                        (winner["user_id"], reward_per_winner, "profit_guildwar")
+                        for winner in winners
+                    ],
+                    "guildwar_prize",
+                    war["id"],
+                )
 
                 # Update war status
                 await conn.execute(
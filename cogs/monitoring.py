@@ -2,6 +2,7 @@ import disnake
 from disnake.ext import commands
 
 from core.database import db
+from core.economy import ledger
 
 
 class Monitoring(commands.Cog):
@@ -12,29 +13,35 @@ class Monitoring(commands.Cog):
     async def on_member_join(self, member):
         print(f"{member} joined. Resetting data.")
         async with db.pool.acquire() as conn:
-            await conn.execute(
+            old_points = await conn.fetchval(
                 """
+                WITH old AS (SELECT points FROM users WHERE user_id = $1)
                 INSERT INTO users (user_id, points, daily_claimed_at)
                 VALUES ($1, 0, NULL)
                 ON CONFLICT (user_id)
                 DO UPDATE SET points = 0, daily_claimed_at = NULL
+                RETURNING (SELECT points FROM old)
             """,
                 member.id,
             )
+        ledger.record(member.id, "member_reset", -(old_points or 0))
 
     @commands.Cog.listener()
     async def on_member_remove(self, member):
         print(f"{member} left. Resetting data.")
         async with db.pool.acquire() as conn:
             # Reset points
-            await conn.execute(
+            old_points = await conn.fetchval(
                 """
+                WITH old AS (SELECT points FROM users WHERE user_id = $1)
                 UPDATE users
                 SET points = 0, daily_claimed_at = NULL
                 WHERE user_id = $1
+                RETURNING (SELECT points FROM old)
             """,
                 member.id,
             )
+            ledger.record(member.id, "member_reset", -(old_points or 0))
             # Remove any temp roles from database
             await conn.execute(
                 "DELETE FROM temp_roles WHERE user_id = $1",
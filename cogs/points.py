@@ -1,40 +1,92 @@
 import asyncio
+import contextlib
 import datetime
 import random
-import statistics
 from datetime import timedelta, timezone
 
 import disnake
 from disnake.ext import commands, tasks
 
-from core.config import Config
+from core.attack_history import attacks_against
+from core.attack_history import run_retention as run_history_retention
+from core.attacks import (
+    AttackRejected,
+    Combatant,
+    apply_attack_batch,
+    check_stakes,
+    load_combatants,
+    pierce_attack,
+    regular_attack,
+    resolve_attack,
+)
+from core.config import BANGKOK_TZ, Config
 from core.database import db
-
-# Bangkok timezone (UTC+7)
-BANGKOK_TZ = timezone(timedelta(hours=7))
+from core.economy import (
+    TAX_POOL_ID,
+    InsufficientPoints,
+    StashFull,
+    bulk_payout,
+    credit,
+    debit,
+    deposit_to_stash,
+    ledger,
+    lock_ledger_shared,
+    transfer,
+    user_lock,
+    user_locks,
+    withdraw_from_stash,
+)
+from core.embed_refresh import prediction_embeds
+from core.jobs import jobs
+from core.leaderboard import leaderboard
+from core.odds import odds_book
+from core.multiattack import HIT_KIND, create_run, load_pending_hits, lock_runs, save_runs
+from core.point_stats import MAX_BINS, point_stats
+from core.ranking import PAGE_SIZE, ranking
+from core.rewards import ChatRewardAccumulator
+from core.simulation import AMOUNT_TIERS, DEFAULT_TRIALS, simulate_attacks
+from core.state import StateStore
+from core.timers import timers
+from core.traps import TrapBook
+
+STASH_CAP = 10000  # Max points a user can keep in their stash
 
 
 class Points(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.attack_cooldowns = {}  # Track last attack time per user
-        self.beg_attack_cooldowns = {}  # Track last beg attack time per user
-        self.multiattack_cooldowns = {}  # Track last multiattack time per user
-        self.trap_cooldowns = {}  # Track last trap time per user
-        self.active_traps = {}  # {channel_id: {trigger_text: (creator_id, created_at)}}
-        self.dodge_cooldowns = {}  # Track last dodge time per user
-        self.active_dodges = {}  # {user_id: activated_at}
-        self.attack_last_use = {}  # Track last attack time to block dodge for 5 minutes
-        self.counter_cooldowns = {}  # Track last counter time per user
-        self.active_counters = {}  # {defender_id: {attacker_id: activated_at}}
-        self.shield_cooldowns = {}  # Track last shield time per user
-        self.active_shields = {}  # {user_id: activated_at}
+        # Cooldowns and buffs: {key: activated_at}, entries expire after the TTL (seconds)
+        self.state = StateStore()
+        self.attack_cooldowns = self.state.namespace("attack_cooldowns", 20)
+        self.beg_attack_cooldowns = self.state.namespace("beg_attack_cooldowns", 60)
+        self.multiattack_cooldowns = self.state.namespace("multiattack_cooldowns", 300)
+        self.trap_cooldowns = self.state.namespace("trap_cooldowns", 1800)
+        self.active_traps = TrapBook()  # Per-channel trigger automaton + expiry heap
+        self.active_dodges = self.state.namespace("active_dodges", 300, persist=True)
+        self.attack_last_use = self.state.namespace("attack_last_use", 300)  # Blocks dodge for 5 minutes
+        self.counter_cooldowns = self.state.namespace("counter_cooldowns", 1800, persist=True)
+        self.active_counters = self.state.namespace("active_counters", 900, persist=True)  # {(defender_id, attacker_id): activated_at}
+        self.shield_cooldowns = self.state.namespace("shield_cooldowns", 1800, persist=True)
+        self.active_shields = self.state.namespace("active_shields", 900, persist=True)
+        self.evict_state.start()
         self.active_airdrops = {}  # {message_id: {"claimed_users": set(), "count": 0}}
         self.lottery_entries = {}  # {number: [user_ids]} - current lottery entries
         self.lottery_user_count = {}  # {user_id: count} - track how many tickets each user bought (max 10)
+        self.chat_rewards = ChatRewardAccumulator()  # Write-behind chat point rewards
+        self.flush_chat_rewards.start()
+        self.trap_queue = asyncio.Queue()  # (message, triggered_trap) waiting to be resolved
+        self.trap_worker.start()
+        timers.register(HIT_KIND, self.run_multiattack_hits, source=load_pending_hits)
+        jobs.register("daily_tax", self.run_daily_engine)
+        jobs.register("stash_interest", self.run_interest_job)
+        jobs.register("attack_history_retention", run_history_retention)
+        self.daily_tax_task.start()
 
     def cog_unload(self):
         self.daily_tax_task.cancel()
+        self.flush_chat_rewards.cancel()
+        self.trap_worker.cancel()
+        self.evict_state.cancel()
 
     async def get_tax_pool(self, conn) -> int:
         """Get current tax pool amount"""
@@ -43,7 +95,7 @@ class Points(commands.Cog):
         )
         return int(tax) if tax else 0
 
-    async def add_to_tax_pool(self, conn, amount: int):
+    async def add_to_tax_pool(self, conn, amount: int, kind: str = "tax", counterparty_id: int = None):
         """Add amount to tax pool"""
         await conn.execute(
             """INSERT INTO bot_settings (key, value) VALUES ('tax_pool', $1::TEXT)
@@ -51,6 +103,7 @@ class Points(commands.Cog):
             str(amount),
             amount,
         )
+        ledger.record_in(conn, TAX_POOL_ID, kind, amount, counterparty_id)
 
     async def set_tax_pool(self, conn, amount: int):
         """Set tax pool to specific amount"""
@@ -84,6 +137,42 @@ class Points(commands.Cog):
             str(amount),
         )
 
+    def refresh_mod_ids(self):
+        """Rebuild the set of mod IDs kept off the leaderboard from the mod role's members"""
+        mod_ids = set()
+        for guild in self.bot.guilds:
+            mod_role = guild.get_role(Config.MOD_ROLE_ID)
+            if mod_role:
+                mod_ids.update(member.id for member in mod_role.members)
+        leaderboard.set_excluded(mod_ids)
+        ranking.set_excluded(mod_ids)
+
+    async def rebuild_rankings(self, conn):
+        """Reload the rank index from the users table"""
+        try:
+            users = await ranking.rebuild(conn)
+            print(f"Rank index rebuilt: {users} users in {ranking.last_rebuild_ms:.0f}ms")
+        except Exception as e:
+            print(f"Failed to rebuild rank index: {e}")
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.refresh_mod_ids()
+        # Wait for db connection
+        while db.pool is None:
+            await asyncio.sleep(1)
+        async with db.pool.acquire() as conn:
+            await self.rebuild_rankings(conn)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: disnake.Member, after: disnake.Member):
+        if before.roles != after.roles:
+            self.refresh_mod_ids()
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: disnake.Member):
+        self.refresh_mod_ids()
+
     @commands.Cog.listener()
     async def on_member_join(self, member: disnake.Member):
         """Give 1000 points to first-time members"""
@@ -109,6 +198,7 @@ class Points(commands.Cog):
 
                 # Send welcome message to bot channel only if actually inserted
                 if inserted == "INSERT 0 1":
+                    ledger.record(member.id, "welcome_bonus", 1000)
                     channel = self.bot.get_channel(Config.BOT_CHANNEL_ID)
                     if channel:
                         embed = disnake.Embed(
@@ -127,199 +217,234 @@ class Points(commands.Cog):
         if db.pool is None:
             return
 
-        # Check for traps first
-        await self.check_traps(message)
+        # Check for traps first (resolved in the background by trap_worker)
+        triggered_trap = self.match_trap(message)
+        if triggered_trap:
+            self.trap_queue.put_nowait((message, triggered_trap))
+
+        # Check if user has server booster role (chance for 1.5x bonus)
+        is_booster = False
+        if message.guild:
+            booster_role = message.guild.get_role(939954575216107540)
+            is_booster = bool(booster_role and booster_role in message.author.roles)
 
-        async with db.pool.acquire() as conn:
-            user = await conn.fetchrow(
-                "SELECT * FROM users WHERE user_id = $1", message.author.id
+        # Rules are applied in memory, results are written by flush_chat_rewards
+        is_new_user = await self.chat_rewards.record_message(
+            message.author.id, is_booster
+        )
+
+        if is_new_user:
+            # Send welcome message only if actually inserted
+            embed = disnake.Embed(
+                title="🎉 Welcome Bonus!",
+                description=f"Welcome {message.author.mention}! You received **1000 {Config.POINT_NAME}** as a welcome gift!",
+                color=disnake.Color.green(),
             )
-            now = datetime.datetime.now()
-            now_bangkok = datetime.datetime.now(BANGKOK_TZ)
-            today_bangkok = now_bangkok.date()
-
-            points_to_add = 100
-            is_first_of_day = False
-
-            if not user:
-                # First time user ever - give 1000 points welcome bonus
-                # This does NOT count towards daily earned cap
-                points_to_add = 1000
-                is_first_of_day = True
-                current_points = 0
-                daily_earned = 0  # Start at 0, bonus doesn't count
-                inserted = await conn.execute(
-                    "INSERT INTO users (user_id, points, last_message_at, daily_earned, daily_earned_date) VALUES ($1, $2, $3, 0, $4) ON CONFLICT (user_id) DO NOTHING",
-                    message.author.id,
-                    points_to_add,
-                    now,
-                    today_bangkok,
-                )
+            welcome_msg = await message.channel.send(embed=embed)
+            await timers.delete_message_later(welcome_msg, 10)
 
-                # Send welcome message only if actually inserted
-                if inserted == "INSERT 0 1":
-                    channel = message.channel
-                    embed = disnake.Embed(
-                        title="🎉 Welcome Bonus!",
-                        description=f"Welcome {message.author.mention}! You received **1000 {Config.POINT_NAME}** as a welcome gift!",
-                        color=disnake.Color.green(),
-                    )
-                    await channel.send(embed=embed, delete_after=10)
-            else:
-                last_msg = user["last_message_at"]
-                current_points = user["points"] or 0
+    @tasks.loop(seconds=5)
+    async def flush_chat_rewards(self):
+        """Write accumulated chat rewards to the database"""
+        await self.chat_rewards.flush()
 
-                # Get daily earned (reset if new day in Bangkok timezone)
-                daily_earned_date = user.get("daily_earned_date")
-                if daily_earned_date is None or daily_earned_date < today_bangkok:
-                    daily_earned = 0
-                else:
-                    daily_earned = user.get("daily_earned") or 0
+    @flush_chat_rewards.before_loop
+    async def before_flush_chat_rewards(self):
+        await self.bot.wait_until_ready()
 
-                # Check if first message of the day (Bangkok time)
-                if last_msg is None:
-                    points_to_add = 1000
-                    is_first_of_day = True
-                    daily_earned = 0
-                else:
-                    # Convert last_msg to Bangkok timezone to check date
-                    if last_msg.tzinfo is None:
-                        last_msg_bangkok = last_msg.replace(
-                            tzinfo=timezone.utc
-                        ).astimezone(BANGKOK_TZ)
-                    else:
-                        last_msg_bangkok = last_msg.astimezone(BANGKOK_TZ)
-
-                    if last_msg_bangkok.date() < today_bangkok:
-                        points_to_add = 1000
-                        is_first_of_day = True
-                        daily_earned = 0  # Reset daily earned for new day
-                    else:
-                        # Regular message, check cooldown (15 seconds)
-                        if (now - last_msg.replace(tzinfo=None)).total_seconds() < 15:
-                            return
-                        points_to_add = 100
-
-                # Check daily cap (2500 points per day from chatting)
-                if daily_earned >= 2500:
-                    return  # Already hit daily cap
-
-                # Limit points_to_add to not exceed cap
-                if daily_earned + points_to_add > 2500:
-                    points_to_add = 2500 - daily_earned
-
-                if points_to_add <= 0:
-                    return
+    @tasks.loop(minutes=1)
+    async def evict_state(self):
+        """Drop expired cooldowns/buffs even when nothing new is being set"""
+        self.state.evict_expired()
 
-                # Save original points before applying luck modifiers (for daily tracking)
-                points_for_daily_cap = points_to_add
-
-                # Apply critical/bad luck based on current points
-                if current_points < 500:
-                    # 20% chance for critical (2x points)
-                    if random.random() < 0.20:
-                        points_to_add *= 2
-                elif current_points >= 1500:
-                    # 50% chance for bad luck (0 points) - rich tax
-                    if random.random() < 0.50:
-                        points_to_add = 0
-                # 500-1500 points: no special effect
-
-                if points_to_add <= 0:
-                    # Update last_message_at and daily_earned even if 0 points (bad luck still counts toward cap)
-                    await conn.execute(
-                        "UPDATE users SET last_message_at = $1, daily_earned = $2, daily_earned_date = $3 WHERE user_id = $4",
-                        now,
-                        daily_earned + points_for_daily_cap,
-                        today_bangkok,
-                        message.author.id,
-                    )
-                    return
+    @evict_state.before_loop
+    async def before_evict_state(self):
+        await self.bot.wait_until_ready()
+        # Wait for db connection
+        while db.pool is None:
+            await asyncio.sleep(1)
 
-                # Check if user has server booster role for 1.5x bonus
-                if message.guild:
-                    booster_role = message.guild.get_role(939954575216107540)
-                    if booster_role and booster_role in message.author.roles:
-                        # 50% chance for extra 0.5x (so either 1x or 1.5x total)
-                        if random.random() < 0.50:
-                            bonus = int(points_to_add * 0.5)
-                            points_to_add += bonus
+        # Bring back shields, dodges and counters from before the restart
+        try:
+            async with db.pool.acquire() as conn:
+                restored = await self.state.restore(conn)
+            print(f"Restored {restored} cooldown/buff entries")
+        except Exception as e:
+            print(f"Failed to restore cooldown/buff state: {e}")
 
-                await conn.execute(
-                    "UPDATE users SET points = points + $1, last_message_at = $2, daily_earned = $3, daily_earned_date = $4 WHERE user_id = $5",
-                    points_to_add,
-                    now,
-                    daily_earned + points_for_daily_cap,
-                    today_bangkok,
-                    message.author.id,
-                )
+    async def flush_buffers(self):
+        """Called by the bot on shutdown to write anything still in memory"""
+        self.flush_chat_rewards.cancel()
+        await self.chat_rewards.flush()
 
-    async def check_traps(self, message):
-        """Check if message triggers any active traps"""
-        if db.pool is None:
-            return
+        # Keep shields, dodges and counters across the restart
+        self.evict_state.cancel()
+        async with db.pool.acquire() as conn:
+            saved = await self.state.snapshot(conn)
+        print(f"Saved {saved} cooldown/buff entries")
+
+        # Resolve traps that fired but weren't processed yet
+        self.trap_worker.cancel()
+        while not self.trap_queue.empty():
+            message, triggered_trap = self.trap_queue.get_nowait()
+            try:
+                await self.resolve_trap(message, triggered_trap)
+            except Exception as e:
+                print(f"Error resolving trap on shutdown: {e}")
 
-        if message.channel.id not in self.active_traps:
+    @commands.slash_command(description="[MOD] Show internal performance counters")
+    async def perfstats(self, inter: disnake.ApplicationCommandInteraction):
+        # Check if user has mod role
+        mod_role = inter.guild.get_role(Config.MOD_ROLE_ID)
+        if not mod_role or mod_role not in inter.author.roles:
+            await inter.response.send_message(
+                "❌ This command is only available to moderators.", ephemeral=True
+            )
             return
 
-        channel_traps = self.active_traps[message.channel.id]
-        message_lower = message.content.lower()
-        triggered_trap = None
-        now = datetime.datetime.now()
+        embed = disnake.Embed(
+            title="📈 Performance Counters", color=disnake.Color.blurple()
+        )
 
-        # Clean up expired traps (15 minutes)
-        expired_traps = []
-        for trigger_text, trap_data in list(channel_traps.items()):
-            # Handle both old format (2-tuple) and new format (3-tuple with cost)
-            if len(trap_data) == 2:
-                creator_id, created_at = trap_data
-            else:
-                creator_id, created_at, _ = trap_data
+        rewards = self.chat_rewards.stats()
+        embed.add_field(
+            name="Chat Rewards",
+            value=(
+                f"Messages: {rewards['messages_seen']:,} seen, {rewards['messages_filtered']:,} filtered, {rewards['messages_rewarded']:,} rewarded\n"
+                f"Pending users: {rewards['pending_users']:,}\n"
+                f"Flushes: {rewards['flush_count']:,} ({rewards['flush_failures']} failed)\n"
+                f"Batch size: last {rewards['last_batch_size']}, avg {rewards['avg_batch_size']:.1f}, max {rewards['max_batch_size']}\n"
+                f"Flush latency: last {rewards['last_flush_ms']:.1f}ms, avg {rewards['avg_flush_ms']:.1f}ms, max {rewards['max_flush_ms']:.1f}ms"
+            ),
+            inline=False,
+        )
 
-            if (now - created_at).total_seconds() > 900:  # 15 minutes
-                expired_traps.append(trigger_text)
+        cache = self.chat_rewards.cache.stats()
+        embed.add_field(
+            name="Chat State Cache",
+            value=(
+                f"Entries: {cache['size']:,} / {cache['max_size']:,}\n"
+                f"Hits: {cache['hits']:,}, misses: {cache['misses']:,} ({cache['hit_rate']:.1%} hit rate)\n"
+                f"Evicted: {cache['evictions']:,}, expired: {cache['expirations']:,}\n"
+                f"Memory: {cache['memory_bytes'] / 1024:,.1f} KB ({cache['bytes_per_entry']:.0f} B/entry)"
+            ),
+            inline=False,
+        )
 
-        for trigger_text in expired_traps:
-            del channel_traps[trigger_text]
+        state_lines = [
+            f"{name}: {ns['entries']:,} ({ns['memory_bytes'] / 1024:,.1f} KB, {ns['expired']:,} expired)"
+            for name, ns in self.state.stats().items()
+        ]
+        embed.add_field(
+            name="Cooldowns & Buffs", value="\n".join(state_lines), inline=False
+        )
 
-        if not channel_traps:
-            del self.active_traps[message.channel.id]
-            return
+        book = ledger.stats()
+        embed.add_field(
+            name="Ledger",
+            value=(
+                f"Recorded: {book['recorded']:,}, buffered: {book['buffered']:,}\n"
+                f"Flushes: {book['flush_count']:,} ({book['flush_failures']} failed), {book['rows_flushed']:,} rows\n"
+                f"Flush latency: last {book['last_flush_ms']:.1f}ms, max {book['max_flush_ms']:.1f}ms\n"
+                f"Rollups: {book['rollup_count']:,} ({book['rollup_failures']} failed), last {book['last_rollup_rows']:,} rows in {book['last_rollup_ms']:.0f}ms"
+            ),
+            inline=False,
+        )
 
-        for trigger_text, trap_data in list(channel_traps.items()):
-            # Handle both old format (2-tuple) and new format (3-tuple with cost)
-            if len(trap_data) == 2:
-                creator_id, created_at = trap_data
-                trap_cost = 40  # Default cost for old traps
-            else:
-                creator_id, created_at, trap_cost = trap_data
+        ranks = ranking.stats()
+        embed.add_field(
+            name="Rank Index",
+            value=(
+                f"Ranked: {ranks['ranked']:,} of {ranks['users']:,} users\n"
+                f"Movements applied: {ranks['movements']:,}, corrections: {ranks['corrections']:,}\n"
+                f"Rebuilds: {ranks['rebuilds']:,}, last {ranks['last_rebuild_ms']:.0f}ms"
+            ),
+            inline=False,
+        )
 
-            if trigger_text.lower() in message_lower:
-                # Don't trigger on trap creator
-                if message.author.id == creator_id:
-                    continue
-                triggered_trap = (trigger_text, creator_id, trap_cost)
-                break
+        edits = prediction_embeds.stats()
+        embed.add_field(
+            name="Prediction Embeds",
+            value=(
+                f"Edits: {edits['performed']:,} performed, {edits['skipped']:,} skipped ({edits['skip_rate']:.1%} skipped)\n"
+                f"Coalesced bet refreshes: {edits['coalesced']:,}, failed: {edits['failures']:,}\n"
+                f"Tracked: {edits['tracked']}, pending: {edits['pending']}\n"
+                f"Odds book: {len(odds_book.predictions)} active, {odds_book.bets_applied:,} bets applied"
+            ),
+            inline=False,
+        )
+
+        board = leaderboard.stats()
+        embed.add_field(
+            name="Leaderboard Cache",
+            value=(
+                f"Hits: {board['hits']:,}, misses: {board['misses']:,} ({board['hit_rate']:.1%} hit rate)\n"
+                f"Invalidations: {board['invalidations']:,}, excluded mods: {board['excluded']}"
+            ),
+            inline=False,
+        )
+
+        for job_name, job in jobs.metrics().items():
+            embed.add_field(
+                name=f"Job: {job_name}",
+                value=(
+                    f"Runs: {job['runs']} ({job['skipped']} skipped, {job['failures']} failed)\n"
+                    f"Duration: last {job['last_ms']:.0f}ms, avg {job['avg_ms']:.0f}ms, max {job['max_ms']:.0f}ms\n"
+                    f"Rows: last {job['last_rows']:,}, total {job['total_rows']:,}"
+                ),
+                inline=False,
+            )
+
+        await inter.response.send_message(embed=embed, ephemeral=True)
+
+    def match_trap(self, message):
+        """
+        Find and claim the trap a message triggers (synchronous, no I/O)
 
+        The trap is removed immediately so it can't fire twice; the returned
+        (trigger_text, creator_id, trap_cost) is resolved by trap_worker.
+        """
+        # Drop traps past their 15 minute deadline
+        self.active_traps.expire(datetime.datetime.now())
+
+        triggered_trap = self.active_traps.match(
+            message.channel.id, message.content, message.author.id
+        )
         if triggered_trap:
-            trigger_text, creator_id, trap_cost = triggered_trap
-            loss_amount = trap_cost * 5  # Victim loses 5x the cost
-            gain_amount = trap_cost * 5  # Creator gains 5x the cost
+            # Remove the trap after triggered
+            self.active_traps.remove(message.channel.id, triggered_trap[0])
 
-            async with db.pool.acquire() as conn:
-                # Check if victim has enough points
+        return triggered_trap
+
+    @tasks.loop(seconds=0)
+    async def trap_worker(self):
+        """Resolve triggered traps in the order they fired"""
+        message, triggered_trap = await self.trap_queue.get()
+        try:
+            await self.resolve_trap(message, triggered_trap)
+        except Exception as e:
+            print(f"Error resolving trap in channel {message.channel.id}: {e}")
+
+    @trap_worker.before_loop
+    async def before_trap_worker(self):
+        await self.bot.wait_until_ready()
+
+    async def resolve_trap(self, message, triggered_trap):
+        """Move the points (or add the penalty role) and announce the trap"""
+        trigger_text, creator_id, trap_cost = triggered_trap
+        loss_amount = trap_cost * 5  # Victim loses 5x the cost
+        gain_amount = trap_cost * 5  # Creator gains 5x the cost
+
+        async with db.pool.acquire() as conn:
+            async with conn.transaction():
+                # Steal 5x trap_cost from victim only if they have enough points
                 victim_points = await conn.fetchval(
-                    "SELECT points FROM users WHERE user_id = $1", message.author.id
+                    "UPDATE users SET points = points - $1 WHERE user_id = $2 AND points >= $1 RETURNING points",
+                    loss_amount,
+                    message.author.id,
                 )
-                victim_points = victim_points or 0
-
-                if victim_points >= loss_amount:
-                    # Steal 5x trap_cost from victim and give 5x to trap creator with profit tracking
-                    await conn.execute(
-                        "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                        loss_amount,
-                        message.author.id,
-                    )
+                if victim_points is not None:
+                    # Give 5x to trap creator with profit tracking
                     await conn.execute(
                         """INSERT INTO users (user_id, points, profit_trap) VALUES ($1, $2, $2)
                            ON CONFLICT (user_id) DO UPDATE SET points = users.points + $2, profit_trap = users.profit_trap + $2""",
@@ -327,57 +452,37 @@ class Points(commands.Cog):
                         gain_amount,
                     )
 
-                    # Remove the trap after triggered
-                    del channel_traps[trigger_text]
-                    if not channel_traps:
-                        del self.active_traps[message.channel.id]
+        # Committed: record the movement
+        if victim_points is not None:
+            ledger.record(message.author.id, "trap", -loss_amount, creator_id)
+            ledger.record(creator_id, "trap", gain_amount, message.author.id, profit_column="profit_trap")
 
-                    # Notify about trap - delete after 10 seconds
-                    creator = message.guild.get_member(creator_id)
-                    creator_name = (
-                        creator.display_name if creator else f"User {creator_id}"
-                    )
-                    trap_msg = await message.reply(
-                        f"💣 **TRAP ACTIVATED!** {message.author.mention} triggered a trap set by **{creator_name}** and lost {loss_amount} {Config.POINT_NAME}! {creator_name} gained {gain_amount} {Config.POINT_NAME}!"
-                    )
-                    await asyncio.sleep(10)
-                    await trap_msg.delete()
-                else:
-                    # Victim doesn't have enough points - add role for 1440 minutes
-                    penalty_role = message.guild.get_role(1456114946764181557)
-                    if penalty_role:
-                        member = message.guild.get_member(message.author.id)
-                        if member and penalty_role not in member.roles:
-                            await member.add_roles(penalty_role)
-
-                            # Schedule role removal after 1440 minutes (24 hours)
-                            async def remove_role_later():
-                                await asyncio.sleep(
-                                    1440 * 60
-                                )  # 1440 minutes in seconds
-                                try:
-                                    if penalty_role in member.roles:
-                                        await member.remove_roles(penalty_role)
-                                except:
-                                    pass
-
-                            asyncio.create_task(remove_role_later())
-
-                    # Remove the trap after triggered
-                    del channel_traps[trigger_text]
-                    if not channel_traps:
-                        del self.active_traps[message.channel.id]
-
-                    # Notify about trap and penalty - delete after 10 seconds
-                    creator = message.guild.get_member(creator_id)
-                    creator_name = (
-                        creator.display_name if creator else f"User {creator_id}"
-                    )
-                    trap_msg = await message.reply(
-                        f"💣 **TRAP ACTIVATED!** {message.author.mention} triggered a trap set by **{creator_name}** but doesn't have enough points! Penalty role added for 24 hours!"
-                    )
-                    await asyncio.sleep(10)
-                    await trap_msg.delete()
+        creator = message.guild.get_member(creator_id)
+        creator_name = creator.display_name if creator else f"User {creator_id}"
+
+        if victim_points is not None:
+            # Notify about trap - delete after 10 seconds
+            trap_msg = await message.reply(
+                f"💣 **TRAP ACTIVATED!** {message.author.mention} triggered a trap set by **{creator_name}** and lost {loss_amount} {Config.POINT_NAME}! {creator_name} gained {gain_amount} {Config.POINT_NAME}!"
+            )
+            await timers.delete_message_later(trap_msg, 10)
+            return
+
+        # Victim doesn't have enough points - add role for 1440 minutes
+        penalty_role = message.guild.get_role(1456114946764181557)
+        if penalty_role:
+            member = message.guild.get_member(message.author.id)
+            if member and penalty_role not in member.roles:
+                await member.add_roles(penalty_role)
+
+                # Schedule role removal after 1440 minutes (24 hours)
+                await timers.remove_role_later(member, penalty_role, 1440 * 60)
+
+        # Notify about trap and penalty - delete after 10 seconds
+        trap_msg = await message.reply(
+            f"💣 **TRAP ACTIVATED!** {message.author.mention} triggered a trap set by **{creator_name}** but doesn't have enough points! Penalty role added for 24 hours!"
+        )
+        await timers.delete_message_later(trap_msg, 10)
 
     @commands.slash_command(description="Set a trap with a trigger word")
     async def trap(
@@ -415,41 +520,35 @@ class Points(commands.Cog):
         trigger_lower = trigger.lower()
 
         # Check if trap already exists in this channel FIRST
-        trap_already_exists = False
-        if inter.channel.id in self.active_traps:
-            if trigger_lower in [
-                t.lower() for t in self.active_traps[inter.channel.id]
-            ]:
-                trap_already_exists = True
-
-        # Check if user has enough points to set a trap
-        async with db.pool.acquire() as conn:
-            user_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            user_points = user_points or 0
-
-            if user_points < cost:
-                await inter.response.send_message(
-                    f"You need at least {cost} {Config.POINT_NAME} to set a trap.",
-                    ephemeral=True,
-                )
-                return
+        self.active_traps.expire(now)
+        trap_already_exists = self.active_traps.has_trigger(
+            inter.channel.id, trigger_lower
+        )
 
-            # Only deduct cost if trap doesn't already exist
-            if not trap_already_exists:
-                await conn.execute(
-                    "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                    cost,
-                    inter.author.id,
-                )
+        # Traps live in memory, so the guarded debit is the only write
+        try:
+            async with user_lock(inter.author.id), db.pool.acquire() as conn:
+                if trap_already_exists:
+                    # Nothing is charged, but the balance check (and its message) stays
+                    user_points = await conn.fetchval(
+                        "SELECT points FROM users WHERE user_id = $1", inter.author.id
+                    )
+                    if (user_points or 0) < cost:
+                        raise InsufficientPoints(user_points, cost)
+                else:
+                    await debit(conn, inter.author.id, cost, "trap_cost")
+        except InsufficientPoints:
+            await inter.response.send_message(
+                f"You need at least {cost} {Config.POINT_NAME} to set a trap.",
+                ephemeral=True,
+            )
+            return
 
         # Set the trap only if it doesn't already exist
         if not trap_already_exists:
-            if inter.channel.id not in self.active_traps:
-                self.active_traps[inter.channel.id] = {}
-
-            self.active_traps[inter.channel.id][trigger] = (
+            self.active_traps.add(
+                inter.channel.id,
+                trigger,
                 inter.author.id,
                 datetime.datetime.now(),
                 cost,  # Store the cost with the trap
@@ -483,102 +582,66 @@ class Points(commands.Cog):
         ),
     ):
         """Try to counter a trap - if you guess the exact trigger, steal 10x cost from trap setter"""
-        # Check if user has enough points
-        async with db.pool.acquire() as conn:
-            user_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            user_points = user_points or 0
+        # Look for an exact match (case-sensitive) in this channel
+        self.active_traps.expire(datetime.datetime.now())
+        trap_data = self.active_traps.get(inter.channel.id, trigger)
+        trap_found = trigger if trap_data else None
+        trap_creator_id = trap_data[0] if trap_data else None
 
-            if user_points < cost:
-                await inter.response.send_message(
-                    f"You need at least {cost} {Config.POINT_NAME} to attempt a counter.",
-                    ephemeral=True,
-                )
-                return
-
-            # Deduct cost from counter user
-            await conn.execute(
-                "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                cost,
-                inter.author.id,
-            )
-
-        # Check if there's an active trap in this channel with exact trigger match
-        if inter.channel.id not in self.active_traps:
-            await inter.response.send_message(
-                f"❌ No trap found! You lost {cost} {Config.POINT_NAME}.",
-                ephemeral=True,
-            )
-            return
-
-        channel_traps = self.active_traps[inter.channel.id]
-
-        # Look for exact match (case-sensitive)
-        trap_found = None
-        trap_creator_id = None
-        trap_cost = None
-
-        for trap_trigger, trap_data in channel_traps.items():
-            if trap_trigger == trigger:  # Exact match
-                trap_found = trap_trigger
-                if len(trap_data) == 2:
-                    trap_creator_id, created_at = trap_data
-                    trap_cost = 40  # Default
-                else:
-                    trap_creator_id, created_at, trap_cost = trap_data
-                break
-
-        if not trap_found:
-            await inter.response.send_message(
-                f"❌ No trap with that exact trigger! You lost {cost} {Config.POINT_NAME}.",
-                ephemeral=True,
-            )
-            return
-
-        # Can't counter your own trap
+        # Can't counter your own trap (checked before anything is charged)
         if trap_creator_id == inter.author.id:
-            # Refund the cost
-            async with db.pool.acquire() as conn:
-                await conn.execute(
-                    "UPDATE users SET points = points + $1 WHERE user_id = $2",
-                    cost,
-                    inter.author.id,
-                )
             await inter.response.send_message(
-                "❌ You can't counter your own trap! (Cost refunded)",
+                "❌ You can't counter your own trap!",
                 ephemeral=True,
             )
             return
 
-        # Success! Counter the trap
         gain_amount = cost * 10
         tax_amount = int(gain_amount * 0.10)
         net_gain = gain_amount - tax_amount
 
-        async with db.pool.acquire() as conn:
-            # Counter user gains 10x their cost minus 10% tax
-            await conn.execute(
-                """INSERT INTO users (user_id, points) VALUES ($1, $2)
-                   ON CONFLICT (user_id) DO UPDATE SET points = users.points + $2""",
-                inter.author.id,
-                net_gain,
-            )
+        # Claim the trap before awaiting, so two counters can't both win it
+        if trap_found:
+            self.active_traps.remove(inter.channel.id, trap_found)
 
-            # Trap setter loses 10x counter cost (can go negative)
-            await conn.execute(
-                "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                gain_amount,
-                trap_creator_id,
-            )
+        # Charge the cost (guarded) and pay out a hit in one transaction
+        try:
+            async with user_lock(inter.author.id), db.pool.acquire() as conn:
+                async with ledger.transaction(conn):
+                    await debit(conn, inter.author.id, cost, "counter_trap_cost")
+                    if trap_found:
+                        # Counter user gains 10x their cost minus 10% tax
+                        await credit(conn, inter.author.id, net_gain, "counter_trap", trap_creator_id)
+
+                        # Trap setter loses 10x counter cost (can go negative)
+                        await conn.execute(
+                            "UPDATE users SET points = points - $1 WHERE user_id = $2",
+                            gain_amount,
+                            trap_creator_id,
+                        )
+                        ledger.record_in(conn, trap_creator_id, "counter_trap", -gain_amount, inter.author.id)
 
-            # Add tax to pool
-            await self.add_to_tax_pool(conn, tax_amount)
+                        # Add tax to pool
+                        await self.add_to_tax_pool(conn, tax_amount, "counter_trap", inter.author.id)
+        except Exception as e:
+            # Nothing was applied: put the trap back
+            if trap_found and not self.active_traps.has_trigger(inter.channel.id, trap_found.lower()):
+                self.active_traps.add(inter.channel.id, trap_found, *trap_data)
+            if isinstance(e, InsufficientPoints):
+                await inter.response.send_message(
+                    f"You need at least {cost} {Config.POINT_NAME} to attempt a counter.",
+                    ephemeral=True,
+                )
+                return
+            raise
 
-        # Remove the trap
-        del channel_traps[trap_found]
-        if not channel_traps:
-            del self.active_traps[inter.channel.id]
+        if not trap_found:
+            if self.active_traps.count(inter.channel.id):
+                message = f"❌ No trap with that exact trigger! You lost {cost} {Config.POINT_NAME}."
+            else:
+                message = f"❌ No trap found! You lost {cost} {Config.POINT_NAME}."
+            await inter.response.send_message(message, ephemeral=True)
+            return
 
         # Notify success
         trap_setter = inter.guild.get_member(trap_creator_id)
@@ -609,8 +672,7 @@ class Points(commands.Cog):
         )
 
         # Delete the response after 10 seconds
-        await asyncio.sleep(10)
-        await inter.delete_original_response()
+        await timers.delete_response_later(inter, 10)
 
     @commands.slash_command(
         description="Check how many traps are active (costs 100 points)"
@@ -619,31 +681,20 @@ class Points(commands.Cog):
         """Pay 100 points to see how many traps are active in this channel"""
         cost = 100
 
-        # Check if user has enough points
-        async with db.pool.acquire() as conn:
-            user_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            user_points = user_points or 0
-
-            if user_points < cost:
-                await inter.response.send_message(
-                    f"You need at least {cost} {Config.POINT_NAME} to check traps.",
-                    ephemeral=True,
-                )
-                return
-
-            # Deduct cost
-            await conn.execute(
-                "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                cost,
-                inter.author.id,
+        # Deduct cost (guarded)
+        try:
+            async with db.pool.acquire() as conn:
+                await debit(conn, inter.author.id, cost, "check_traps_cost")
+        except InsufficientPoints:
+            await inter.response.send_message(
+                f"You need at least {cost} {Config.POINT_NAME} to check traps.",
+                ephemeral=True,
             )
+            return
 
         # Count active traps in this channel
-        trap_count = 0
-        if inter.channel.id in self.active_traps:
-            trap_count = len(self.active_traps[inter.channel.id])
+        self.active_traps.expire(datetime.datetime.now())
+        trap_count = self.active_traps.count(inter.channel.id)
 
         await inter.response.send_message(
             f"🔍 **Trap Check** (-{cost} {Config.POINT_NAME})\n"
@@ -692,61 +743,51 @@ class Points(commands.Cog):
             )
             return
 
-        # Check current user ticket count
-        current_count = self.lottery_user_count.get(inter.author.id, 0)
-        remaining_slots = max_tickets_per_user - current_count
-
-        if remaining_slots <= 0:
-            await inter.response.send_message(
-                f"❌ You have already purchased the maximum of {max_tickets_per_user} lottery tickets.",
-                ephemeral=True,
-            )
-            return
+        # Ticket count check and purchase run one at a time per user
+        async with user_lock(inter.author.id):
+            # Check current user ticket count
+            current_count = self.lottery_user_count.get(inter.author.id, 0)
+            remaining_slots = max_tickets_per_user - current_count
 
-        # Limit to remaining slots
-        if len(number_list) > remaining_slots:
-            await inter.response.send_message(
-                f"❌ You can only buy {remaining_slots} more ticket(s). "
-                f"You already have {current_count}/{max_tickets_per_user} tickets.",
-                ephemeral=True,
-            )
-            return
+            if remaining_slots <= 0:
+                await inter.response.send_message(
+                    f"❌ You have already purchased the maximum of {max_tickets_per_user} lottery tickets.",
+                    ephemeral=True,
+                )
+                return
 
-        total_cost = cost_per_ticket * len(number_list)
+            # Limit to remaining slots
+            if len(number_list) > remaining_slots:
+                await inter.response.send_message(
+                    f"❌ You can only buy {remaining_slots} more ticket(s). "
+                    f"You already have {current_count}/{max_tickets_per_user} tickets.",
+                    ephemeral=True,
+                )
+                return
 
-        # Check if user has enough points
-        async with db.pool.acquire() as conn:
-            user_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            user_points = user_points or 0
+            total_cost = cost_per_ticket * len(number_list)
 
-            if user_points < total_cost:
+            # Deduct cost (guarded) and add to lottery pool
+            try:
+                async with db.pool.acquire() as conn, ledger.transaction(conn):
+                    await debit(conn, inter.author.id, total_cost, "lottery_ticket")
+                    await self.add_to_lottery_pool(conn, total_cost)
+            except InsufficientPoints:
                 await inter.response.send_message(
                     f"You need at least {total_cost} {Config.POINT_NAME} to buy {len(number_list)} lottery ticket(s).",
                     ephemeral=True,
                 )
                 return
 
-            # Deduct cost
-            await conn.execute(
-                "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                total_cost,
-                inter.author.id,
-            )
-
-            # Add to lottery pool
-            await self.add_to_lottery_pool(conn, total_cost)
+            # Add user to lottery entries for each number
+            for number in number_list:
+                if number not in self.lottery_entries:
+                    self.lottery_entries[number] = []
+                self.lottery_entries[number].append(inter.author.id)
 
-        # Add user to lottery entries for each number
-        for number in number_list:
-            if number not in self.lottery_entries:
-                self.lottery_entries[number] = []
-            self.lottery_entries[number].append(inter.author.id)
-
-        # Update user ticket count
-        self.lottery_user_count[inter.author.id] = current_count + len(number_list)
-        new_count = self.lottery_user_count[inter.author.id]
+            # Update user ticket count
+            self.lottery_user_count[inter.author.id] = current_count + len(number_list)
+            new_count = self.lottery_user_count[inter.author.id]
 
         # Format numbers for display
         numbers_display = ", ".join([f"{n:02d}" for n in number_list])
@@ -774,8 +815,7 @@ class Points(commands.Cog):
         )
 
         if not is_lottery_channel:
-            await asyncio.sleep(5)
-            await inter.delete_original_response()
+            await timers.delete_response_later(inter, 5)
 
     @commands.slash_command(
         description="Buy random lottery tickets (1-10 random numbers)"
@@ -794,65 +834,55 @@ class Points(commands.Cog):
         max_tickets_per_user = 10
         lottery_channel_id = 956301076271857764
 
-        # Check current user ticket count
-        current_count = self.lottery_user_count.get(inter.author.id, 0)
-        remaining_slots = max_tickets_per_user - current_count
+        # Ticket count check and purchase run one at a time per user
+        async with user_lock(inter.author.id):
+            # Check current user ticket count
+            current_count = self.lottery_user_count.get(inter.author.id, 0)
+            remaining_slots = max_tickets_per_user - current_count
 
-        if remaining_slots <= 0:
-            await inter.response.send_message(
-                f"❌ You have already purchased the maximum of {max_tickets_per_user} lottery tickets.",
-                ephemeral=True,
-            )
-            return
-
-        # Limit to remaining slots
-        actual_amount = min(amount, remaining_slots)
-        if actual_amount < amount:
-            await inter.response.send_message(
-                f"❌ You can only buy {remaining_slots} more ticket(s). "
-                f"You already have {current_count}/{max_tickets_per_user} tickets.",
-                ephemeral=True,
-            )
-            return
+            if remaining_slots <= 0:
+                await inter.response.send_message(
+                    f"❌ You have already purchased the maximum of {max_tickets_per_user} lottery tickets.",
+                    ephemeral=True,
+                )
+                return
 
-        total_cost = cost_per_ticket * actual_amount
+            # Limit to remaining slots
+            actual_amount = min(amount, remaining_slots)
+            if actual_amount < amount:
+                await inter.response.send_message(
+                    f"❌ You can only buy {remaining_slots} more ticket(s). "
+                    f"You already have {current_count}/{max_tickets_per_user} tickets.",
+                    ephemeral=True,
+                )
+                return
 
-        # Check if user has enough points
-        async with db.pool.acquire() as conn:
-            user_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            user_points = user_points or 0
+            total_cost = cost_per_ticket * actual_amount
 
-            if user_points < total_cost:
+            # Deduct cost (guarded) and add to lottery pool
+            try:
+                async with db.pool.acquire() as conn, ledger.transaction(conn):
+                    await debit(conn, inter.author.id, total_cost, "lottery_ticket")
+                    await self.add_to_lottery_pool(conn, total_cost)
+            except InsufficientPoints:
                 await inter.response.send_message(
                     f"You need at least {total_cost} {Config.POINT_NAME} to buy {actual_amount} lottery ticket(s).",
                     ephemeral=True,
                 )
                 return
 
-            # Deduct cost
-            await conn.execute(
-                "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                total_cost,
-                inter.author.id,
-            )
-
-            # Add to lottery pool
-            await self.add_to_lottery_pool(conn, total_cost)
+            # Generate random unique numbers
+            number_list = random.sample(range(0, 100), actual_amount)
 
-        # Generate random unique numbers
-        number_list = random.sample(range(0, 100), actual_amount)
+            # Add user to lottery entries for each number
+            for number in number_list:
+                if number not in self.lottery_entries:
+                    self.lottery_entries[number] = []
+                self.lottery_entries[number].append(inter.author.id)
 
-        # Add user to lottery entries for each number
-        for number in number_list:
-            if number not in self.lottery_entries:
-                self.lottery_entries[number] = []
-            self.lottery_entries[number].append(inter.author.id)
-
-        # Update user ticket count
-        self.lottery_user_count[inter.author.id] = current_count + actual_amount
-        new_count = self.lottery_user_count[inter.author.id]
+            # Update user ticket count
+            self.lottery_user_count[inter.author.id] = current_count + actual_amount
+            new_count = self.lottery_user_count[inter.author.id]
 
         # Format numbers for display
         numbers_display = ", ".join([f"{n:02d}" for n in sorted(number_list)])
@@ -880,8 +910,7 @@ class Points(commands.Cog):
         )
 
         if not is_lottery_channel:
-            await asyncio.sleep(5)
-            await inter.delete_original_response()
+            await timers.delete_response_later(inter, 5)
 
     @commands.slash_command(description="[MOD] Draw the lottery and pick 2 winners")
     async def drawlottery(self, inter: disnake.ApplicationCommandInteraction):
@@ -924,6 +953,7 @@ class Points(commands.Cog):
         total_tax_collected = 0
         prize_distributed = False
         results = []
+        payouts = []  # (user_id, delta, profit_column) paid in one statement
 
         # Process Prize 1
         if winners_1:
@@ -932,15 +962,9 @@ class Points(commands.Cog):
             prize_per_winner_1 = prize_after_tax_1 // len(winners_1)
             total_tax_collected += tax_1
             prize_distributed = True
-
-            async with db.pool.acquire() as conn:
-                for winner_id in winners_1:
-                    await conn.execute(
-                        """INSERT INTO users (user_id, points) VALUES ($1, $2)
-                           ON CONFLICT (user_id) DO UPDATE SET points = users.points + $2""",
-                        winner_id,
-                        prize_per_winner_1,
-                    )
+            payouts.extend(
+                (winner_id, prize_per_winner_1, None) for winner_id in winners_1
+            )
 
             winner_mentions_1 = [f"<@{winner_id}>" for winner_id in winners_1]
             results.append(
@@ -969,15 +993,9 @@ class Points(commands.Cog):
             prize_per_winner_2 = prize_after_tax_2 // len(winners_2)
             total_tax_collected += tax_2
             prize_distributed = True
-
-            async with db.pool.acquire() as conn:
-                for winner_id in winners_2:
-                    await conn.execute(
-                        """INSERT INTO users (user_id, points) VALUES ($1, $2)
-                           ON CONFLICT (user_id) DO UPDATE SET points = users.points + $2""",
-                        winner_id,
-                        prize_per_winner_2,
-                    )
+            payouts.extend(
+                (winner_id, prize_per_winner_2, None) for winner_id in winners_2
+            )
 
             winner_mentions_2 = [f"<@{winner_id}>" for winner_id in winners_2]
             results.append(
@@ -999,10 +1017,12 @@ class Points(commands.Cog):
                 }
             )
 
-        # Handle tax and pool reset
-        async with db.pool.acquire() as conn:
+        # Pay winners, collect tax and reset the pool together
+        async with db.pool.acquire() as conn, ledger.transaction(conn):
+            await bulk_payout(conn, payouts, "lottery_prize")
+
             if total_tax_collected > 0:
-                await self.add_to_tax_pool(conn, total_tax_collected)
+                await self.add_to_tax_pool(conn, total_tax_collected, "lottery_prize")
 
             # Calculate remaining pool (from numbers with no winners)
             remaining_pool = 0
@@ -1232,117 +1252,237 @@ class Points(commands.Cog):
         )
         await inter.response.send_message(embed=embed)
         # Delete after 10 seconds
-        await asyncio.sleep(10)
-        await inter.delete_original_response()
+        await timers.delete_response_later(inter, 10)
+
+    async def run_daily_engine(self, conn, today_bangkok, mode: str = "daily") -> dict:
+        """
+        Run the daily economy step as a few set-based statements in one transaction
+
+        mode "daily": reset attack/defense totals, pay 20% stash interest and
+        collect the progressive tax (brackets from the tax_brackets table).
+        mode "interest": pay 10% stash interest only.
+        Returns aggregate totals for the embeds.
+        """
+        interest_rate = 0.20 if mode == "daily" else 0.10
+        result = {
+            "users_reset": 0,
+            "interest_paid": 0,
+            "interest_users": 0,
+            "interest_rate": interest_rate,
+            "tax_collected": 0,
+            "taxed_users": 0,
+            "rows": 0,
+        }
 
-    @commands.slash_command(description="[MOD] Manually run daily tax and reset")
-    async def rundaily(self, inter: disnake.ApplicationCommandInteraction):
-        """Manually trigger the daily tax task (mod only)"""
-        # Check if user has mod role
-        mod_role = inter.guild.get_role(Config.MOD_ROLE_ID)
-        if not mod_role or mod_role not in inter.author.roles:
-            await inter.response.send_message(
-                "❌ This command is only available to moderators.", ephemeral=True
-            )
-            return
+        async with ledger.transaction(conn):
+            # Interest and tax rows go straight into the ledger below
+            await lock_ledger_shared(conn)
 
-        await inter.response.defer(ephemeral=True)
+            if mode == "daily":
+                # Reset cumulative attack gains and defense losses for all users
+                status = await conn.execute(
+                    "UPDATE users SET cumulative_attack_gains = 0, cumulative_defense_losses = 0"
+                )
+                result["users_reset"] = int(status.split()[-1])
 
-        if db.pool is None:
-            await inter.followup.send("❌ Database not connected.", ephemeral=True)
-            return
+            # Pay interest on stashed points to main points (stash stays same)
+            interest = await conn.fetchrow(
+                """
+                WITH paid AS (
+                    UPDATE users
+                    SET points = points + FLOOR(stashed_points * $1::NUMERIC)::INTEGER
+                    WHERE stashed_points > 0
+                    RETURNING user_id, FLOOR(stashed_points * $1::NUMERIC)::INTEGER AS interest
+                ), logged AS (
+                    INSERT INTO ledger (user_id, kind, amount)
+                    SELECT user_id, 'stash_interest', interest FROM paid WHERE interest <> 0
+                )
+                SELECT COUNT(*) AS users, COALESCE(SUM(interest), 0) AS total FROM paid
+                """,
+                interest_rate,
+            )
+            result["interest_users"] = interest["users"]
+            result["interest_paid"] = int(interest["total"])
+            result["rows"] = result["users_reset"] + interest["users"]
+
+            if mode == "daily":
+                # Progressive tax on points + stash, once per Bangkok day
+                # (rate 0 rows are still marked as taxed; points can go negative)
+                tax = await conn.fetchrow(
+                    """
+                    WITH due AS (
+                        SELECT u.user_id,
+                               FLOOR(
+                                   (COALESCE(u.points, 0) + COALESCE(u.stashed_points, 0))
+                                   * COALESCE(b.rate, 0)
+                               )::INTEGER AS tax
+                        FROM users u
+                        LEFT JOIN LATERAL (
+                            SELECT rate FROM tax_brackets
+                            WHERE min_wealth <= COALESCE(u.points, 0) + COALESCE(u.stashed_points, 0)
+                            ORDER BY min_wealth DESC
+                            LIMIT 1
+                        ) b ON TRUE
+                        WHERE u.last_rich_tax_date IS DISTINCT FROM $1
+                    ),
+                    taxed AS (
+                        UPDATE users u
+                        SET points = u.points - due.tax, last_rich_tax_date = $1
+                        FROM due
+                        WHERE u.user_id = due.user_id
+                        RETURNING due.user_id, due.tax
+                    ),
+                    logged AS (
+                        INSERT INTO ledger (user_id, kind, amount, counterparty_id)
+                        SELECT user_id, 'daily_tax', -tax, $2 FROM taxed WHERE tax <> 0
+                    )
+                    SELECT COUNT(*) AS rows, COUNT(*) FILTER (WHERE tax > 0) AS users,
+                           COALESCE(SUM(tax), 0) AS total
+                    FROM taxed
+                    """,
+                    today_bangkok,
+                    TAX_POOL_ID,
+                )
+                result["taxed_users"] = tax["users"]
+                result["tax_collected"] = int(tax["total"])
+                result["rows"] += tax["rows"]
 
-        from datetime import date
+                # Add to tax pool
+                if result["tax_collected"] > 0:
+                    await self.add_to_tax_pool(conn, result["tax_collected"], "daily_tax")
 
-        now_bangkok = datetime.datetime.now(BANGKOK_TZ)
-        today_bangkok = now_bangkok.date()
+        return result
 
+    async def after_daily_engine(self):
+        """Balances changed outside ledger.record: drop cached results and reload the
+        rank index (only once jobs.run has committed)"""
+        leaderboard.invalidate()
+        point_stats.invalidate()
         async with db.pool.acquire() as conn:
-            # Reset cumulative attack gains and defense losses for all users
-            await conn.execute(
-                "UPDATE users SET cumulative_attack_gains = 0, cumulative_defense_losses = 0"
-            )
+            await self.rebuild_rankings(conn)
 
-            # Give 20% interest on stashed points
-            stash_users = await conn.fetch(
-                "SELECT user_id, stashed_points FROM users WHERE stashed_points > 0"
-            )
+    async def run_interest_job(self, conn, business_date) -> dict:
+        """stash_interest job: the interest-only mode of the daily engine"""
+        return await self.run_daily_engine(conn, business_date, mode="interest")
 
-            total_interest_paid = 0
-            for user_row in stash_users:
-                stashed = user_row["stashed_points"]
-                interest = int(stashed * 0.20)
+    def daily_embed(self, title: str, result: dict, color) -> disnake.Embed:
+        """Public summary of a daily run"""
+        embed = disnake.Embed(
+            title=title,
+            description=f"**Tax Collected:** {result['tax_collected']:,} {Config.POINT_NAME} from {result['taxed_users']} users (progressive tax: 0-20% based on total wealth).\n**Interest Paid:** {result['interest_paid']:,} {Config.POINT_NAME} to {result['interest_users']} users (20% on stashed points).",
+            color=color,
+        )
+        embed.add_field(
+            name="✅ Also Reset",
+            value="All cumulative attack gains and defense losses have been reset to 0.",
+            inline=False,
+        )
+        return embed
 
-                # Pay interest to main points (stash stays same)
-                if interest > 0:
-                    await conn.execute(
-                        "UPDATE users SET points = points + $1 WHERE user_id = $2",
-                        interest,
-                        user_row["user_id"],
-                    )
-                    total_interest_paid += interest
+    async def run_history_retention(self, business_date):
+        """Create upcoming attack_history partitions and drop expired ones (once per date)"""
+        try:
+            await jobs.run("attack_history_retention", business_date)
+        except Exception as e:
+            print(f"attack_history retention failed for {business_date}: {e}")
 
-            # Tax all users with progressive rates based on points + stash
-            all_users = await conn.fetch(
-                "SELECT user_id, points, stashed_points, last_rich_tax_date FROM users"
-            )
+    @tasks.loop(time=datetime.time(hour=0, minute=0, tzinfo=BANGKOK_TZ))
+    async def daily_tax_task(self):
+        """Daily task to tax all users and reset cumulative attack gains"""
+        if db.pool is None:
+            return
 
-            total_tax_collected = 0
-            taxed_users = 0
-            for user_row in all_users:
-                # Check if already taxed today
-                last_tax_date = user_row["last_rich_tax_date"]
-                if last_tax_date == today_bangkok:
-                    continue
+        today_bangkok = datetime.datetime.now(BANGKOK_TZ).date()
 
-                user_points = user_row["points"] or 0
-                stashed_points = user_row["stashed_points"] or 0
-                total_wealth = user_points + stashed_points
-
-                # Progressive tax brackets
-                if total_wealth < 500:
-                    tax_rate = 0.0
-                elif total_wealth < 1000:
-                    tax_rate = 0.05
-                elif total_wealth < 2500:
-                    tax_rate = 0.10
-                elif total_wealth < 5000:
-                    tax_rate = 0.15
-                elif total_wealth < 7500:
-                    tax_rate = 0.20
-                else:
-                    tax_rate = 0.20
+        await self.run_history_retention(today_bangkok)
 
-                if tax_rate == 0.0:
-                    # Still mark as taxed but no tax collected
-                    await conn.execute(
-                        "UPDATE users SET last_rich_tax_date = $1 WHERE user_id = $2",
-                        today_bangkok,
-                        user_row["user_id"],
+        # Runs at most once per Bangkok date (recorded in job_runs)
+        try:
+            result = await jobs.run("daily_tax", today_bangkok)
+        except Exception as e:
+            print(f"Daily tax job failed for {today_bangkok}: {e}")
+            return
+        if result is None:
+            return
+        await self.after_daily_engine()
+
+        # Send notification
+        if result["tax_collected"] > 0:
+            bot_channel = self.bot.get_channel(Config.BOT_CHANNEL_ID)
+            if bot_channel:
+                await bot_channel.send(
+                    embed=self.daily_embed(
+                        "📊 Daily Tax & Interest", result, disnake.Color.blue()
                     )
-                    continue
+                )
 
-                tax_amount = int(total_wealth * tax_rate)
+    @daily_tax_task.before_loop
+    async def before_daily_tax(self):
+        await self.bot.wait_until_ready()
+        # Wait for db connection
+        while db.pool is None:
+            await asyncio.sleep(1)
 
-                # Deduct tax from user (points can go negative if not enough)
-                await conn.execute(
-                    "UPDATE users SET points = points - $1, last_rich_tax_date = $2 WHERE user_id = $3",
-                    tax_amount,
-                    today_bangkok,
-                    user_row["user_id"],
+        # Catch up on midnights missed while the bot was down
+        today_bangkok = datetime.datetime.now(BANGKOK_TZ).date()
+        await self.run_history_retention(today_bangkok)
+        try:
+            replayed = await jobs.replay_missed("daily_tax", today_bangkok)
+        except Exception as e:
+            print(f"Failed to replay missed daily tax runs: {e}")
+            # Dates before the failing one may have committed
+            await self.after_daily_engine()
+            return
+        if replayed:
+            await self.after_daily_engine()
+
+        bot_channel = self.bot.get_channel(Config.BOT_CHANNEL_ID)
+        if bot_channel:
+            for business_date, result in replayed:
+                await bot_channel.send(
+                    embed=self.daily_embed(
+                        f"📊 Daily Tax & Interest (Catch-up {business_date})",
+                        result,
+                        disnake.Color.blue(),
+                    )
                 )
 
-                total_tax_collected += tax_amount
-                taxed_users += 1
+    @commands.slash_command(description="[MOD] Manually run daily tax and reset")
+    async def rundaily(self, inter: disnake.ApplicationCommandInteraction):
+        """Manually trigger the daily tax task (mod only)"""
+        # Check if user has mod role
+        mod_role = inter.guild.get_role(Config.MOD_ROLE_ID)
+        if not mod_role or mod_role not in inter.author.roles:
+            await inter.response.send_message(
+                "❌ This command is only available to moderators.", ephemeral=True
+            )
+            return
+
+        await inter.response.defer(ephemeral=True)
 
-            # Add to tax pool
-            if total_tax_collected > 0:
-                await self.add_to_tax_pool(conn, total_tax_collected)
+        if db.pool is None:
+            await inter.followup.send("❌ Database not connected.", ephemeral=True)
+            return
+
+        today_bangkok = datetime.datetime.now(BANGKOK_TZ).date()
+
+        try:
+            result = await jobs.run("daily_tax", today_bangkok)
+        except Exception as e:
+            await inter.followup.send(f"❌ Daily tax failed: {e}", ephemeral=True)
+            return
+        if result is None:
+            await inter.followup.send(
+                f"⚠️ Daily tax already ran for {today_bangkok}. Nothing was changed.",
+                ephemeral=True,
+            )
+            return
+        await self.after_daily_engine()
 
         # Send response
         embed = disnake.Embed(
             title="✅ Daily Task Executed",
-            description=f"**Tax Collected:** {total_tax_collected:,} {Config.POINT_NAME} from {taxed_users} users\n**Interest Paid:** {total_interest_paid:,} {Config.POINT_NAME} to {len(stash_users)} users",
+            description=f"**Tax Collected:** {result['tax_collected']:,} {Config.POINT_NAME} from {result['taxed_users']} users\n**Interest Paid:** {result['interest_paid']:,} {Config.POINT_NAME} to {result['interest_users']} users",
             color=disnake.Color.green(),
         )
         embed.add_field(
@@ -1355,17 +1495,11 @@ class Points(commands.Cog):
         # Also send public notification
         bot_channel = self.bot.get_channel(Config.BOT_CHANNEL_ID)
         if bot_channel:
-            public_embed = disnake.Embed(
-                title="📊 Daily Tax & Interest (Manual)",
-                description=f"**Tax Collected:** {total_tax_collected:,} {Config.POINT_NAME} from {taxed_users} users (progressive tax: 0-20% based on total wealth).\n**Interest Paid:** {total_interest_paid:,} {Config.POINT_NAME} to {len(stash_users)} users (20% on stashed points).",
-                color=disnake.Color.blue(),
-            )
-            public_embed.add_field(
-                name="✅ Also Reset",
-                value="All cumulative attack gains and defense losses have been reset to 0.",
-                inline=False,
+            await bot_channel.send(
+                embed=self.daily_embed(
+                    "📊 Daily Tax & Interest (Manual)", result, disnake.Color.blue()
+                )
             )
-            await bot_channel.send(embed=public_embed)
 
     @commands.slash_command(description="[MOD] Pay interest only without tax/reset")
     async def runinterest(self, inter: disnake.ApplicationCommandInteraction):
@@ -1384,30 +1518,25 @@ class Points(commands.Cog):
             await inter.followup.send("❌ Database not connected.", ephemeral=True)
             return
 
-        async with db.pool.acquire() as conn:
-            # Give 10% interest on stashed points
-            stash_users = await conn.fetch(
-                "SELECT user_id, stashed_points FROM users WHERE stashed_points > 0"
-            )
-
-            total_interest_paid = 0
-            for user_row in stash_users:
-                stashed = user_row["stashed_points"]
-                interest = int(stashed * 0.10)
+        today_bangkok = datetime.datetime.now(BANGKOK_TZ).date()
 
-                # Pay interest to main points (stash stays same)
-                if interest > 0:
-                    await conn.execute(
-                        "UPDATE users SET points = points + $1 WHERE user_id = $2",
-                        interest,
-                        user_row["user_id"],
-                    )
-                    total_interest_paid += interest
+        try:
+            result = await jobs.run("stash_interest", today_bangkok)
+        except Exception as e:
+            await inter.followup.send(f"❌ Interest payout failed: {e}", ephemeral=True)
+            return
+        if result is None:
+            await inter.followup.send(
+                f"⚠️ Interest was already paid for {today_bangkok}. Nothing was changed.",
+                ephemeral=True,
+            )
+            return
+        await self.after_daily_engine()
 
         # Send response
         embed = disnake.Embed(
             title="✅ Interest Paid",
-            description=f"**Interest Paid:** {total_interest_paid:,} {Config.POINT_NAME} to {len(stash_users)} users (10% on stashed points)",
+            description=f"**Interest Paid:** {result['interest_paid']:,} {Config.POINT_NAME} to {result['interest_users']} users (10% on stashed points)",
             color=disnake.Color.green(),
         )
         await inter.followup.send(embed=embed, ephemeral=True)
@@ -1417,7 +1546,7 @@ class Points(commands.Cog):
         if bot_channel:
             public_embed = disnake.Embed(
                 title="💰 Stash Interest Paid",
-                description=f"**Interest Paid:** {total_interest_paid:,} {Config.POINT_NAME} to {len(stash_users)} users (10% on stashed points).",
+                description=f"**Interest Paid:** {result['interest_paid']:,} {Config.POINT_NAME} to {result['interest_users']} users (10% on stashed points).",
                 color=disnake.Color.gold(),
             )
             await bot_channel.send(embed=public_embed)
@@ -1470,49 +1599,32 @@ class Points(commands.Cog):
         amount: int = commands.Param(description="Amount to deposit", ge=1),
     ):
         """Deposit points into stash (max 5000 total)"""
-        async with db.pool.acquire() as conn:
-            user_data = await conn.fetchrow(
-                "SELECT points, stashed_points FROM users WHERE user_id = $1",
-                inter.author.id,
-            )
-
-            if not user_data:
+        try:
+            async with db.pool.acquire() as conn:
+                _, stashed = await deposit_to_stash(conn, inter.author.id, amount, STASH_CAP)
+        except InsufficientPoints as e:
+            if e.balance is None:
                 await inter.response.send_message(
                     "You don't have any points yet!", ephemeral=True
                 )
-                return
-
-            points = user_data["points"] or 0
-            stashed = user_data["stashed_points"] or 0
-
-            # Check if user has enough points
-            if points < amount:
-                await inter.response.send_message(
-                    f"You don't have enough {Config.POINT_NAME}. You have {points}, trying to deposit {amount}.",
-                    ephemeral=True,
-                )
-                return
-
-            # Check if stash would exceed 10000
-            if stashed + amount > 10000:
-                max_deposit = 10000 - stashed
+            else:
                 await inter.response.send_message(
-                    f"Your stash can only hold 10000 {Config.POINT_NAME}. You currently have {stashed} stashed. Maximum you can deposit: {max_deposit}",
+                    f"You don't have enough {Config.POINT_NAME}. You have {e.balance}, trying to deposit {amount}.",
                     ephemeral=True,
                 )
-                return
-
-            # Deposit to stash
-            await conn.execute(
-                "UPDATE users SET points = points - $1, stashed_points = stashed_points + $1 WHERE user_id = $2",
-                amount,
-                inter.author.id,
-            )
-
+            return
+        except StashFull as e:
+            max_deposit = STASH_CAP - e.stashed
             await inter.response.send_message(
-                f"💰 Successfully deposited **{amount} {Config.POINT_NAME}** to your stash!\\nStashed: {stashed + amount}/10000",
+                f"Your stash can only hold {STASH_CAP} {Config.POINT_NAME}. You currently have {e.stashed} stashed. Maximum you can deposit: {max_deposit}",
                 ephemeral=True,
             )
+            return
+
+        await inter.response.send_message(
+            f"💰 Successfully deposited **{amount} {Config.POINT_NAME}** to your stash!\\nStashed: {stashed}/{STASH_CAP}",
+            ephemeral=True,
+        )
 
     @stash.sub_command(description="Withdraw points from your stash")
     async def withdraw(
@@ -1521,32 +1633,51 @@ class Points(commands.Cog):
         amount: int = commands.Param(description="Amount to withdraw", ge=1),
     ):
         """Withdraw points from stash"""
-        async with db.pool.acquire() as conn:
-            stashed = await conn.fetchval(
-                "SELECT stashed_points FROM users WHERE user_id = $1",
-                inter.author.id,
-            )
-            stashed = stashed or 0
-
-            # Check if user has enough stashed
-            if stashed < amount:
-                await inter.response.send_message(
-                    f"You don't have enough stashed {Config.POINT_NAME}. You have {stashed} stashed, trying to withdraw {amount}.",
-                    ephemeral=True,
-                )
-                return
-
-            # Withdraw from stash
-            await conn.execute(
-                "UPDATE users SET points = points + $1, stashed_points = stashed_points - $1 WHERE user_id = $2",
-                amount,
-                inter.author.id,
-            )
-
+        try:
+            async with db.pool.acquire() as conn:
+                _, stashed = await withdraw_from_stash(conn, inter.author.id, amount)
+        except InsufficientPoints as e:
             await inter.response.send_message(
-                f"💰 Successfully withdrew **{amount} {Config.POINT_NAME}** from your stash!\\nStashed: {stashed - amount}/10000",
+                f"You don't have enough stashed {Config.POINT_NAME}. You have {e.balance or 0} stashed, trying to withdraw {amount}.",
                 ephemeral=True,
             )
+            return
+
+        await inter.response.send_message(
+            f"💰 Successfully withdrew **{amount} {Config.POINT_NAME}** from your stash!\\nStashed: {stashed}/{STASH_CAP}",
+            ephemeral=True,
+        )
+
+    def consume_dodge(self, user_id: int, used: list = None) -> bool:
+        """Use up a user's active dodge, returns True if one was active (noted in used)"""
+        dodge_time = self.active_dodges.pop(user_id, None)
+        if dodge_time is None:
+            return False
+        if used is not None:
+            used.append((user_id, dodge_time))
+        return (datetime.datetime.now() - dodge_time).total_seconds() < 300  # 5 minutes
+
+    @contextlib.contextmanager
+    def dodge_uses(self):
+        """Collect the dodges an attack uses up; if the block raises (rolled back) they are put back"""
+        used = []
+        try:
+            yield used
+        except BaseException:
+            for user_id, dodge_time in used:
+                if user_id not in self.active_dodges:
+                    self.active_dodges[user_id] = dodge_time
+            raise
+
+    def attack_rejected_message(self, reason: str, target, amount: int) -> str:
+        """User-facing text for an AttackRejected reason"""
+        if reason == "attacker_points":
+            return f"You need at least {amount} {Config.POINT_NAME} to attack."
+        if reason == "target_points":
+            return f"{target.mention} doesn't have enough {Config.POINT_NAME} to attack (needs {amount})."
+        if reason == "defense_cap":
+            return f"🛡️ {target.mention} has already lost 100000 {Config.POINT_NAME} from being attacked today. They cannot be attacked anymore."
+        return f"⚠️ You've reached your cumulative attack limit of 100000 {Config.POINT_NAME}! Come back tomorrow."
 
     @commands.slash_command(description="Attack another user to steal points")
     async def attack(
@@ -1586,10 +1717,14 @@ class Points(commands.Cog):
         # Protection for specific user
         if target.id == 239871840691027969:
             async with db.pool.acquire() as conn:
-                await conn.execute(
-                    "UPDATE users SET points = -1000 WHERE user_id = $1",
+                old_points = await conn.fetchval(
+                    """UPDATE users u SET points = -1000 FROM users old
+                       WHERE u.user_id = $1 AND old.user_id = u.user_id
+                       RETURNING old.points""",
                     inter.author.id,
                 )
+            if old_points is not None:
+                ledger.record(inter.author.id, "protection_penalty", -1000 - old_points, target.id)
 
             # Send notification to attack channel
             attack_channel = self.bot.get_channel(1456204479203639340)
@@ -1610,341 +1745,110 @@ class Points(commands.Cog):
             )
             return
 
-        async with db.pool.acquire() as conn:
-            # Get both users' points
-            attacker_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            target_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", target.id
+        # Shield is only read; a dodge is used up by the attack
+        target_has_shield = False
+        if target.id in self.active_shields:
+            shield_time = self.active_shields[target.id]
+            if (now - shield_time).total_seconds() < 900:  # 15 minutes
+                target_has_shield = True
+
+        def decide(attacker_row, target_row):
+            check_stakes(attacker_row, target_row, amount)
+            return regular_attack(
+                attacker_row,
+                target_row,
+                amount,
+                has_shield=target_has_shield,
+                has_dodge=self.consume_dodge(target.id, used_dodges),
             )
 
-            # Check target's cumulative defense losses
-            target_defense_losses = await conn.fetchval(
-                "SELECT cumulative_defense_losses FROM users WHERE user_id = $1",
-                target.id,
+        try:
+            with self.dodge_uses() as used_dodges:
+                outcome = await resolve_attack(inter.author.id, target.id, decide)
+        except AttackRejected as e:
+            await inter.response.send_message(
+                self.attack_rejected_message(e.reason, target, amount),
+                ephemeral=True,
             )
+            return
 
-            attacker_points = attacker_points or 0
-            target_points = target_points or 0
-            target_defense_losses = target_defense_losses or 0
+        # Update cooldown and track attack use (to block dodge for 5 minutes)
+        self.attack_cooldowns[user_id] = now
+        self.attack_last_use[user_id] = now
 
-            # Check both have at least the attack amount
-            if attacker_points < amount:
-                await inter.response.send_message(
-                    f"You need at least {amount} {Config.POINT_NAME} to attack.",
-                    ephemeral=True,
-                )
-                return
+        win_chance = outcome.win_chance
+        tax_amount = outcome.tax
+        target_points = outcome.target_points_before
+        attack_channel = self.bot.get_channel(1456204479203639340)
 
-            if target_points < amount:
-                await inter.response.send_message(
-                    f"{target.mention} doesn't have enough {Config.POINT_NAME} to attack (needs {amount}).",
-                    ephemeral=True,
-                )
-                return
+        if outcome.success:
+            attacker_gain = outcome.attacker_delta
 
-            # Check if target has already lost 100000 points today from being attacked
-            if target_defense_losses >= 100000:
-                await inter.response.send_message(
-                    f"🛡️ {target.mention} has already lost 100000 {Config.POINT_NAME} from being attacked today. They cannot be attacked anymore.",
-                    ephemeral=True,
-                )
-                return
+            # Send result to channel 1456204479203639340
+            if attack_channel:
+                description = f"{inter.author.mention} stole **{attacker_gain} {Config.POINT_NAME}** from {target.mention}!"
+                if tax_amount > 0:
+                    description += f" ({tax_amount} tax collected)"
+                if target_points > 10000:
+                    description += f"\n💰 Super rich target (+10% bonus)!"
+                elif target_points > 3000:
+                    description += f"\n💎 Rich target bonus applied!"
+                if outcome.shield_reduced:
+                    description += f"\n🛡️ Shield active (attacker gained only 75%)"
+                description += f"\n🎲 Win chance: {int(win_chance * 100)}%"
 
-            # Check if target has active shield
-            target_has_shield = False
-            if target.id in self.active_shields:
-                shield_time = self.active_shields[target.id]
-                if (now - shield_time).total_seconds() < 900:  # 15 minutes
-                    target_has_shield = True
+                embed = disnake.Embed(
+                    title="💥 Attack Successful!",
+                    description=description,
+                    color=disnake.Color.green(),
+                )
+                await attack_channel.send(embed=embed)
 
-            # Check if target has active dodge
-            target_has_dodge = False
-            if target.id in self.active_dodges:
-                dodge_time = self.active_dodges[target.id]
-                if (
-                    datetime.datetime.now() - dodge_time
-                ).total_seconds() < 300:  # 5 minutes
-                    target_has_dodge = True
-                    # Remove dodge after use
-                    del self.active_dodges[target.id]
-                else:
-                    # Expired dodge, clean up
-                    del self.active_dodges[target.id]
+            msg = f"💥 **Attack successful!** You gained {attacker_gain} {Config.POINT_NAME} from {target.mention}"
+            if tax_amount > 0:
+                msg += f" ({tax_amount} tax)"
+            msg += f" | Win chance: {int(win_chance * 100)}%"
+        else:
+            target_has_dodge = outcome.attack_type == "dodge"
+            loss_amount = -outcome.attacker_delta
 
-            if target_has_dodge:
-                # Dodge makes attacker always fail
-                success = False
-            else:
-                win_chance = 0.45
-
-                # Rich target bonus: +15% win chance when attacking players with >3000 points
-                if target_points > 3000:
-                    win_chance += 0.15
-
-                # Super rich target bonus: +10% win chance when attacking players with >10000 points
-                if target_points > 10000:
-                    win_chance += 0.10
-
-                # Ensure win_chance stays within 0-1 range
-                win_chance = max(0.0, min(1.0, win_chance))
-
-                success = random.random() < win_chance
-
-            if success:
-                # Check cumulative attack gains cap (100000)
-                attacker_cumulative = await conn.fetchval(
-                    "SELECT cumulative_attack_gains FROM users WHERE user_id = $1",
-                    inter.author.id,
-                )
-                attacker_cumulative = attacker_cumulative or 0
-
-                if attacker_cumulative >= 100000:
-                    await inter.response.send_message(
-                        f"⚠️ You've reached your cumulative attack limit of 100000 {Config.POINT_NAME}! Come back tomorrow.",
-                        ephemeral=True,
-                    )
-                    return
-
-                # Check if attacker would exceed cap
-                if attacker_cumulative + amount > 100000:
-                    amount = 100000 - attacker_cumulative
-
-                # Calculate bonus if target has >10k points
-                actual_steal_amount = amount
-                if target_points > 10000:
-                    bonus = int(amount * 0.10)
-                    actual_steal_amount = amount + bonus
-
-                # Apply shield reduction - attacker only gains 75% if target has shield
-                shield_reduced = False
-                if target_has_shield:
-                    actual_steal_amount = int(actual_steal_amount * 0.75)
-                    shield_reduced = True
-
-                # Calculate 5% tax on the steal amount
-                tax_amount = int(actual_steal_amount * 0.05)
-                attacker_gain = actual_steal_amount - tax_amount
-
-                # Attacker steals points from target (minus tax)
-                await conn.execute(
-                    "UPDATE users SET points = points + $1, cumulative_attack_gains = cumulative_attack_gains + $2, profit_attack = profit_attack + $1 WHERE user_id = $3",
-                    attacker_gain,
-                    actual_steal_amount,
-                    inter.author.id,
-                )
-                await conn.execute(
-                    "UPDATE users SET points = points - $1, cumulative_defense_losses = cumulative_defense_losses + $1 WHERE user_id = $2",
-                    actual_steal_amount,
-                    target.id,
-                )
-
-                # Add tax to pool
-                await self.add_to_tax_pool(conn, tax_amount)
-
-                # Track attack stats (win)
-                if amount > 100:
-                    await conn.execute(
-                        "UPDATE users SET attack_attempts_high = attack_attempts_high + 1, attack_wins_high = attack_wins_high + 1 WHERE user_id = $1",
-                        inter.author.id,
+            # Send result to channel 1456204479203639340
+            if attack_channel:
+                if target_has_dodge:
+                    description = f"{target.mention} dodged {inter.author.mention}'s attack! {inter.author.mention} lost **{loss_amount} {Config.POINT_NAME}** (2x penalty)!"
+                    if tax_amount > 0:
+                        description += f" ({tax_amount} tax collected)"
+                    embed = disnake.Embed(
+                        title="🛡️ Attack Dodged!",
+                        description=description,
+                        color=disnake.Color.blue(),
                     )
                 else:
-                    await conn.execute(
-                        "UPDATE users SET attack_attempts_low = attack_attempts_low + 1, attack_wins_low = attack_wins_low + 1 WHERE user_id = $1",
-                        inter.author.id,
-                    )
-
-                # Log attack history
-                await conn.execute(
-                    "INSERT INTO attack_history (attacker_id, target_id, attack_type, amount, success, points_gained, points_lost) VALUES ($1, $2, $3, $4, $5, $6, $7)",
-                    inter.author.id,
-                    target.id,
-                    "regular",
-                    amount,
-                    True,
-                    attacker_gain,
-                    amount,
-                )
-
-                # Update cooldown and track attack use (to block dodge for 5 minutes)
-                self.attack_cooldowns[user_id] = now
-                self.attack_last_use[user_id] = now
-
-                # Send result to channel 1456204479203639340
-                attack_channel = self.bot.get_channel(1456204479203639340)
-                if attack_channel:
-                    description = f"{inter.author.mention} stole **{attacker_gain} {Config.POINT_NAME}** from {target.mention}!"
+                    description = f"{inter.author.mention} failed to attack {target.mention} and lost **{amount} {Config.POINT_NAME}**!"
                     if tax_amount > 0:
                         description += f" ({tax_amount} tax collected)"
-                    if target_points > 10000:
-                        description += f"\n💰 Super rich target (+10% bonus)!"
-                    elif target_points > 3000:
-                        description += f"\n💎 Rich target bonus applied!"
-                    if shield_reduced:
-                        description += f"\n🛡️ Shield active (attacker gained only 75%)"
                     description += f"\n🎲 Win chance: {int(win_chance * 100)}%"
-
                     embed = disnake.Embed(
-                        title="💥 Attack Successful!",
+                        title="💔 Attack Failed!",
                         description=description,
-                        color=disnake.Color.green(),
+                        color=disnake.Color.red(),
                     )
-                    await attack_channel.send(embed=embed)
+                await attack_channel.send(embed=embed)
 
-                # If used outside the attack channel, show same result but delete after 5 seconds
-                if inter.channel_id != 1456204479203639340:
-                    msg = f"💥 **Attack successful!** You gained {attacker_gain} {Config.POINT_NAME} from {target.mention}"
-                    if tax_amount > 0:
-                        msg += f" ({tax_amount} tax)"
-                    msg += f" | Win chance: {int(win_chance * 100)}%"
-                    await inter.response.send_message(msg)
-                    # Delete after 5 seconds
-                    await asyncio.sleep(5)
-                    await inter.delete_original_response()
-                else:
-                    msg = f"💥 **Attack successful!** You gained {attacker_gain} {Config.POINT_NAME} from {target.mention}"
-                    if tax_amount > 0:
-                        msg += f" ({tax_amount} tax)"
-                    msg += f" | Win chance: {int(win_chance * 100)}%"
-                    await inter.response.send_message(msg)
+            if target_has_dodge:
+                msg = f"🛡️ **Attack dodged!** {target.mention} dodged your attack and you lost {loss_amount} {Config.POINT_NAME} (2x penalty)"
+                if tax_amount > 0:
+                    msg += f" ({tax_amount} tax)"
             else:
-                # If target has dodge, attacker loses 2x points
-                if target_has_dodge:
-                    loss_amount = amount * 2
-                    # Calculate 5% tax on 2x amount
-                    tax_amount = int(loss_amount * 0.05)
-                    target_gain = loss_amount - tax_amount
-
-                    # Attacker loses 2x points
-                    await conn.execute(
-                        "UPDATE users SET points = points - $1, cumulative_attack_gains = cumulative_attack_gains - $2 WHERE user_id = $3",
-                        loss_amount,
-                        amount,
-                        inter.author.id,
-                    )
-                    # Target gains 2x points (minus tax) and track dodge profit
-                    # Decrease cumulative_defense_losses since defender won (can go negative)
-                    await conn.execute(
-                        "UPDATE users SET points = points + $1, profit_dodge = profit_dodge + $1, cumulative_defense_losses = cumulative_defense_losses - $1 WHERE user_id = $2",
-                        target_gain,
-                        target.id,
-                    )
-
-                    # Log attack history (dodge)
-                    await conn.execute(
-                        "INSERT INTO attack_history (attacker_id, target_id, attack_type, amount, success, points_gained, points_lost) VALUES ($1, $2, $3, $4, $5, $6, $7)",
-                        inter.author.id,
-                        target.id,
-                        "dodge",
-                        amount,
-                        False,
-                        target_gain,
-                        loss_amount,
-                    )
-                else:
-                    # Regular failed attack
-                    loss_amount = amount
-                    # Calculate 5% tax on failed attack
-                    tax_amount = int(amount * 0.05)
-                    target_gain = amount - tax_amount
-
-                    # Attacker loses points, target gains (minus tax) and track defense profit
-                    await conn.execute(
-                        "UPDATE users SET points = points - $1, cumulative_attack_gains = cumulative_attack_gains - $1 WHERE user_id = $2",
-                        amount,
-                        inter.author.id,
-                    )
-                    # Decrease cumulative_defense_losses since defender won (can go negative)
-                    await conn.execute(
-                        "UPDATE users SET points = points + $1, profit_defense = profit_defense + $1, cumulative_defense_losses = cumulative_defense_losses - $1 WHERE user_id = $2",
-                        target_gain,
-                        target.id,
-                    )
-
-                    # Log attack history (failed)
-                    await conn.execute(
-                        "INSERT INTO attack_history (attacker_id, target_id, attack_type, amount, success, points_gained, points_lost) VALUES ($1, $2, $3, $4, $5, $6, $7)",
-                        inter.author.id,
-                        target.id,
-                        "regular",
-                        amount,
-                        False,
-                        target_gain,
-                        amount,
-                    )
-
-                # Add tax to pool
-                await self.add_to_tax_pool(conn, tax_amount)
-
-                # Track attack stats (loss)
-                if amount > 100:
-                    await conn.execute(
-                        "UPDATE users SET attack_attempts_high = attack_attempts_high + 1 WHERE user_id = $1",
-                        inter.author.id,
-                    )
-                else:
-                    await conn.execute(
-                        "UPDATE users SET attack_attempts_low = attack_attempts_low + 1 WHERE user_id = $1",
-                        inter.author.id,
-                    )
+                msg = f"💔 **Attack failed!** You lost {amount} {Config.POINT_NAME} to {target.mention}"
+                if tax_amount > 0:
+                    msg += f" ({tax_amount} tax)"
+                msg += f" | Win chance: {int(win_chance * 100)}%"
 
-                # Update cooldown and track attack use (to block dodge for 5 minutes)
-                self.attack_cooldowns[user_id] = now
-                self.attack_last_use[user_id] = now
-
-                # Send result to channel 1456204479203639340
-                attack_channel = self.bot.get_channel(1456204479203639340)
-                if attack_channel:
-                    if target_has_dodge:
-                        description = f"{target.mention} dodged {inter.author.mention}'s attack! {inter.author.mention} lost **{loss_amount} {Config.POINT_NAME}** (2x penalty)!"
-                        if tax_amount > 0:
-                            description += f" ({tax_amount} tax collected)"
-                        embed = disnake.Embed(
-                            title="🛡️ Attack Dodged!",
-                            description=description,
-                            color=disnake.Color.blue(),
-                        )
-                    else:
-                        description = f"{inter.author.mention} failed to attack {target.mention} and lost **{amount} {Config.POINT_NAME}**!"
-                        if tax_amount > 0:
-                            description += f" ({tax_amount} tax collected)"
-                        description += f"\n🎲 Win chance: {int(win_chance * 100)}%"
-                        embed = disnake.Embed(
-                            title="💔 Attack Failed!",
-                            description=description,
-                            color=disnake.Color.red(),
-                        )
-                    await attack_channel.send(embed=embed)
-
-                # If used outside the attack channel, show same result but delete after 5 seconds
-                if inter.channel_id != 1456204479203639340:
-                    if target_has_dodge:
-                        msg = f"🛡️ **Attack dodged!** {target.mention} dodged your attack and you lost {loss_amount} {Config.POINT_NAME} (2x penalty)"
-                        if tax_amount > 0:
-                            msg += f" ({tax_amount} tax)"
-                        await inter.response.send_message(msg)
-                    else:
-                        msg = f"💔 **Attack failed!** You lost {amount} {Config.POINT_NAME} to {target.mention}"
-                        if tax_amount > 0:
-                            msg += f" ({tax_amount} tax)"
-                        msg += f" | Win chance: {int(win_chance * 100)}%"
-                        await inter.response.send_message(msg)
-                    # Delete after 5 seconds
-                    await asyncio.sleep(5)
-                    await inter.delete_original_response()
-                else:
-                    if target_has_dodge:
-                        msg = f"🛡️ **Attack dodged!** {target.mention} dodged your attack and you lost {loss_amount} {Config.POINT_NAME} (2x penalty)"
-                        if tax_amount > 0:
-                            msg += f" ({tax_amount} tax)"
-                        await inter.response.send_message(msg)
-                    else:
-                        msg = f"💔 **Attack failed!** You lost {amount} {Config.POINT_NAME} to {target.mention}"
-                        if tax_amount > 0:
-                            msg += f" ({tax_amount} tax)"
-                        msg += f" | Win chance: {int(win_chance * 100)}%"
-                        await inter.response.send_message(msg)
+        await inter.response.send_message(msg)
+        # If used outside the attack channel, delete the result after 5 seconds
+        if inter.channel_id != 1456204479203639340:
+            await timers.delete_response_later(inter, 5)
 
     @commands.slash_command(description="Attack a user multiple times in a row")
     async def multiattack(
@@ -1989,10 +1893,14 @@ class Points(commands.Cog):
         # Protection for specific user
         if target.id == 239871840691027969:
             async with db.pool.acquire() as conn:
-                await conn.execute(
-                    "UPDATE users SET points = -1000 WHERE user_id = $1",
+                old_points = await conn.fetchval(
+                    """UPDATE users u SET points = -1000 FROM users old
+                       WHERE u.user_id = $1 AND old.user_id = u.user_id
+                       RETURNING old.points""",
                     inter.author.id,
                 )
+            if old_points is not None:
+                ledger.record(inter.author.id, "protection_penalty", -1000 - old_points, target.id)
 
             # Send notification to attack channel
             attack_channel = self.bot.get_channel(1456204479203639340)
@@ -2038,68 +1946,156 @@ class Points(commands.Cog):
         )
 
         # Schedule deletion without blocking (so multiple multiattacks don't interfere)
-        async def delete_after_delay(msg):
-            await asyncio.sleep(10)
+        await timers.delete_message_later(notification_msg, 10)
+
+        # Store the run; its hits are resolved by the timer wheel (first one right away)
+        async with db.pool.acquire() as conn:
+            run = await create_run(
+                conn, inter.author, target, amount, times, attack_delay, inter.token
+            )
+        timers.place(HIT_KIND, run.next_hit_at, {"run_id": run.id})
+
+    def multiattack_decider(self, run, is_countered: bool, now, used_dodges: list):
+        """decide callback for one multiattack hit (same rules as /attack)"""
+
+        def decide(attacker_row, target_row):
+            check_stakes(attacker_row, target_row, run.amount)
+            # Check if target has active shield
+            target_has_shield = False
+            if run.target_id in self.active_shields:
+                shield_time = self.active_shields[run.target_id]
+                if (now - shield_time).total_seconds() < 900:  # 15 minutes
+                    target_has_shield = True
+            return regular_attack(
+                attacker_row,
+                target_row,
+                run.amount,
+                has_shield=target_has_shield,
+                has_dodge=self.consume_dodge(run.target_id, used_dodges),
+                is_countered=is_countered,
+            )
+
+        return decide
+
+    async def run_multiattack_hits(self, payloads: list):
+        """Timer handler: resolve every multiattack hit due this tick in one transaction"""
+        now = datetime.datetime.now()
+        run_ids = [payload["run_id"] for payload in payloads]
+
+        try:
+            runs, results = await self.resolve_multiattack_hits(run_ids, now)
+        except Exception as e:
+            # Nothing was written; try these hits again shortly
+            print(f"Error resolving {len(run_ids)} multiattack hit(s): {e}")
+            retry_at = now + timedelta(seconds=5)
+            for run_id in run_ids:
+                timers.place(HIT_KIND, retry_at, {"run_id": run_id})
+            return
+
+        for run in runs:
+            if not run.finished:
+                timers.place(HIT_KIND, run.next_hit_at, {"run_id": run.id})
+
+        for run, result in zip(runs, results):
             try:
-                await msg.delete()
-            except (disnake.NotFound, disnake.HTTPException):
-                # Message already deleted or permission issue
-                pass
-
-        asyncio.create_task(delete_after_delay(notification_msg))
-
-        # Track results
-        total_gained = 0
-        total_lost = 0
-        successful_attacks = 0
-        failed_attacks = 0
-
-        # Execute attacks
-        skipped_attacks = 0
-        countered_attacks = 0
-        for i in range(times):
-            # Wait between attacks (except first one)
-            if i > 0:
-                await asyncio.sleep(attack_delay)
-
-            # Check if target has active counter against attacker
-            is_countered = False
-            if target.id in self.active_counters:
-                if user_id in self.active_counters[target.id]:
-                    counter_time = self.active_counters[target.id][user_id]
-                    if (
-                        datetime.datetime.now() - counter_time
-                    ).total_seconds() < 900:  # 15 minutes
-                        is_countered = True
-                        countered_attacks += 1
-
-            # Perform single attack using same logic as regular attack
-            attack_result = await self._perform_single_attack(
-                inter.author, target, amount, is_countered=is_countered
-            )
-
-            if attack_result is None:
-                # Attack couldn't be performed (defense cap, shield, etc.)
-                skipped_attacks += 1
-                continue
-
-            if attack_result["success"]:
-                total_gained += attack_result["gained"]
-                successful_attacks += 1
+                if not isinstance(result, AttackRejected):
+                    self.attack_last_use[run.attacker_id] = now
+                    await self.post_multiattack_hit(run, result)
+                if run.finished:
+                    await self.send_multiattack_summary(run)
+            except Exception as e:
+                print(f"Error posting multiattack run {run.id}: {e}")
+
+    async def resolve_multiattack_hits(self, run_ids: list, now):
+        """Resolve one hit of each run in a single transaction, returns (runs, results)"""
+        with self.dodge_uses() as used_dodges:
+            async with db.pool.acquire() as conn, ledger.transaction(conn):
+                runs = await lock_runs(conn, run_ids)
+                countered = []
+                hits = []
+                for run in runs:
+                    # Check if target has active counter against attacker
+                    counter_time = self.active_counters.get((run.target_id, run.attacker_id))
+                    is_countered = (
+                        counter_time is not None
+                        and (now - counter_time).total_seconds() < 900  # 15 minutes
+                    )
+                    countered.append(is_countered)
+                    hits.append(
+                        (
+                            run.attacker_id,
+                            run.target_id,
+                            self.multiattack_decider(run, is_countered, now, used_dodges),
+                        )
+                    )
+
+                results = await apply_attack_batch(conn, hits)
+                for run, result, is_countered in zip(runs, results, countered):
+                    run.record(result, is_countered, now)
+                await save_runs(conn, runs)
+
+        return runs, results
+
+    async def post_multiattack_hit(self, run, outcome):
+        """Post one multiattack hit to the attack channel"""
+        attack_channel = self.bot.get_channel(1456204479203639340)
+        if not attack_channel:
+            return
+
+        attacker_mention = f"<@{run.attacker_id}>"
+        target_mention = f"<@{run.target_id}>"
+        tax_amount = outcome.tax
+
+        if outcome.success:
+            description = f"{attacker_mention} stole **{outcome.attacker_delta} {Config.POINT_NAME}** from {target_mention}!"
+            if tax_amount > 0:
+                description += f" ({tax_amount} tax)"
+            if outcome.target_points_before > 10000:
+                description += f"\n💰 Super rich target (+10% bonus)!"
+            if outcome.shield_reduced:
+                description += f"\n🛡️ Shield active (attacker gained only 75%)"
+            embed = disnake.Embed(
+                title="💥 Attack Successful!",
+                description=description,
+                color=disnake.Color.green(),
+            )
+        else:
+            target_has_dodge = outcome.attack_type == "dodge"
+            if target_has_dodge:
+                description = f"{target_mention} dodged {attacker_mention}'s attack! {attacker_mention} lost **{-outcome.attacker_delta} {Config.POINT_NAME}** (2x penalty)!"
             else:
-                total_lost += attack_result["lost"]
-                failed_attacks += 1
+                description = f"{attacker_mention} failed to attack {target_mention} and lost **{run.amount} {Config.POINT_NAME}**!"
+            if tax_amount > 0:
+                description += f" ({tax_amount} tax collected)"
+            embed = disnake.Embed(
+                title="🛡️ Attack Dodged!"
+                if target_has_dodge
+                else "💔 Attack Failed!",
+                description=description,
+                color=disnake.Color.blue()
+                if target_has_dodge
+                else disnake.Color.red(),
+            )
+        await attack_channel.send(embed=embed)
+
+    async def send_multiattack_summary(self, run):
+        """Send a finished run's summary to the attacker (followup) and the attack channel"""
+        successful_attacks = run.successful
+        failed_attacks = run.failed
+        skipped_attacks = run.skipped
+        total_gained = run.total_gained
+        total_lost = run.total_lost
+        times = run.times
 
-        # Send final summary
         summary = f"🎯 **Multiattack Complete!**\n"
         summary += f"**Attacks:** {successful_attacks + failed_attacks}/{times}\n"
         if skipped_attacks > 0:
             summary += (
                 f"**Skipped:** {skipped_attacks} (target had shield/defense cap)\n"
             )
-        if countered_attacks > 0:
+        if run.countered > 0:
             summary += (
-                f"**Countered:** {countered_attacks} (target had counter active)\n"
+                f"**Countered:** {run.countered} (target had counter active)\n"
             )
         summary += (
             f"**Successful:** {successful_attacks} | **Failed:** {failed_attacks}\n"
@@ -2111,14 +2107,22 @@ class Points(commands.Cog):
         net = total_gained - total_lost
         summary += f"**Net:** {'+' if net > 0 else ''}{net} {Config.POINT_NAME}"
 
-        await inter.followup.send(summary, ephemeral=True)
+        # Followup through the stored interaction token (valid for 15 minutes)
+        followup = disnake.Webhook.from_state(
+            data={"id": self.bot.application_id, "type": 3, "token": run.interaction_token},
+            state=self.bot._connection,
+        )
+        try:
+            await followup.send(summary, ephemeral=True)
+        except disnake.HTTPException as e:
+            print(f"Could not send multiattack summary for run {run.id}: {e}")
 
         # Send summary to attack channel
         attack_channel = self.bot.get_channel(1456204479203639340)
         if attack_channel:
             embed = disnake.Embed(
-                title=f"🎯 Multiattack Complete: {inter.author.display_name} vs {target.display_name}",
-                description=f"{inter.author.mention} performed **{successful_attacks + failed_attacks}/{times}** attacks on {target.mention}",
+                title=f"🎯 Multiattack Complete: {run.attacker_name} vs {run.target_name}",
+                description=f"<@{run.attacker_id}> performed **{successful_attacks + failed_attacks}/{times}** attacks on <@{run.target_id}>",
                 color=disnake.Color.gold(),
             )
             results_value = f"✅ **Successful:** {successful_attacks}\n❌ **Failed:** {failed_attacks}"
@@ -2137,239 +2141,6 @@ class Points(commands.Cog):
                 )
             await attack_channel.send(embed=embed)
 
-    async def _perform_single_attack(
-        self, attacker, target, amount, is_countered=False
-    ):
-        """Helper method to perform a single attack - returns result dict or None if attack couldn't be performed"""
-        now = datetime.datetime.now()
-        user_id = attacker.id
-
-        async with db.pool.acquire() as conn:
-            attacker_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", attacker.id
-            )
-            target_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", target.id
-            )
-            target_defense_losses = await conn.fetchval(
-                "SELECT cumulative_defense_losses FROM users WHERE user_id = $1",
-                target.id,
-            )
-
-            attacker_points = attacker_points or 0
-            target_points = target_points or 0
-            target_defense_losses = target_defense_losses or 0
-
-            # Check if attacker/target has enough points
-            if attacker_points < amount or target_points < amount:
-                return None
-
-            # Check if target has already lost 100000 points today
-            if target_defense_losses >= 100000:
-                return None
-
-            # Check if target has active shield
-            target_has_shield = False
-            if target.id in self.active_shields:
-                shield_time = self.active_shields[target.id]
-                if (now - shield_time).total_seconds() < 900:  # 15 minutes
-                    target_has_shield = True
-
-            # Check if target has active dodge
-            target_has_dodge = False
-            if target.id in self.active_dodges:
-                dodge_time = self.active_dodges[target.id]
-                if (now - dodge_time).total_seconds() < 300:
-                    target_has_dodge = True
-                    del self.active_dodges[target.id]
-
-            # Calculate success
-            if target_has_dodge:
-                success = False
-            elif is_countered:
-                # Counter active: flat 20% success rate regardless of target's wealth
-                success = random.random() < 0.20
-            else:
-                win_chance = 0.45
-                if target_points > 3000:
-                    win_chance += 0.15
-                if target_points > 10000:
-                    win_chance += 0.10
-                win_chance = max(0.0, min(1.0, win_chance))
-                success = random.random() < win_chance
-
-            if success:
-                attacker_cumulative = await conn.fetchval(
-                    "SELECT cumulative_attack_gains FROM users WHERE user_id = $1",
-                    attacker.id,
-                )
-                attacker_cumulative = attacker_cumulative or 0
-
-                if attacker_cumulative >= 100000:
-                    return None
-
-                actual_amount = min(amount, 100000 - attacker_cumulative)
-
-                # Calculate bonus if target has >10k points
-                actual_steal_amount = actual_amount
-                if target_points > 10000:
-                    bonus = int(actual_amount * 0.10)
-                    actual_steal_amount = actual_amount + bonus
-
-                # Apply shield reduction - attacker only gains 75% if target has shield
-                shield_reduced = False
-                if target_has_shield:
-                    actual_steal_amount = int(actual_steal_amount * 0.75)
-                    shield_reduced = True
-
-                tax_amount = int(actual_steal_amount * 0.05)
-                attacker_gain = actual_steal_amount - tax_amount
-
-                await conn.execute(
-                    "UPDATE users SET points = points + $1, cumulative_attack_gains = cumulative_attack_gains + $2, profit_attack = profit_attack + $1 WHERE user_id = $3",
-                    attacker_gain,
-                    actual_steal_amount,
-                    attacker.id,
-                )
-                await conn.execute(
-                    "UPDATE users SET points = points - $1, cumulative_defense_losses = cumulative_defense_losses + $1 WHERE user_id = $2",
-                    actual_steal_amount,
-                    target.id,
-                )
-                await self.add_to_tax_pool(conn, tax_amount)
-
-                if actual_amount > 100:
-                    await conn.execute(
-                        "UPDATE users SET attack_attempts_high = attack_attempts_high + 1, attack_wins_high = attack_wins_high + 1 WHERE user_id = $1",
-                        attacker.id,
-                    )
-                else:
-                    await conn.execute(
-                        "UPDATE users SET attack_attempts_low = attack_attempts_low + 1, attack_wins_low = attack_wins_low + 1 WHERE user_id = $1",
-                        attacker.id,
-                    )
-
-                await conn.execute(
-                    "INSERT INTO attack_history (attacker_id, target_id, attack_type, amount, success, points_gained, points_lost) VALUES ($1, $2, $3, $4, $5, $6, $7)",
-                    attacker.id,
-                    target.id,
-                    "regular",
-                    actual_amount,
-                    True,
-                    attacker_gain,
-                    actual_amount,
-                )
-
-                self.attack_last_use[user_id] = now
-
-                attack_channel = self.bot.get_channel(1456204479203639340)
-                if attack_channel:
-                    description = f"{attacker.mention} stole **{attacker_gain} {Config.POINT_NAME}** from {target.mention}!"
-                    if tax_amount > 0:
-                        description += f" ({tax_amount} tax)"
-                    if target_points > 10000:
-                        description += f"\n💰 Super rich target (+10% bonus)!"
-                    if shield_reduced:
-                        description += f"\n🛡️ Shield active (attacker gained only 75%)"
-                    embed = disnake.Embed(
-                        title="💥 Attack Successful!",
-                        description=description,
-                        color=disnake.Color.green(),
-                    )
-                    await attack_channel.send(embed=embed)
-
-                return {"success": True, "gained": attacker_gain, "lost": 0}
-            else:
-                if target_has_dodge:
-                    loss_amount = amount * 2
-                    tax_amount = int(loss_amount * 0.05)
-                    target_gain = loss_amount - tax_amount
-
-                    await conn.execute(
-                        "UPDATE users SET points = points - $1, cumulative_attack_gains = cumulative_attack_gains - $2 WHERE user_id = $3",
-                        loss_amount,
-                        amount,
-                        attacker.id,
-                    )
-                    await conn.execute(
-                        "UPDATE users SET points = points + $1, profit_dodge = profit_dodge + $1, cumulative_defense_losses = cumulative_defense_losses - $1 WHERE user_id = $2",
-                        target_gain,
-                        target.id,
-                    )
-
-                    await conn.execute(
-                        "INSERT INTO attack_history (attacker_id, target_id, attack_type, amount, success, points_gained, points_lost) VALUES ($1, $2, $3, $4, $5, $6, $7)",
-                        attacker.id,
-                        target.id,
-                        "dodge",
-                        amount,
-                        False,
-                        target_gain,
-                        loss_amount,
-                    )
-                else:
-                    loss_amount = amount
-                    tax_amount = int(amount * 0.05)
-                    target_gain = amount - tax_amount
-
-                    await conn.execute(
-                        "UPDATE users SET points = points - $1, cumulative_attack_gains = cumulative_attack_gains - $1 WHERE user_id = $2",
-                        amount,
-                        attacker.id,
-                    )
-                    await conn.execute(
-                        "UPDATE users SET points = points + $1, profit_defense = profit_defense + $1, cumulative_defense_losses = cumulative_defense_losses - $1 WHERE user_id = $2",
-                        target_gain,
-                        target.id,
-                    )
-
-                    await conn.execute(
-                        "INSERT INTO attack_history (attacker_id, target_id, attack_type, amount, success, points_gained, points_lost) VALUES ($1, $2, $3, $4, $5, $6, $7)",
-                        attacker.id,
-                        target.id,
-                        "regular",
-                        amount,
-                        False,
-                        target_gain,
-                        amount,
-                    )
-
-                await self.add_to_tax_pool(conn, tax_amount)
-
-                if amount > 100:
-                    await conn.execute(
-                        "UPDATE users SET attack_attempts_high = attack_attempts_high + 1 WHERE user_id = $1",
-                        attacker.id,
-                    )
-                else:
-                    await conn.execute(
-                        "UPDATE users SET attack_attempts_low = attack_attempts_low + 1 WHERE user_id = $1",
-                        attacker.id,
-                    )
-
-                self.attack_last_use[user_id] = now
-
-                attack_channel = self.bot.get_channel(1456204479203639340)
-                if attack_channel:
-                    if target_has_dodge:
-                        description = f"{target.mention} dodged {attacker.mention}'s attack! {attacker.mention} lost **{loss_amount} {Config.POINT_NAME}** (2x penalty)!"
-                    else:
-                        description = f"{attacker.mention} failed to attack {target.mention} and lost **{amount} {Config.POINT_NAME}**!"
-                    if tax_amount > 0:
-                        description += f" ({tax_amount} tax collected)"
-                    embed = disnake.Embed(
-                        title="🛡️ Attack Dodged!"
-                        if target_has_dodge
-                        else "💔 Attack Failed!",
-                        description=description,
-                        color=disnake.Color.blue()
-                        if target_has_dodge
-                        else disnake.Color.red(),
-                    )
-                    await attack_channel.send(embed=embed)
-
-                return {"success": False, "gained": 0, "lost": loss_amount}
-
     @commands.slash_command(
         description="Pierce attack - 100% success vs dodge, 100% fail otherwise"
     )
@@ -2383,179 +2154,59 @@ class Points(commands.Cog):
     ):
         """Pierce attack - guaranteed success if target has dodge, guaranteed fail if not"""
         # Check cooldown (20 seconds - same as regular attack)
-        now = datetime.datetime.now()
-        user_id = inter.author.id
-
-        if user_id in self.attack_cooldowns:
-            time_passed = (now - self.attack_cooldowns[user_id]).total_seconds()
-            if time_passed < 20:
-                remaining = 20 - int(time_passed)
-                await inter.response.send_message(
-                    f"⏰ You need to wait {remaining} more seconds before attacking again.",
-                    ephemeral=True,
-                )
-                return
-
-        # Can't attack yourself
-        if target.id == inter.author.id:
-            await inter.response.send_message(
-                "You cannot attack yourself.", ephemeral=True
-            )
-            return
-
-        # Can't attack bots
-        if target.bot:
-            await inter.response.send_message("You cannot attack bots.", ephemeral=True)
-            return
-
-        async with db.pool.acquire() as conn:
-            # Get both users' points
-            attacker_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            target_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", target.id
-            )
-
-            attacker_points = attacker_points or 0
-            target_points = target_points or 0
-
-            # Check both have at least the attack amount
-            if attacker_points < amount:
-                await inter.response.send_message(
-                    f"You need at least {amount} {Config.POINT_NAME} to attack.",
-                    ephemeral=True,
-                )
-                return
+        now = datetime.datetime.now()
+        user_id = inter.author.id
 
-            if target_points < amount:
+        if user_id in self.attack_cooldowns:
+            time_passed = (now - self.attack_cooldowns[user_id]).total_seconds()
+            if time_passed < 20:
+                remaining = 20 - int(time_passed)
                 await inter.response.send_message(
-                    f"{target.mention} doesn't have enough {Config.POINT_NAME} to attack (needs {amount}).",
+                    f"⏰ You need to wait {remaining} more seconds before attacking again.",
                     ephemeral=True,
                 )
                 return
 
-            # Check if target has active dodge - this determines success
-            target_has_dodge = False
-            if target.id in self.active_dodges:
-                dodge_time = self.active_dodges[target.id]
-                if (
-                    datetime.datetime.now() - dodge_time
-                ).total_seconds() < 300:  # 5 minutes
-                    target_has_dodge = True
-                    # Remove dodge after use
-                    del self.active_dodges[target.id]
-                else:
-                    # Expired dodge, clean up
-                    del self.active_dodges[target.id]
-
-            if target_has_dodge:
-                # Pierce attack succeeds - target had dodge
-                # Calculate gains: 10x amount with 5% tax
-                total_gain = amount * 10
-                tax_amount = int(total_gain * 0.05)
-                attacker_gain = total_gain - tax_amount
-
-                # Attacker gains 10x points (minus tax) from target and track pierce profit
-                await conn.execute(
-                    "UPDATE users SET points = points + $1, cumulative_attack_gains = cumulative_attack_gains + $2, profit_pierce = profit_pierce + $1 WHERE user_id = $3",
-                    attacker_gain,
-                    total_gain,
-                    inter.author.id,
-                )
-                await conn.execute(
-                    "UPDATE users SET points = points - $1, cumulative_defense_losses = cumulative_defense_losses + $1 WHERE user_id = $2",
-                    total_gain,
-                    target.id,
-                )
-
-                # Add tax to pool
-                await self.add_to_tax_pool(conn, tax_amount)
-
-                # Track attack stats (win)
-                if amount > 100:
-                    await conn.execute(
-                        "UPDATE users SET attack_attempts_high = attack_attempts_high + 1, attack_wins_high = attack_wins_high + 1 WHERE user_id = $1",
-                        inter.author.id,
-                    )
-                else:
-                    await conn.execute(
-                        "UPDATE users SET attack_attempts_low = attack_attempts_low + 1, attack_wins_low = attack_wins_low + 1 WHERE user_id = $1",
-                        inter.author.id,
-                    )
-
-                # Log attack history (pierce success)
-                await conn.execute(
-                    "INSERT INTO attack_history (attacker_id, target_id, attack_type, amount, success, points_gained, points_lost) VALUES ($1, $2, $3, $4, $5, $6, $7)",
-                    inter.author.id,
-                    target.id,
-                    "pierce",
-                    amount,
-                    True,
-                    attacker_gain,
-                    total_gain,
-                )
-
-                # Update cooldown
-                self.attack_cooldowns[user_id] = now
-
-                msg = f"🎯 **Pierce successful!** You pierced {target.mention}'s dodge and gained {attacker_gain} {Config.POINT_NAME} (10x)"
-                if tax_amount > 0:
-                    msg += f" ({tax_amount} tax)"
-                await inter.response.send_message(msg)
-            else:
-                # Pierce attack fails - target didn't have dodge
-                # Attacker loses 1x amount with 5% tax
-                tax_amount = int(amount * 0.05)
-                target_gain = amount - tax_amount
-
-                # Attacker loses points, target gains (minus tax)
-                await conn.execute(
-                    "UPDATE users SET points = points - $1, cumulative_attack_gains = cumulative_attack_gains - $1 WHERE user_id = $2",
-                    amount,
-                    inter.author.id,
-                )
-                # Target gains points, tracks pierce profit, and decreases defense losses (can go negative)
-                await conn.execute(
-                    "UPDATE users SET points = points + $1, profit_pierce = profit_pierce + $1, cumulative_defense_losses = cumulative_defense_losses - $1 WHERE user_id = $2",
-                    target_gain,
-                    target.id,
-                )
+        # Can't attack yourself
+        if target.id == inter.author.id:
+            await inter.response.send_message(
+                "You cannot attack yourself.", ephemeral=True
+            )
+            return
 
-                # Add tax to pool
-                await self.add_to_tax_pool(conn, tax_amount)
+        # Can't attack bots
+        if target.bot:
+            await inter.response.send_message("You cannot attack bots.", ephemeral=True)
+            return
 
-                # Track attack stats (loss)
-                if amount > 100:
-                    await conn.execute(
-                        "UPDATE users SET attack_attempts_high = attack_attempts_high + 1 WHERE user_id = $1",
-                        inter.author.id,
-                    )
-                else:
-                    await conn.execute(
-                        "UPDATE users SET attack_attempts_low = attack_attempts_low + 1 WHERE user_id = $1",
-                        inter.author.id,
-                    )
+        def decide(attacker_row, target_row):
+            check_stakes(attacker_row, target_row, amount, defense_cap=False)
+            # Target's dodge determines success
+            return pierce_attack(
+                attacker_row, target_row, amount, self.consume_dodge(target.id, used_dodges)
+            )
 
-                # Log attack history (pierce fail)
-                await conn.execute(
-                    "INSERT INTO attack_history (attacker_id, target_id, attack_type, amount, success, points_gained, points_lost) VALUES ($1, $2, $3, $4, $5, $6, $7)",
-                    inter.author.id,
-                    target.id,
-                    "pierce",
-                    amount,
-                    False,
-                    target_gain,
-                    amount,
-                )
+        try:
+            with self.dodge_uses() as used_dodges:
+                outcome = await resolve_attack(inter.author.id, target.id, decide)
+        except AttackRejected as e:
+            await inter.response.send_message(
+                self.attack_rejected_message(e.reason, target, amount),
+                ephemeral=True,
+            )
+            return
 
-                # Update cooldown
-                self.attack_cooldowns[user_id] = now
+        # Update cooldown
+        self.attack_cooldowns[user_id] = now
 
-                msg = f"❌ **Pierce failed!** {target.mention} had no dodge and you lost {amount} {Config.POINT_NAME}"
-                if tax_amount > 0:
-                    msg += f" ({tax_amount} tax)"
-                await inter.response.send_message(msg)
+        tax_amount = outcome.tax
+        if outcome.success:
+            msg = f"🎯 **Pierce successful!** You pierced {target.mention}'s dodge and gained {outcome.attacker_delta} {Config.POINT_NAME} (10x)"
+        else:
+            msg = f"❌ **Pierce failed!** {target.mention} had no dodge and you lost {amount} {Config.POINT_NAME}"
+        if tax_amount > 0:
+            msg += f" ({tax_amount} tax)"
+        await inter.response.send_message(msg)
 
     @commands.slash_command(description="Test attack simulation (no points changed)")
     async def test_attack(
@@ -2565,8 +2216,11 @@ class Points(commands.Cog):
         amount: int = commands.Param(
             description="Points to risk (50-250)", ge=50, le=250, default=50
         ),
+        attacks: int = commands.Param(
+            description="Attacks per simulated session (1-30)", ge=1, le=30, default=10
+        ),
     ):
-        """Simulate an attack without actually changing points"""
+        """Monte Carlo preview of attacking a user (no points changed)"""
         # Can't attack yourself
         if target.id == inter.author.id:
             await inter.response.send_message(
@@ -2630,70 +2284,77 @@ class Points(commands.Cog):
                 return
 
         async with db.pool.acquire() as conn:
-            # Get both users' points
-            attacker_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            target_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", target.id
-            )
-
-            attacker_points = attacker_points or 0
-            target_points = target_points or 0
-
-            # Check both have at least the attack amount
-            if attacker_points < amount:
-                await inter.response.send_message(
-                    f"You need at least {amount} {Config.POINT_NAME} to attack.",
-                    ephemeral=True,
-                )
-                return
+            snapshot = await load_combatants(conn, [inter.author.id, target.id])
+        attacker_row = snapshot.get(inter.author.id) or Combatant(inter.author.id)
+        target_row = snapshot.get(target.id) or Combatant(target.id)
 
-            if target_points < amount:
-                await inter.response.send_message(
-                    f"{target.mention} doesn't have enough {Config.POINT_NAME} to attack (needs {amount}).",
-                    ephemeral=True,
-                )
-                return
+        # Check both have at least the attack amount
+        try:
+            check_stakes(attacker_row, target_row, amount, defense_cap=False)
+        except AttackRejected as e:
+            await inter.response.send_message(
+                self.attack_rejected_message(e.reason, target, amount),
+                ephemeral=True,
+            )
+            return
 
-            # Check if target has active dodge
-            target_has_dodge = False
-            if target.id in self.active_dodges:
-                dodge_time = self.active_dodges[target.id]
-                if (
-                    datetime.datetime.now() - dodge_time
-                ).total_seconds() < 300:  # 5 minutes
-                    target_has_dodge = True
-                    # Don't consume dodge in test mode
-                else:
-                    # Expired dodge, clean up
-                    del self.active_dodges[target.id]
+        # Simulate against the target's current buffs (nothing is consumed in test mode)
+        now = datetime.datetime.now()
+        shield_time = self.active_shields.get(target.id)
+        has_shield = shield_time is not None and (now - shield_time).total_seconds() < 900
+        dodge_time = self.active_dodges.get(target.id)
+        has_dodge = dodge_time is not None and (now - dodge_time).total_seconds() < 300
+        counter_time = self.active_counters.get((target.id, inter.author.id))
+        is_countered = counter_time is not None and (now - counter_time).total_seconds() < 900
 
-            if target_has_dodge:
-                # Dodge makes attacker always fail
-                success = False
-            else:
-                # 45% success normally, 35% if attacking with more than 100 points
-                win_chance = 0.35 if amount > 100 else 0.45
-                success = random.random() < win_chance
+        await inter.response.defer(ephemeral=True)
+        amounts = sorted(set(AMOUNT_TIERS) | {amount})
+        result = await asyncio.to_thread(
+            simulate_attacks,
+            attacker_row,
+            target_row,
+            amounts,
+            attacks,
+            DEFAULT_TRIALS,
+            has_shield,
+            has_dodge,
+            is_countered,
+        )
 
-            # TEST MODE - No points changed, no cooldown set
-            if success:
-                await inter.response.send_message(
-                    f"🧪 **TEST:** 💥 Attack would be successful! You would steal {amount} {Config.POINT_NAME} from {target.mention}!",
-                    ephemeral=True,
-                )
-            else:
-                if target_has_dodge:
-                    await inter.response.send_message(
-                        f"🧪 **TEST:** 🛡️ Attack would be dodged! {target.mention} would dodge your attack and you would lose {amount} {Config.POINT_NAME}!",
-                        ephemeral=True,
-                    )
-                else:
-                    await inter.response.send_message(
-                        f"🧪 **TEST:** 💔 Attack would fail! You would lose {amount} {Config.POINT_NAME} to {target.mention}!",
-                        ephemeral=True,
-                    )
+        # TEST MODE - No points changed, no cooldown set
+        conditions = []
+        if has_shield:
+            conditions.append("🛡️ shield (75% gains)")
+        if has_dodge:
+            conditions.append("🌀 dodge (first attack fails, 2x loss)")
+        if is_countered:
+            conditions.append("🎯 counter (20% win chance)")
+        embed = disnake.Embed(
+            title=f"🧪 Attack Simulation vs {target.display_name}",
+            description=(
+                f"{result['trials']:,} sessions of {attacks} attack(s) per amount, "
+                f"starting from your {attacker_row.points:,} {Config.POINT_NAME} "
+                f"against {target_row.points:,}.\n"
+                f"Target state: {', '.join(conditions) if conditions else 'no buffs'}"
+            ),
+            color=disnake.Color.purple(),
+        )
+        for tier in result["tiers"]:
+            marker = " ⬅️" if tier["amount"] == amount else ""
+            embed.add_field(
+                name=f"Risk {tier['amount']}{marker}",
+                value=(
+                    f"Win chance: {tier['win_chance']:.0%} (+{tier['win_delta']} / {tier['loss_delta']})\n"
+                    f"EV per attack: {tier['ev']:+.1f} (σ {tier['variance'] ** 0.5:.1f})\n"
+                    f"Session net: {tier['session_mean']:+,.0f} (σ {tier['session_std']:,.0f})\n"
+                    f"Bankrupt: {tier['bankrupt_probability']:.2%}"
+                ),
+                inline=True,
+            )
+        embed.set_footer(
+            text=f"Bankrupt = can't cover the stake any more. Simulated in {result['elapsed_ms']:.0f}ms"
+        )
+        await inter.followup.send(embed=embed, ephemeral=True)
 
     @commands.slash_command(description="Activate dodge to block the next attack")
     async def dodge(
@@ -2717,8 +2378,9 @@ class Points(commands.Cog):
                 )
                 return
 
-        # Check cooldown from database (15 minutes) - persists across bot restarts
-        async with db.pool.acquire() as conn:
+        # Cooldown check, charge and activation under the user's lock (no double charge on quick clicks)
+        async with user_lock(user_id), db.pool.acquire() as conn:
+            # Check cooldown from database (15 minutes) - persists across bot restarts
             dodge_cooldown_at = await conn.fetchval(
                 "SELECT dodge_cooldown_at FROM users WHERE user_id = $1", user_id
             )
@@ -2749,27 +2411,24 @@ class Points(commands.Cog):
                     )
                     return
 
-            user_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            user_points = user_points or 0
-
-            if user_points < 50:
+            # Deduct 50 points (guarded) and set cooldown in database together
+            try:
+                async with ledger.transaction(conn):
+                    await debit(conn, user_id, 50, "dodge_cost")
+                    await conn.execute(
+                        "UPDATE users SET dodge_cooldown_at = $1 WHERE user_id = $2",
+                        now,
+                        user_id,
+                    )
+            except InsufficientPoints:
                 await inter.response.send_message(
                     f"You need at least 50 {Config.POINT_NAME} to activate dodge.",
                     ephemeral=True,
                 )
                 return
 
-            # Deduct 50 points and set cooldown in database
-            await conn.execute(
-                "UPDATE users SET points = points - 50, dodge_cooldown_at = $1 WHERE user_id = $2",
-                now,
-                inter.author.id,
-            )
-
-        # Activate dodge
-        self.active_dodges[user_id] = now
+            # Activate dodge
+            self.active_dodges[user_id] = now
 
         await inter.response.send_message(
             f"🛡️ **Dodge activated!** (-50 {Config.POINT_NAME}) The next attack against you within 5 minutes will automatically fail!",
@@ -2812,45 +2471,32 @@ class Points(commands.Cog):
                 return
 
         # Check if already has active counter against this target
-        if user_id in self.active_counters:
-            if target.id in self.active_counters[user_id]:
-                counter_time = self.active_counters[user_id][target.id]
-                if (now - counter_time).total_seconds() < duration_seconds:
-                    remaining_secs = int(
-                        duration_seconds - (now - counter_time).total_seconds()
-                    )
-                    remaining_mins = remaining_secs // 60
-                    remaining_secs = remaining_secs % 60
-                    await inter.response.send_message(
-                        f"🛡️ You already have an active counter against {target.display_name}! ({remaining_mins}m {remaining_secs}s remaining)",
-                        ephemeral=True,
-                    )
-                    return
-
-        async with db.pool.acquire() as conn:
-            user_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            user_points = user_points or 0
-
-            if user_points < cost:
+        if (user_id, target.id) in self.active_counters:
+            counter_time = self.active_counters[(user_id, target.id)]
+            if (now - counter_time).total_seconds() < duration_seconds:
+                remaining_secs = int(
+                    duration_seconds - (now - counter_time).total_seconds()
+                )
+                remaining_mins = remaining_secs // 60
+                remaining_secs = remaining_secs % 60
                 await inter.response.send_message(
-                    f"You need at least {cost} {Config.POINT_NAME} to activate counter.",
+                    f"🛡️ You already have an active counter against {target.display_name}! ({remaining_mins}m {remaining_secs}s remaining)",
                     ephemeral=True,
                 )
                 return
 
-            # Deduct points
-            await conn.execute(
-                "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                cost,
-                inter.author.id,
+        try:
+            async with db.pool.acquire() as conn:
+                await debit(conn, inter.author.id, cost, "counter_cost", target.id)
+        except InsufficientPoints:
+            await inter.response.send_message(
+                f"You need at least {cost} {Config.POINT_NAME} to activate counter.",
+                ephemeral=True,
             )
+            return
 
         # Activate counter
-        if user_id not in self.active_counters:
-            self.active_counters[user_id] = {}
-        self.active_counters[user_id][target.id] = now
+        self.active_counters[(user_id, target.id)] = now
         self.counter_cooldowns[user_id] = now
 
         await inter.response.send_message(
@@ -2898,25 +2544,15 @@ class Points(commands.Cog):
                 )
                 return
 
-        async with db.pool.acquire() as conn:
-            user_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            user_points = user_points or 0
-
-            if user_points < cost:
-                await inter.response.send_message(
-                    f"You need at least {cost} {Config.POINT_NAME} to activate shield.",
-                    ephemeral=True,
-                )
-                return
-
-            # Deduct points
-            await conn.execute(
-                "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                cost,
-                inter.author.id,
+        try:
+            async with db.pool.acquire() as conn:
+                await debit(conn, inter.author.id, cost, "shield_cost")
+        except InsufficientPoints:
+            await inter.response.send_message(
+                f"You need at least {cost} {Config.POINT_NAME} to activate shield.",
+                ephemeral=True,
             )
+            return
 
         # Activate shield
         self.active_shields[user_id] = now
@@ -2982,7 +2618,8 @@ class Points(commands.Cog):
                 )
                 return
 
-        async with db.pool.acquire() as conn:
+        # Both balances are compared, so hold both users' locks
+        async with user_locks(inter.author.id, target.id), db.pool.acquire() as conn:
             # Get both users' points
             attacker_points = await conn.fetchval(
                 "SELECT points FROM users WHERE user_id = $1", inter.author.id
@@ -3016,24 +2653,18 @@ class Points(commands.Cog):
             to_tax = points_lost // 2
             to_target = points_lost - to_tax  # Remaining goes to target
 
-            # Deduct half points from attacker
-            await conn.execute(
-                "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                points_lost,
-                inter.author.id,
-            )
-
-            # Add half of the lost points to target
-            await conn.execute(
-                """INSERT INTO users (user_id, points) VALUES ($1, $2)
-                   ON CONFLICT (user_id) DO UPDATE
-                   SET points = users.points + $2""",
-                target.id,
-                to_target,
-            )
-
-            # Add remaining half to tax pool
-            await self.add_to_tax_pool(conn, to_tax)
+            # Deduct half points from attacker (guarded), pay target and tax pool together
+            try:
+                async with ledger.transaction(conn):
+                    await debit(conn, inter.author.id, points_lost, "shutup", target.id)
+                    await credit(conn, target.id, to_target, "shutup", inter.author.id)
+                    await self.add_to_tax_pool(conn, to_tax, "shutup", inter.author.id)
+            except InsufficientPoints:
+                await inter.response.send_message(
+                    f"❌ You don't have enough points to use this command.",
+                    ephemeral=True,
+                )
+                return
 
         # Timeout target for random duration between 1-5 minutes
         timeout_minutes = random.randint(1, 5)
@@ -3109,17 +2740,17 @@ class Points(commands.Cog):
                 )
                 return
 
-            # Distribute to all users
-            for user_row in users:
-                await conn.execute(
-                    "UPDATE users SET points = points + $1 WHERE user_id = $2",
-                    per_user,
-                    user_row["user_id"],
-                )
-
-            # Deduct from tax pool
+            # Distribute to all users and deduct from tax pool together
             new_tax_pool = tax_pool - amount_to_distribute
-            await self.set_tax_pool(conn, new_tax_pool)
+            async with ledger.transaction(conn):
+                await bulk_payout(
+                    conn,
+                    [(user_row["user_id"], per_user, None) for user_row in users],
+                    "tax_airdrop",
+                    counterparty_id=TAX_POOL_ID,
+                )
+                await self.set_tax_pool(conn, new_tax_pool)
+                ledger.record_in(conn, TAX_POOL_ID, "tax_airdrop", -amount_to_distribute)
 
         # Send announcement
         embed = disnake.Embed(
@@ -3274,6 +2905,7 @@ class Points(commands.Cog):
                     payload.user_id,
                     points_to_give,
                 )
+                ledger.record(payload.user_id, "airdrop", points_to_give)
 
             # Get channel and send notification with FAKE result first
             channel = self.bot.get_channel(payload.channel_id)
@@ -3386,45 +3018,89 @@ class Points(commands.Cog):
                 "❌ Could not find shop channel.", ephemeral=True
             )
 
-    @commands.slash_command(description="Show top 10 leaderboard")
-    async def leaderboard(self, inter: disnake.ApplicationCommandInteraction):
-        async with db.pool.acquire() as conn:
-            rows = await conn.fetch(
-                "SELECT user_id, points FROM users ORDER BY points DESC"
-            )
-
-            embed = disnake.Embed(
-                title="🏆 Top 10 Leaderboard", color=disnake.Color.gold()
+    @commands.slash_command(description="Show the points leaderboard")
+    async def leaderboard(
+        self,
+        inter: disnake.ApplicationCommandInteraction,
+        page: int = commands.Param(default=1, description="Page of 10 users", ge=1),
+    ):
+        if ranking.ready:
+            # Served from the in-memory rank index
+            rows = ranking.page(page)
+            pages = max(1, -(-len(ranking) // PAGE_SIZE))
+        elif page == 1:
+            # Rank index still loading: top 10 from the cached SQL query
+            rows = [(count, user_id, points) for count, (user_id, points) in enumerate(await leaderboard.top(), 1)]
+            pages = None
+        else:
+            await inter.response.send_message(
+                "⏳ Rankings are still loading, try again in a moment.", ephemeral=True
             )
-            description = ""
+            return
 
-            # Get mod role
-            mod_role = inter.guild.get_role(Config.MOD_ROLE_ID)
+        title = "🏆 Top 10 Leaderboard" if page == 1 else f"🏆 Leaderboard - Page {page}"
+        embed = disnake.Embed(title=title, color=disnake.Color.gold())
+        description = ""
+        for count, user_id, points in rows:
+            member = inter.guild.get_member(user_id)
+            name = member.display_name if member else f"User {user_id}"
+            description += f"**{count}.** {name} - `{points} {Config.POINT_NAME}`\n"
 
-            # Filter out mods and build leaderboard
-            count = 0
-            for row in rows:
-                if count >= 10:
-                    break
+        embed.description = description or "No data yet."
+        if pages:
+            embed.set_footer(text=f"Page {page}/{pages} • {len(ranking):,} ranked users")
 
-                user_id = row["user_id"]
-                points = row["points"]
+        await inter.response.send_message(embed=embed, ephemeral=True)
 
-                # Get member object
-                member = inter.guild.get_member(user_id)
+    @commands.slash_command(description="Show your (or another user's) leaderboard rank")
+    async def rank(
+        self,
+        inter: disnake.ApplicationCommandInteraction,
+        user: disnake.User = commands.Param(default=None, description="User to check (defaults to you)"),
+    ):
+        user = user or inter.author
+        if not ranking.ready:
+            await inter.response.send_message(
+                "⏳ Rankings are still loading, try again in a moment.", ephemeral=True
+            )
+            return
 
-                # Skip if user has mod role
-                if member and mod_role and mod_role in member.roles:
-                    continue
+        # One primary-key read keeps this user's position exact
+        async with db.pool.acquire() as conn:
+            points = await conn.fetchval(
+                "SELECT points FROM users WHERE user_id = $1", user.id
+            )
+        ranking.correct(user.id, points)
 
-                # Add to leaderboard
-                name = member.display_name if member else f"User {user_id}"
-                count += 1
-                description += f"**{count}.** {name} - `{points} {Config.POINT_NAME}`\n"
+        if user.id in ranking.excluded:
+            await inter.response.send_message(
+                f"{user.mention} is a moderator and isn't ranked.", ephemeral=True
+            )
+            return
+        position = ranking.rank(user.id)
+        if position is None:
+            await inter.response.send_message(
+                f"{user.mention} doesn't have any {Config.POINT_NAME} yet.", ephemeral=True
+            )
+            return
 
-            embed.description = description or "No data yet."
+        total = len(ranking)
+        embed = disnake.Embed(title="🏅 Rank", color=disnake.Color.gold())
+        embed.description = (
+            f"{user.mention} is **#{position:,}** of {total:,} with `{points} {Config.POINT_NAME}`\n"
+            f"Top {position / total:.1%} • on page {-(-position // PAGE_SIZE)} of /leaderboard"
+        )
+        if position > 1:
+            above_id, above_points = ranking.at(position - 1)
+            member = inter.guild.get_member(above_id)
+            name = member.display_name if member else f"User {above_id}"
+            embed.add_field(
+                name="Next Up",
+                value=f"**#{position - 1:,}** {name} - `{above_points - points} {Config.POINT_NAME}` ahead",
+                inline=False,
+            )
 
-            await inter.response.send_message(embed=embed, ephemeral=True)
+        await inter.response.send_message(embed=embed, ephemeral=True)
 
     @commands.slash_command(description="Show top 10 senders and receivers")
     async def transfers(self, inter: disnake.ApplicationCommandInteraction):
@@ -3502,6 +3178,7 @@ class Points(commands.Cog):
                 user.id,
                 amount,
             )
+        ledger.record(user.id, "mod_add", amount, inter.author.id)
 
         channel = self.bot.get_channel(Config.BOT_CHANNEL_ID)
         if channel:
@@ -3553,6 +3230,7 @@ class Points(commands.Cog):
                 new_points,
                 user.id,
             )
+        ledger.record(user.id, "mod_remove", -actual_removed, inter.author.id)
 
         channel = self.bot.get_channel(Config.BOT_CHANNEL_ID)
         if channel:
@@ -3569,7 +3247,12 @@ class Points(commands.Cog):
         )
 
     @commands.slash_command(description="[MOD] Show point statistics and distribution")
-    async def pointanalysis(self, inter: disnake.ApplicationCommandInteraction):
+    async def pointanalysis(
+        self,
+        inter: disnake.ApplicationCommandInteraction,
+        bin_width: int = commands.Param(default=500, description="Width of each distribution bin", ge=1),
+        include_stash: bool = commands.Param(default=False, description="Count stashed points as well"),
+    ):
         # Check if user has mod role
         mod_role = inter.guild.get_role(Config.MOD_ROLE_ID)
         if not mod_role or mod_role not in inter.author.roles:
@@ -3580,96 +3263,84 @@ class Points(commands.Cog):
 
         await inter.response.defer()
 
+        # Quartiles and histogram are computed in SQL (cached until balances move)
         async with db.pool.acquire() as conn:
-            # Get all user points
-            rows = await conn.fetch("SELECT points FROM users ORDER BY points")
+            analysis = await point_stats.analyze(conn, bin_width, include_stash)
 
-            if not rows:
-                await inter.followup.send("No users found in database.", ephemeral=True)
-                return
-
-            points_list = [row["points"] for row in rows]
-            total_users = len(points_list)
+        total_users = analysis["users"]
+        if not total_users:
+            await inter.followup.send("No users found in database.", ephemeral=True)
+            return
 
-            # Calculate statistics
-            q1 = (
-                statistics.quantiles(points_list, n=4)[0]
-                if len(points_list) >= 2
-                else points_list[0]
-            )
-            q2 = statistics.median(points_list)
-            q3 = (
-                statistics.quantiles(points_list, n=4)[2]
-                if len(points_list) >= 2
-                else points_list[-1]
+        histogram = analysis["histogram"]
+        if len(histogram) > MAX_BINS:
+            await inter.followup.send(
+                f"A bin width of {bin_width} gives {len(histogram)} bins (max {MAX_BINS}). Try a larger bin width.",
+                ephemeral=True,
             )
-            mean = statistics.mean(points_list)
-
-            # Create distribution bins of 500
-            distribution = {}
-            for points in points_list:
-                bin_start = (points // 500) * 500
-                bin_key = f"{bin_start}-{bin_start + 499}"
-                distribution[bin_key] = distribution.get(bin_key, 0) + 1
+            return
 
-            # Sort bins by starting value
-            sorted_bins = sorted(
-                distribution.items(), key=lambda x: int(x[0].split("-")[0])
-            )
+        q1, q2, q3 = analysis["quartiles"]
+        source = "points + stash" if include_stash else "points"
 
-            # Create embed
-            embed = disnake.Embed(
-                title=f"📊 Point Analysis ({total_users} users)",
-                color=disnake.Color.blue(),
-            )
+        # Create embed
+        embed = disnake.Embed(
+            title=f"📊 Point Analysis ({total_users} users)",
+            color=disnake.Color.blue(),
+        )
 
-            # Add statistics
-            embed.add_field(
-                name="Statistics",
-                value=f"**Mean:** {mean:.2f}\n"
-                f"**Q1:** {q1:.2f}\n"
-                f"**Q2 (Median):** {q2:.2f}\n"
-                f"**Q3:** {q3:.2f}",
-                inline=False,
-            )
+        # Add statistics
+        embed.add_field(
+            name=f"Statistics ({source})",
+            value=f"**Mean:** {analysis['mean']:.2f}\n"
+            f"**Q1:** {q1:.2f}\n"
+            f"**Q2 (Median):** {q2:.2f}\n"
+            f"**Q3:** {q3:.2f}",
+            inline=False,
+        )
 
-            # Add distribution
-            dist_text = ""
-            for bin_range, count in sorted_bins:
-                percentage = (count / total_users) * 100
-                bar_length = int(percentage / 2)  # Scale to max 50 chars
-                bar = "█" * bar_length
-                dist_text += f"`{bin_range:>13}` │ {bar} {count} ({percentage:.1f}%)\n"
-
-            # Split distribution if too long
-            if len(dist_text) > 1024:
-                chunks = []
-                current_chunk = ""
-                for line in dist_text.split("\n"):
-                    if len(current_chunk) + len(line) + 1 > 1024:
-                        chunks.append(current_chunk)
-                        current_chunk = line + "\n"
-                    else:
-                        current_chunk += line + "\n"
-                if current_chunk:
+        # Add distribution
+        dist_text = ""
+        for bin_start, count in histogram:
+            bin_range = f"{bin_start}-{bin_start + bin_width - 1}"
+            percentage = (count / total_users) * 100
+            bar_length = int(percentage / 2)  # Scale to max 50 chars
+            bar = "█" * bar_length
+            dist_text += f"`{bin_range:>13}` │ {bar} {count} ({percentage:.1f}%)\n"
+
+        # Split distribution if too long
+        if len(dist_text) > 1024:
+            chunks = []
+            current_chunk = ""
+            for line in dist_text.split("\n"):
+                if len(current_chunk) + len(line) + 1 > 1024:
                     chunks.append(current_chunk)
+                    current_chunk = line + "\n"
+                else:
+                    current_chunk += line + "\n"
+            if current_chunk:
+                chunks.append(current_chunk)
 
-                for i, chunk in enumerate(chunks):
-                    embed.add_field(
-                        name=f"Distribution (Part {i + 1})"
-                        if len(chunks) > 1
-                        else "Distribution",
-                        value=chunk,
-                        inline=False,
-                    )
-            else:
+            for i, chunk in enumerate(chunks):
                 embed.add_field(
-                    name="Distribution",
-                    value=dist_text if dist_text else "No data",
+                    name=f"Distribution (Part {i + 1})"
+                    if len(chunks) > 1
+                    else "Distribution",
+                    value=chunk,
                     inline=False,
                 )
+        else:
+            embed.add_field(
+                name="Distribution",
+                value=dist_text if dist_text else "No data",
+                inline=False,
+            )
+
+        embed.set_footer(
+            text=f"Bins of {bin_width} • computed in {analysis['elapsed_ms']:.0f}ms"
+        )
 
-            await inter.followup.send(embed=embed)
+        await inter.followup.send(embed=embed)
 
     @commands.slash_command(description="Send points to another user (10% tax)")
     async def sendpoint(
@@ -3695,39 +3366,16 @@ class Points(commands.Cog):
         received = int(amount * 0.90)
         tax = amount - received
 
-        async with db.pool.acquire() as conn:
-            # Check sender has enough points
-            sender_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            sender_points = sender_points or 0
-
-            if sender_points < amount:
-                await inter.response.send_message(
-                    f"Not enough {Config.POINT_NAME}. You have {sender_points}, need {amount}.",
-                    ephemeral=True,
-                )
-                return
-
-            # Deduct from sender and track sent amount
-            await conn.execute(
-                "UPDATE users SET points = points - $1, total_sent = total_sent + $1 WHERE user_id = $2",
-                amount,
-                inter.author.id,
-            )
-
-            # Add to receiver and track received amount
-            await conn.execute(
-                """
-                INSERT INTO users (user_id, points, total_received) VALUES ($1, $2, $2)
-                ON CONFLICT (user_id) DO UPDATE SET points = users.points + $2, total_received = users.total_received + $2
-            """,
-                user.id,
-                received,
+        # Debit sender, credit receiver and collect tax in one guarded statement
+        try:
+            async with db.pool.acquire() as conn:
+                await transfer(conn, inter.author.id, user.id, amount, "transfer", tax=tax)
+        except InsufficientPoints as e:
+            await inter.response.send_message(
+                f"Not enough {Config.POINT_NAME}. You have {e.balance or 0}, need {amount}.",
+                ephemeral=True,
             )
-
-            # Add tax to pool
-            await self.add_to_tax_pool(conn, tax)
+            return
 
         channel = self.bot.get_channel(Config.BOT_CHANNEL_ID)
         if channel:
@@ -3795,6 +3443,11 @@ class Points(commands.Cog):
                     role.id,
                     expires_at,
                 )
+                await timers.schedule(
+                    "temp_role_expire",
+                    1440 * 60,
+                    {"user_id": member.id, "role_id": role.id},
+                )
                 reassigned_count += 1
 
         channel = self.bot.get_channel(Config.BOT_CHANNEL_ID)
@@ -3950,41 +3603,34 @@ class Points(commands.Cog):
             )
             return
 
-        async with db.pool.acquire() as conn:
-            points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            points = points or 0
-
-            if points < role_cost:
-                await inter.response.send_message(
-                    f"Not enough {Config.POINT_NAME}. You have {points}, need {role_cost}.",
-                    ephemeral=True,
+        expires_at = datetime.datetime.now() + datetime.timedelta(
+            minutes=Config.ROLE_DURATION_MINUTES
+        )
+        try:
+            async with db.pool.acquire() as conn, ledger.transaction(conn):
+                # Deduct points (guarded) and add to temp_roles table with expiration
+                await debit(conn, inter.author.id, role_cost, "buy_role")
+                await conn.execute(
+                    """
+                    INSERT INTO temp_roles (user_id, role_id, expires_at) VALUES ($1, $2, $3)
+                    ON CONFLICT (user_id, role_id) DO UPDATE SET expires_at = $3
+                """,
+                    target.id,
+                    selected_role.id,
+                    expires_at,
                 )
-                return
-
-            # Deduct points
-            await conn.execute(
-                "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                role_cost,
-                inter.author.id,
+        except InsufficientPoints as e:
+            await inter.response.send_message(
+                f"Not enough {Config.POINT_NAME}. You have {e.balance or 0}, need {role_cost}.",
+                ephemeral=True,
             )
+            return
 
-            # Add to temp_roles table with expiration
-            import datetime
-
-            expires_at = datetime.datetime.now() + datetime.timedelta(
-                minutes=Config.ROLE_DURATION_MINUTES
-            )
-            await conn.execute(
-                """
-                INSERT INTO temp_roles (user_id, role_id, expires_at) VALUES ($1, $2, $3)
-                ON CONFLICT (user_id, role_id) DO UPDATE SET expires_at = $3
-            """,
-                target.id,
-                selected_role.id,
-                expires_at,
-            )
+        await timers.schedule(
+            "temp_role_expire",
+            Config.ROLE_DURATION_MINUTES * 60,
+            {"user_id": target.id, "role_id": selected_role.id},
+        )
 
         # Add role
         await target.add_roles(selected_role)
@@ -4046,33 +3692,21 @@ class Points(commands.Cog):
             )
             return
 
-        # Check if user has enough points
-        async with db.pool.acquire() as conn:
-            points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            points = points or 0
-
-            if points < REMOVE_COST:
-                await inter.response.send_message(
-                    f"Not enough {Config.POINT_NAME}. You have {points}, need {REMOVE_COST}.",
-                    ephemeral=True,
+        # Deduct points (guarded) and remove from temp_roles table together
+        try:
+            async with db.pool.acquire() as conn, ledger.transaction(conn):
+                await debit(conn, inter.author.id, REMOVE_COST, "remove_role")
+                await conn.execute(
+                    "DELETE FROM temp_roles WHERE user_id = $1 AND role_id = $2",
+                    target.id,
+                    selected_role.id,
                 )
-                return
-
-            # Deduct points
-            await conn.execute(
-                "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                REMOVE_COST,
-                inter.author.id,
-            )
-
-            # Remove from temp_roles table
-            await conn.execute(
-                "DELETE FROM temp_roles WHERE user_id = $1 AND role_id = $2",
-                target.id,
-                selected_role.id,
+        except InsufficientPoints as e:
+            await inter.response.send_message(
+                f"Not enough {Config.POINT_NAME}. You have {e.balance or 0}, need {REMOVE_COST}.",
+                ephemeral=True,
             )
+            return
 
         # Remove role
         await target.remove_roles(selected_role)
@@ -4288,10 +3922,8 @@ class Points(commands.Cog):
                 active_effects.append(f"🛡️ Shield: {remaining_mins}m {remaining_secs}s")
 
         # Check counter (show who they have countered)
-        if target.id in self.active_counters:
-            for attacker_id, counter_time in list(
-                self.active_counters[target.id].items()
-            ):
+        for (defender_id, attacker_id), counter_time in self.active_counters.items():
+            if defender_id == target.id:
                 if (now - counter_time).total_seconds() < 900:  # 15 minutes
                     remaining_secs = int(900 - (now - counter_time).total_seconds())
                     remaining_mins = remaining_secs // 60
@@ -4321,8 +3953,7 @@ class Points(commands.Cog):
         # If used outside, delete after 30 seconds
         if inter.channel_id != 956301076271857764:
             await inter.response.send_message(embed=embed)
-            await asyncio.sleep(30)
-            await inter.delete_original_response()
+            await timers.delete_response_later(inter, 30)
         else:
             await inter.response.send_message(embed=embed)
 
@@ -4338,98 +3969,70 @@ class Points(commands.Cog):
         target_user = user if user else inter.author
 
         async with db.pool.acquire() as conn:
-            # Get attacks against the user in the last 24 hours
-            attacks = await conn.fetch(
-                """SELECT attacker_id, attack_type, amount, success, points_gained, points_lost, timestamp
-                   FROM attack_history
-                   WHERE target_id = $1 AND timestamp > NOW() - INTERVAL '24 hours'
-                   ORDER BY timestamp DESC""",
-                target_user.id,
-            )
-
-            if not attacks:
-                await inter.response.send_message(
-                    f"🛡️ No one has attacked {target_user.mention} in the last 24 hours!",
-                    ephemeral=True,
-                )
-                return
+            # Per-attacker totals for the last 24 hours
+            attacker_stats = await attacks_against(conn, target_user.id)
 
-            # Build embed
-            embed = disnake.Embed(
-                title=f"⚔️ Attack History (Last 24 Hours)",
-                description=f"Attacks against {target_user.mention}",
-                color=disnake.Color.red(),
+        if not attacker_stats:
+            await inter.response.send_message(
+                f"🛡️ No one has attacked {target_user.mention} in the last 24 hours!",
+                ephemeral=True,
             )
+            return
 
-            # Group attacks by attacker
-            from collections import defaultdict
+        # Build embed
+        embed = disnake.Embed(
+            title=f"⚔️ Attack History (Last 24 Hours)",
+            description=f"Attacks against {target_user.mention}",
+            color=disnake.Color.red(),
+        )
 
-            attacker_stats = defaultdict(
-                lambda: {"total": 0, "points_lost": 0, "points_gained": 0}
-            )
+        # Build summary lines grouped by attacker
+        attack_lines = []
+        for stats in attacker_stats:
+            attacker_id = stats["attacker_id"]
+            attacker = inter.guild.get_member(attacker_id)
+            attacker_name = attacker.mention if attacker else f"<@{attacker_id}>"
 
-            # Collect stats per attacker
-            for attack in attacks:
-                attacker_id = attack["attacker_id"]
-                attacker_stats[attacker_id]["total"] += 1
+            # Calculate net result
+            net_points = stats["points_gained"] - stats["points_lost"]
 
-                if attack["success"]:
-                    # Attacker won - defender lost points
-                    attacker_stats[attacker_id]["points_lost"] += attack["points_lost"]
-                else:
-                    # Attacker failed - defender gained points
-                    points_gained = attack["points_gained"] or 0
-                    attacker_stats[attacker_id]["points_gained"] += points_gained
-
-            # Build summary lines grouped by attacker
-            attack_lines = []
-            for attacker_id, stats in sorted(
-                attacker_stats.items(), key=lambda x: x[1]["total"], reverse=True
-            ):
-                attacker = inter.guild.get_member(attacker_id)
-                attacker_name = attacker.mention if attacker else f"<@{attacker_id}>"
-
-                # Calculate net result
-                net_points = stats["points_gained"] - stats["points_lost"]
-
-                if net_points > 0:
-                    # You gained overall
-                    attack_lines.append(
-                        f"{attacker_name} attacked **{stats['total']}x** → **+{net_points}** {Config.POINT_NAME}"
-                    )
-                elif net_points < 0:
-                    # You lost overall
-                    attack_lines.append(
-                        f"{attacker_name} attacked **{stats['total']}x** → **{net_points}** {Config.POINT_NAME}"
-                    )
-                else:
-                    # Broke even
-                    attack_lines.append(
-                        f"{attacker_name} attacked **{stats['total']}x** → **±0** {Config.POINT_NAME}"
-                    )
+            if net_points > 0:
+                # You gained overall
+                attack_lines.append(
+                    f"{attacker_name} attacked **{stats['total']}x** → **+{net_points}** {Config.POINT_NAME}"
+                )
+            elif net_points < 0:
+                # You lost overall
+                attack_lines.append(
+                    f"{attacker_name} attacked **{stats['total']}x** → **{net_points}** {Config.POINT_NAME}"
+                )
+            else:
+                # Broke even
+                attack_lines.append(
+                    f"{attacker_name} attacked **{stats['total']}x** → **±0** {Config.POINT_NAME}"
+                )
 
-            embed.add_field(
-                name="📜 Attack Summary by User",
-                value="\n".join(attack_lines) if attack_lines else "No attacks",
-                inline=False,
-            )
+        embed.add_field(
+            name="📜 Attack Summary by User",
+            value="\n".join(attack_lines) if attack_lines else "No attacks",
+            inline=False,
+        )
 
-            # Summary
-            total_attacks = len(attacks)
-            total_lost = sum(a["points_lost"] for a in attacks if a["success"])
-            successful_attacks = sum(1 for a in attacks if a["success"])
+        # Summary
+        total_attacks = sum(s["total"] for s in attacker_stats)
+        total_lost = sum(s["points_lost"] for s in attacker_stats)
+        successful_attacks = sum(s["successful"] for s in attacker_stats)
 
-            summary = f"**Total Attacks:** {total_attacks}\n**Successful:** {successful_attacks}\n**Failed:** {total_attacks - successful_attacks}\n**Total Lost:** {total_lost:,} {Config.POINT_NAME}"
-            embed.add_field(
-                name="📊 Summary",
-                value=summary,
-                inline=False,
-            )
+        summary = f"**Total Attacks:** {total_attacks}\n**Successful:** {successful_attacks}\n**Failed:** {total_attacks - successful_attacks}\n**Total Lost:** {total_lost:,} {Config.POINT_NAME}"
+        embed.add_field(
+            name="📊 Summary",
+            value=summary,
+            inline=False,
+        )
 
-            await inter.response.send_message(embed=embed)
-            # Delete after 20 seconds
-            await asyncio.sleep(20)
-            await inter.delete_original_response()
+        await inter.response.send_message(embed=embed)
+        # Delete after 20 seconds
+        await timers.delete_response_later(inter, 20)
 
     @commands.slash_command(description="Create a beg request")
     async def beg(self, inter: disnake.ApplicationCommandInteraction):
@@ -4595,64 +4198,54 @@ class LotteryBuyModal(disnake.ui.Modal):
             )
             return
 
-        # Check current user ticket count (re-check in case of race condition)
-        current_count = self.points_cog.lottery_user_count.get(inter.user.id, 0)
-        remaining_slots = max_tickets_per_user - current_count
-
-        if remaining_slots <= 0:
-            await inter.response.send_message(
-                f"❌ You have already purchased the maximum of {max_tickets_per_user} lottery tickets.",
-                ephemeral=True,
-            )
-            return
+        # Ticket count check and purchase run one at a time per user
+        async with user_lock(inter.user.id):
+            # Check current user ticket count (re-check in case of race condition)
+            current_count = self.points_cog.lottery_user_count.get(inter.user.id, 0)
+            remaining_slots = max_tickets_per_user - current_count
 
-        # Limit to remaining slots
-        if len(number_list) > remaining_slots:
-            await inter.response.send_message(
-                f"❌ You can only buy {remaining_slots} more ticket(s). "
-                f"You already have {current_count}/{max_tickets_per_user} tickets.",
-                ephemeral=True,
-            )
-            return
+            if remaining_slots <= 0:
+                await inter.response.send_message(
+                    f"❌ You have already purchased the maximum of {max_tickets_per_user} lottery tickets.",
+                    ephemeral=True,
+                )
+                return
 
-        total_cost = cost_per_ticket * len(number_list)
+            # Limit to remaining slots
+            if len(number_list) > remaining_slots:
+                await inter.response.send_message(
+                    f"❌ You can only buy {remaining_slots} more ticket(s). "
+                    f"You already have {current_count}/{max_tickets_per_user} tickets.",
+                    ephemeral=True,
+                )
+                return
 
-        # Check if user has enough points
-        async with db.pool.acquire() as conn:
-            user_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.user.id
-            )
-            user_points = user_points or 0
+            total_cost = cost_per_ticket * len(number_list)
 
-            if user_points < total_cost:
+            # Deduct cost (guarded) and add to lottery pool
+            try:
+                async with db.pool.acquire() as conn, ledger.transaction(conn):
+                    await debit(conn, inter.user.id, total_cost, "lottery_ticket")
+                    await self.points_cog.add_to_lottery_pool(conn, total_cost)
+            except InsufficientPoints as e:
                 await inter.response.send_message(
                     f"You need at least {total_cost} {Config.POINT_NAME} to buy {len(number_list)} lottery ticket(s). "
-                    f"You have {user_points:,}.",
+                    f"You have {e.balance or 0:,}.",
                     ephemeral=True,
                 )
                 return
 
-            # Deduct cost
-            await conn.execute(
-                "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                total_cost,
-                inter.user.id,
-            )
-
-            # Add to lottery pool
-            await self.points_cog.add_to_lottery_pool(conn, total_cost)
-
-        # Add user to lottery entries for each number
-        for number in number_list:
-            if number not in self.points_cog.lottery_entries:
-                self.points_cog.lottery_entries[number] = []
-            self.points_cog.lottery_entries[number].append(inter.user.id)
+            # Add user to lottery entries for each number
+            for number in number_list:
+                if number not in self.points_cog.lottery_entries:
+                    self.points_cog.lottery_entries[number] = []
+                self.points_cog.lottery_entries[number].append(inter.user.id)
 
-        # Update user ticket count
-        self.points_cog.lottery_user_count[inter.user.id] = current_count + len(
-            number_list
-        )
-        new_count = self.points_cog.lottery_user_count[inter.user.id]
+            # Update user ticket count
+            self.points_cog.lottery_user_count[inter.user.id] = current_count + len(
+                number_list
+            )
+            new_count = self.points_cog.lottery_user_count[inter.user.id]
 
         # Format numbers for display
         numbers_display = ", ".join([f"{n:02d}" for n in number_list])
@@ -4792,33 +4385,16 @@ class GivePointsModal(disnake.ui.Modal):
             )
             return
 
-        async with db.pool.acquire() as conn:
-            # Check giver's points
-            giver_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.user.id
-            )
-            giver_points = giver_points or 0
-
-            if giver_points < amount:
-                await inter.response.send_message(
-                    f"Not enough {Config.POINT_NAME}! You have {giver_points:,}, need {amount:,}.",
-                    ephemeral=True,
-                )
-                return
-
-            # Transfer points
-            await conn.execute(
-                "UPDATE users SET points = points - $1, total_sent = total_sent + $1 WHERE user_id = $2",
-                amount,
-                inter.user.id,
-            )
-            await conn.execute(
-                """INSERT INTO users (user_id, points, total_received) VALUES ($1, $2, $2)
-                   ON CONFLICT (user_id) DO UPDATE
-                   SET points = users.points + $2, total_received = users.total_received + $2""",
-                self.beggar_id,
-                amount,
+        # Transfer points (no tax)
+        try:
+            async with db.pool.acquire() as conn:
+                await transfer(conn, inter.user.id, self.beggar_id, amount, "beg_give")
+        except InsufficientPoints as e:
+            await inter.response.send_message(
+                f"Not enough {Config.POINT_NAME}! You have {e.balance or 0:,}, need {amount:,}.",
+                ephemeral=True,
             )
+            return
 
         beggar = inter.guild.get_member(self.beggar_id)
         beggar_name = beggar.display_name if beggar else f"<@{self.beggar_id}>"
@@ -4975,9 +4551,11 @@ class AttackBeggarModal(disnake.ui.Modal):
                     actual_amount,
                     self.beggar_id,
                 )
+                ledger.record(inter.user.id, "beg_attack", attacker_gain, self.beggar_id, profit_column="profit_beg")
+                ledger.record(self.beggar_id, "beg_attack", -actual_amount, inter.user.id)
 
                 # Add tax to pool
-                await self.points_cog.add_to_tax_pool(conn, tax_amount)
+                await self.points_cog.add_to_tax_pool(conn, tax_amount, "beg_attack", inter.user.id)
 
                 # Track attack stats (win)
                 if is_high_stakes:
@@ -5014,6 +4592,8 @@ class AttackBeggarModal(disnake.ui.Modal):
                     amount,
                     self.beggar_id,
                 )
+                ledger.record(inter.user.id, "beg_attack", -amount, self.beggar_id)
+                ledger.record(self.beggar_id, "beg_attack", amount, inter.user.id, profit_column="profit_beg")
 
                 # Track attack stats (loss)
                 if is_high_stakes:
@@ -5041,127 +4621,6 @@ class AttackBeggarModal(disnake.ui.Modal):
                         ephemeral=False,
                     )
 
-    @commands.Cog.listener()
-    async def on_ready(self):
-        """Start the daily tax task when bot is ready"""
-        if not self.daily_tax_task.is_running():
-            self.daily_tax_task.start()
-
-    @tasks.loop(time=datetime.time(hour=0, minute=0, tzinfo=BANGKOK_TZ))
-    async def daily_tax_task(self):
-        """Daily task to tax all users and reset cumulative attack gains"""
-        if db.pool is None:
-            return
-
-        from datetime import date
-
-        now_bangkok = datetime.datetime.now(BANGKOK_TZ)
-        today_bangkok = now_bangkok.date()
-
-        async with db.pool.acquire() as conn:
-            # Reset cumulative attack gains and defense losses for all users
-            await conn.execute(
-                "UPDATE users SET cumulative_attack_gains = 0, cumulative_defense_losses = 0"
-            )
-
-            # Give 20% interest on stashed points
-            stash_users = await conn.fetch(
-                "SELECT user_id, stashed_points FROM users WHERE stashed_points > 0"
-            )
-
-            total_interest_paid = 0
-            for user_row in stash_users:
-                stashed = user_row["stashed_points"]
-                interest = int(stashed * 0.20)
-
-                # Pay interest to main points (stash stays same)
-                if interest > 0:
-                    await conn.execute(
-                        "UPDATE users SET points = points + $1 WHERE user_id = $2",
-                        interest,
-                        user_row["user_id"],
-                    )
-                    total_interest_paid += interest
-
-            # Tax all users with progressive rates based on points + stash
-            all_users = await conn.fetch(
-                "SELECT user_id, points, stashed_points, last_rich_tax_date FROM users"
-            )
-
-            total_tax_collected = 0
-            taxed_users = 0
-            for user_row in all_users:
-                # Check if already taxed today
-                last_tax_date = user_row["last_rich_tax_date"]
-                if last_tax_date == today_bangkok:
-                    continue
-
-                user_points = user_row["points"] or 0
-                stashed_points = user_row["stashed_points"] or 0
-                total_wealth = user_points + stashed_points
-
-                # Progressive tax brackets
-                if total_wealth < 500:
-                    tax_rate = 0.0
-                elif total_wealth < 1000:
-                    tax_rate = 0.05
-                elif total_wealth < 2500:
-                    tax_rate = 0.10
-                elif total_wealth < 5000:
-                    tax_rate = 0.15
-                elif total_wealth < 7500:
-                    tax_rate = 0.20
-                else:
-                    tax_rate = 0.20  # 20% for 7500+
-
-                if tax_rate == 0.0:
-                    # Still mark as taxed but no tax collected
-                    await conn.execute(
-                        "UPDATE users SET last_rich_tax_date = $1 WHERE user_id = $2",
-                        today_bangkok,
-                        user_row["user_id"],
-                    )
-                    continue
-
-                tax_amount = int(total_wealth * tax_rate)
-
-                # Deduct tax from user (points can go negative if not enough)
-                await conn.execute(
-                    "UPDATE users SET points = points - $1, last_rich_tax_date = $2 WHERE user_id = $3",
-                    tax_amount,
-                    today_bangkok,
-                    user_row["user_id"],
-                )
-
-                total_tax_collected += tax_amount
-                taxed_users += 1
-
-            # Add to tax pool
-            if total_tax_collected > 0:
-                await self.add_to_tax_pool(conn, total_tax_collected)
-
-                # Send notification
-                bot_channel = self.bot.get_channel(Config.BOT_CHANNEL_ID)
-                if bot_channel:
-                    embed = disnake.Embed(
-                        title="📊 Daily Tax & Interest",
-                        description=f"**Tax Collected:** {total_tax_collected:,} {Config.POINT_NAME} from {taxed_users} users (progressive tax: 0-20% based on total wealth).\n**Interest Paid:** {total_interest_paid:,} {Config.POINT_NAME} to {len(stash_users)} users (20% on stashed points).",
-                        color=disnake.Color.blue(),
-                    )
-                    embed.add_field(
-                        name="✅ Also Reset",
-                        value="All cumulative attack gains and defense losses have been reset to 0.",
-                        inline=False,
-                    )
-                    await bot_channel.send(embed=embed)
-
-    @daily_tax_task.before_loop
-    async def before_daily_tax(self):
-        await self.bot.wait_until_ready()
-        # Wait for db connection
-        while db.pool is None:
-            await asyncio.sleep(1)
-
 
 def setup(bot):
     bot.add_cog(Points(bot))
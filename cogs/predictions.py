@@ -7,6 +7,24 @@ from disnake.ext import commands, tasks
 
 from core.config import Config
 from core.database import db
+from core.economy import InsufficientPoints, debit, ledger, user_lock
+from core.embed_refresh import prediction_embeds
+from core.odds import odds_book, returns, sparkline
+from core.predictions import (
+    LOCK_KIND,
+    fetch_prediction,
+    fetch_predictions_by_id,
+    lock_schedule,
+    new_snapshot,
+)
+from core.settlement import (
+    CREATOR_TAX_PERCENT,
+    SettlementConflict,
+    reverse_result,
+    settle_cancel,
+    settle_result,
+)
+from core.timers import timers
 
 
 class BetModal(disnake.ui.Modal):
@@ -43,7 +61,8 @@ class BetModal(disnake.ui.Modal):
             )
             return
 
-        async with db.pool.acquire() as conn:
+        # Max bet check and bet run one at a time per user
+        async with user_lock(inter.author.id), db.pool.acquire() as conn:
             # Check prediction status
             pred = await conn.fetchrow(
                 "SELECT status, ends_at, creator_id, max_bet FROM predictions WHERE id = $1",
@@ -98,44 +117,31 @@ class BetModal(disnake.ui.Modal):
                             )
                         return
 
-            # Check if user already bet on THIS choice (can add more)
-            existing = await conn.fetchrow(
-                "SELECT amount FROM prediction_bets WHERE prediction_id = $1 AND user_id = $2 AND choice_number = $3",
-                self.prediction_id,
-                inter.author.id,
-                self.choice_number,
-            )
-
-            # Check user has enough points
-            user_points = await conn.fetchval(
-                "SELECT points FROM users WHERE user_id = $1", inter.author.id
-            )
-            user_points = user_points or 0
-
-            if user_points < amount:
+            # Deduct points (guarded) and place/add to bet together
+            try:
+                async with ledger.transaction(conn):
+                    await debit(conn, inter.author.id, amount, "prediction_bet", ref_id=self.prediction_id)
+                    new_total = await conn.fetchval(
+                        """INSERT INTO prediction_bets (prediction_id, user_id, choice_number, amount) VALUES ($1, $2, $3, $4)
+                           ON CONFLICT (prediction_id, user_id, choice_number) DO UPDATE SET amount = prediction_bets.amount + $4
+                           RETURNING amount""",
+                        self.prediction_id,
+                        inter.author.id,
+                        self.choice_number,
+                        amount,
+                    )
+            except InsufficientPoints as e:
                 await inter.response.send_message(
-                    f"Not enough {Config.POINT_NAME}. You have {user_points}.",
+                    f"Not enough {Config.POINT_NAME}. You have {e.balance or 0}.",
                     ephemeral=True,
                 )
                 return
 
-            # Deduct points and place/add to bet
-            await conn.execute(
-                "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                amount,
-                inter.author.id,
-            )
-            await conn.execute(
-                """INSERT INTO prediction_bets (prediction_id, user_id, choice_number, amount) VALUES ($1, $2, $3, $4)
-                   ON CONFLICT (prediction_id, user_id, choice_number) DO UPDATE SET amount = prediction_bets.amount + $4""",
-                self.prediction_id,
-                inter.author.id,
-                self.choice_number,
-                amount,
-            )
+        # Committed: update the live pools, then redraw (bursts of bets share one edit)
+        odds_book.apply_bet(self.prediction_id, self.choice_number, amount, new_total == amount)
+        prediction_embeds.request(self.prediction_id)
 
-        if existing:
-            new_total = existing["amount"] + amount
+        if new_total > amount:
             await inter.response.send_message(
                 f"✅ Bet added! You now have **{new_total} {Config.POINT_NAME}** on choice #{self.choice_number}.",
                 ephemeral=True,
@@ -149,20 +155,12 @@ class BetModal(disnake.ui.Modal):
         # Send notification to prediction channel if bet >= 500
         if amount >= 500:
             try:
-                # Get prediction details for the notification
-                async with db.pool.acquire() as conn:
-                    pred_info = await conn.fetchrow(
-                        "SELECT channel_id, title FROM predictions WHERE id = $1",
-                        self.prediction_id,
-                    )
-                    choice_text = await conn.fetchval(
-                        "SELECT choice_text FROM prediction_choices WHERE prediction_id = $1 AND choice_number = $2",
-                        self.prediction_id,
-                        self.choice_number,
-                    )
+                # Prediction details for the notification come from the odds book
+                pred = odds_book.get(self.prediction_id)
+                choice_text = dict(pred.choices).get(self.choice_number) if pred else None
 
-                if pred_info and choice_text:
-                    channel = inter.guild.get_channel(pred_info["channel_id"])
+                if pred and choice_text:
+                    channel = inter.guild.get_channel(pred.channel_id)
                     if channel:
                         await channel.send(
                             f"🔥 **BIG BET!** {inter.author.mention} just bet **{amount:,} {Config.POINT_NAME}** on choice #{self.choice_number}: **{choice_text}**!"
@@ -248,8 +246,8 @@ class CreatePredictionModal(disnake.ui.Modal):
             )
             return
 
-        # Get prediction cost
-        async with db.pool.acquire() as conn:
+        # Get prediction cost (user lock before the connection, like the other callers)
+        async with user_lock(inter.author.id), db.pool.acquire() as conn:
             cost_row = await conn.fetchval(
                 "SELECT value FROM bot_settings WHERE key = 'prediction_cost'"
             )
@@ -259,38 +257,11 @@ class CreatePredictionModal(disnake.ui.Modal):
             mod_role = inter.guild.get_role(Config.MOD_ROLE_ID)
             is_mod = mod_role and mod_role in inter.author.roles
 
-            if not is_mod:
-                user_points = await conn.fetchval(
-                    "SELECT points FROM users WHERE user_id = $1", inter.author.id
-                )
-                user_points = user_points or 0
-
-                if user_points < cost:
-                    await inter.response.send_message(
-                        f"Not enough {Config.POINT_NAME}. Creating a prediction costs {cost}. You have {user_points}.",
-                        ephemeral=True,
-                    )
-                    return
-
-                # Deduct cost
-                await conn.execute(
-                    "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                    cost,
-                    inter.author.id,
-                )
-
             # Check active predictions count
             active_count = await conn.fetchval(
                 "SELECT COUNT(*) FROM predictions WHERE status = 'betting'"
             )
             if active_count >= 10:
-                # Refund if charged
-                if not is_mod:
-                    await conn.execute(
-                        "UPDATE users SET points = points + $1 WHERE user_id = $2",
-                        cost,
-                        inter.author.id,
-                    )
                 await inter.response.send_message(
                     "Maximum 10 active predictions reached. Please wait for one to finish.",
                     ephemeral=True,
@@ -305,28 +276,49 @@ class CreatePredictionModal(disnake.ui.Modal):
             # Temporarily use parent channel, will update to thread ID
             prediction_channel_id = 1456199415264973006
 
-            pred_id = await conn.fetchval(
-                """INSERT INTO predictions (title, creator_id, status, ends_at, channel_id, max_bet)
-                   VALUES ($1, $2, 'betting', $3, $4, $5) RETURNING id""",
-                title,
-                inter.author.id,
-                ends_at,
-                prediction_channel_id,
-                self.max_bet,
-            )
+            # Charge the cost (guarded) and create the prediction together
+            try:
+                async with ledger.transaction(conn):
+                    if not is_mod:
+                        await debit(conn, inter.author.id, cost, "prediction_cost")
+
+                    pred_id = await conn.fetchval(
+                        """INSERT INTO predictions (title, creator_id, status, ends_at, channel_id, max_bet)
+                           VALUES ($1, $2, 'betting', $3, $4, $5) RETURNING id""",
+                        title,
+                        inter.author.id,
+                        ends_at,
+                        prediction_channel_id,
+                        self.max_bet,
+                    )
 
-            # Renumber choices sequentially
-            for idx, (_, text) in enumerate(choices, 1):
-                await conn.execute(
-                    "INSERT INTO prediction_choices (prediction_id, choice_number, choice_text) VALUES ($1, $2, $3)",
-                    pred_id,
-                    idx,
-                    text,
+                    # Renumber choices sequentially
+                    for idx, (_, text) in enumerate(choices, 1):
+                        await conn.execute(
+                            "INSERT INTO prediction_choices (prediction_id, choice_number, choice_text) VALUES ($1, $2, $3)",
+                            pred_id,
+                            idx,
+                            text,
+                        )
+            except InsufficientPoints as e:
+                await inter.response.send_message(
+                    f"Not enough {Config.POINT_NAME}. Creating a prediction costs {cost}. You have {e.balance or 0}.",
+                    ephemeral=True,
                 )
+                return
 
             # Update choices list with sequential numbering
             choices = [(idx, text) for idx, (_, text) in enumerate(choices, 1)]
 
+        # Betting closes exactly at ends_at
+        lock_schedule.schedule(pred_id, ends_at)
+
+        # Empty pools in the odds book (before the buttons exist), filled in as bets come in
+        snapshot = new_snapshot(
+            pred_id, title, inter.author.id, ends_at, prediction_channel_id, None, self.max_bet, choices
+        )
+        odds_book.put(snapshot)
+
         # Build embed
         embed = build_prediction_embed(
             pred_id, title, choices, ends_at, inter.author, {}, {}
@@ -355,6 +347,7 @@ class CreatePredictionModal(disnake.ui.Modal):
                     thread.id,  # Store thread ID, not parent channel ID
                     pred_id,
                 )
+            snapshot.channel_id = thread.id
 
             # Respond to user
             await inter.response.send_message(
@@ -373,6 +366,8 @@ class CreatePredictionModal(disnake.ui.Modal):
                     pred_id,
                 )
 
+        snapshot.message_id = msg.id
+
 
 def build_prediction_embed(
     pred_id: int,
@@ -389,12 +384,12 @@ def build_prediction_embed(
 
     total_pool = sum(pool_by_choice.values())
 
+    description = None
     if status == "betting":
         color = disnake.Color.blue()
-        time_left = ends_at - datetime.datetime.now()
-        minutes_left = max(0, int(time_left.total_seconds() // 60))
-        seconds_left = max(0, int(time_left.total_seconds() % 60))
-        status_text = f"⏳ Betting ends in **{minutes_left}m {seconds_left}s**"
+        # Relative timestamp: Discord renders the countdown, no edits needed
+        status_text = "⏳ Betting open"
+        description = f"⏳ Betting ends <t:{int(ends_at.timestamp())}:R>"
     elif status == "locked":
         color = disnake.Color.orange()
         status_text = "🔒 Betting closed - Waiting for result"
@@ -405,7 +400,9 @@ def build_prediction_embed(
         color = disnake.Color.red()
         status_text = "❌ Cancelled - Points refunded"
 
-    embed = disnake.Embed(title=f"🔮 Prediction #{pred_id}: {title}", color=color)
+    embed = disnake.Embed(
+        title=f"🔮 Prediction #{pred_id}: {title}", description=description, color=color
+    )
 
     # Add each choice as a field
     for choice_num, choice_text in choices:
@@ -442,152 +439,176 @@ def build_prediction_embed(
     return embed
 
 
-async def get_prediction_data(conn, pred_id: int):
-    """Fetch all data needed for a prediction"""
-    pred = await conn.fetchrow("SELECT * FROM predictions WHERE id = $1", pred_id)
-    if not pred:
-        return None, None, None, None
-
-    choices = await conn.fetch(
-        "SELECT choice_number, choice_text FROM prediction_choices WHERE prediction_id = $1 ORDER BY choice_number",
-        pred_id,
-    )
-    choices = [(r["choice_number"], r["choice_text"]) for r in choices]
-
-    # Pool by choice
-    pool_rows = await conn.fetch(
-        "SELECT choice_number, SUM(amount) as total FROM prediction_bets WHERE prediction_id = $1 GROUP BY choice_number",
-        pred_id,
-    )
-    pool_by_choice = {r["choice_number"]: r["total"] for r in pool_rows}
-
-    # Bettors by choice
-    bettors_rows = await conn.fetch(
-        "SELECT choice_number, COUNT(*) as cnt FROM prediction_bets WHERE prediction_id = $1 GROUP BY choice_number",
-        pred_id,
+def prediction_fingerprint(pred) -> tuple:
+    """What a betting prediction's embed shows (the countdown is a client-side timestamp)"""
+    return (
+        pred.status,
+        tuple(sorted(pred.pool_by_choice.items())),
+        tuple(sorted(pred.bettors_by_choice.items())),
     )
-    bettors_by_choice = {r["choice_number"]: r["cnt"] for r in bettors_rows}
-
-    return pred, choices, pool_by_choice, bettors_by_choice
 
 
 class Predictions(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        prediction_embeds.handler = self.refresh_prediction_by_id
+        timers.register(LOCK_KIND, self.run_lock_timers, source=lock_schedule.load)
         self.update_predictions.start()
         self.check_ended_predictions.start()
 
     def cog_unload(self):
         self.update_predictions.cancel()
         self.check_ended_predictions.cancel()
+        prediction_embeds.stop()
 
-    @tasks.loop(seconds=10)
-    async def update_predictions(self):
-        """Update all active prediction embeds every 10 seconds"""
-        if db.pool is None:
+    async def refresh_prediction(self, pred):
+        """Edit a betting prediction's message if what it shows has changed"""
+        if not pred.message_id:
+            return
+        fingerprint = prediction_fingerprint(pred)
+        if not prediction_embeds.changed(pred.id, fingerprint):
             return
 
-        async with db.pool.acquire() as conn:
-            active = await conn.fetch(
-                "SELECT id, message_id, channel_id FROM predictions WHERE status = 'betting'"
-            )
+        channel = self.bot.get_channel(pred.channel_id)
+        if not channel:
+            return
+        creator = channel.guild.get_member(pred.creator_id)
 
-            for pred in active:
-                try:
-                    channel = self.bot.get_channel(pred["channel_id"])
-                    if not channel:
-                        continue
-
-                    msg = await channel.fetch_message(pred["message_id"])
-                    if not msg:
-                        continue
-
-                    (
-                        pred_data,
-                        choices,
-                        pool_by_choice,
-                        bettors_by_choice,
-                    ) = await get_prediction_data(conn, pred["id"])
-                    if not pred_data:
-                        continue
-
-                    guild = channel.guild
-                    creator = guild.get_member(pred_data["creator_id"])
-
-                    embed = build_prediction_embed(
-                        pred["id"],
-                        pred_data["title"],
-                        choices,
-                        pred_data["ends_at"],
-                        creator,
-                        pool_by_choice,
-                        bettors_by_choice,
-                        pred_data["status"],
-                        pred_data["winning_choice"],
-                    )
+        embed = build_prediction_embed(
+            pred.id,
+            pred.title,
+            pred.choices,
+            pred.ends_at,
+            creator,
+            pred.pool_by_choice,
+            pred.bettors_by_choice,
+            pred.status,
+            pred.winning_choice,
+        )
+        view = PredictionView(pred.id, pred.choices, is_active=True)
 
-                    view = PredictionView(pred["id"], choices, is_active=True)
-                    await msg.edit(embed=embed, view=view)
+        if await self.edit_prediction_message(channel, pred.message_id, embed, view):
+            prediction_embeds.edited(pred.id, fingerprint)
 
-                except Exception as e:
-                    print(f"Error updating prediction {pred['id']}: {e}")
+    async def edit_prediction_message(self, channel, message_id: int, embed, view) -> bool:
+        """Edit a prediction message without fetching it first, False if it is gone"""
+        if not message_id:
+            return False
+        try:
+            await channel.get_partial_message(message_id).edit(embed=embed, view=view)
+        except disnake.NotFound:
+            print(f"Prediction message {message_id} no longer exists")
+            return False
+        return True
+
+    async def refresh_prediction_by_id(self, prediction_id: int):
+        """Refresh handler for prediction_embeds.request (renders from the odds book)"""
+        pred = odds_book.get(prediction_id)
+        if pred and pred.status == "betting":
+            await self.refresh_prediction(pred)
 
-    @tasks.loop(seconds=5)
-    async def check_ended_predictions(self):
-        """Check for predictions that have ended and lock them"""
-        if db.pool is None:
-            return
+    @tasks.loop(seconds=10)
+    async def update_predictions(self):
+        """Every 10 seconds: redraw betting predictions whose pools changed since their last edit"""
+        # Pools come from the odds book: no query at all
+        active = odds_book.active("betting")
+
+        # Stop tracking predictions that are no longer betting
+        active_ids = {pred.id for pred in active}
+        for prediction_id in set(prediction_embeds.fingerprints) - active_ids:
+            prediction_embeds.forget(prediction_id)
+
+        # Only predictions whose pools or bettors changed are edited
+        for pred in active:
+            try:
+                await self.refresh_prediction(pred)
+            except Exception as e:
+                prediction_embeds.failures += 1
+                print(f"Error updating prediction {pred.id}: {e}")
 
+    async def lock_predictions(self, prediction_ids=None):
+        """Lock betting predictions past their ends_at (the given ones, or all) and redraw them"""
         async with db.pool.acquire() as conn:
-            now = datetime.datetime.now()
-            ended = await conn.fetch(
-                "SELECT id, message_id, channel_id FROM predictions WHERE status = 'betting' AND ends_at < $1",
-                now,
+            locked = await conn.fetch(
+                """UPDATE predictions SET status = 'locked'
+                   WHERE status = 'betting' AND ends_at <= $1
+                     AND ($2::INTEGER[] IS NULL OR id = ANY($2::INTEGER[]))
+                   RETURNING id""",
+                datetime.datetime.now(),
+                prediction_ids,
             )
+            if not locked:
+                return
+            locked_ids = [row["id"] for row in locked]
+            for prediction_id in locked_ids:
+                odds_book.set_status(prediction_id, "locked")
+            # Predictions missing from the odds book are read from the database
+            ended = [odds_book.get(prediction_id) for prediction_id in locked_ids]
+            missing = [prediction_id for prediction_id, pred in zip(locked_ids, ended) if pred is None]
+            ended = [pred for pred in ended if pred is not None]
+            if missing:
+                ended += await fetch_predictions_by_id(conn, missing)
+
+        for pred in ended:
+            lock_schedule.discard(pred.id)
+            try:
+                # Update the message
+                channel = self.bot.get_channel(pred.channel_id)
+                if not channel:
+                    continue
 
-            for pred in ended:
-                try:
-                    await conn.execute(
-                        "UPDATE predictions SET status = 'locked' WHERE id = $1",
-                        pred["id"],
-                    )
+                guild = channel.guild
+                creator = guild.get_member(pred.creator_id)
 
-                    # Update the message
-                    channel = self.bot.get_channel(pred["channel_id"])
-                    if not channel:
-                        continue
-
-                    msg = await channel.fetch_message(pred["message_id"])
-                    if not msg:
-                        continue
-
-                    (
-                        pred_data,
-                        choices,
-                        pool_by_choice,
-                        bettors_by_choice,
-                    ) = await get_prediction_data(conn, pred["id"])
-                    guild = channel.guild
-                    creator = guild.get_member(pred_data["creator_id"])
-
-                    embed = build_prediction_embed(
-                        pred["id"],
-                        pred_data["title"],
-                        choices,
-                        pred_data["ends_at"],
-                        creator,
-                        pool_by_choice,
-                        bettors_by_choice,
-                        "locked",
-                    )
+                embed = build_prediction_embed(
+                    pred.id,
+                    pred.title,
+                    pred.choices,
+                    pred.ends_at,
+                    creator,
+                    pred.pool_by_choice,
+                    pred.bettors_by_choice,
+                    "locked",
+                )
 
-                    view = PredictionView(pred["id"], choices, is_active=False)
-                    await msg.edit(embed=embed, view=view)
+                view = PredictionView(pred.id, pred.choices, is_active=False)
+                await self.edit_prediction_message(channel, pred.message_id, embed, view)
 
-                except Exception as e:
-                    print(f"Error locking prediction {pred['id']}: {e}")
+            except Exception as e:
+                print(f"Error locking prediction {pred.id}: {e}")
+
+    async def run_lock_timers(self, payloads: list):
+        """prediction_lock timers: betting closes at ends_at"""
+        # Locked, resolved or cancelled before their deadline: nothing left to lock
+        prediction_ids = [
+            payload["prediction_id"]
+            for payload in payloads
+            if payload["prediction_id"] in lock_schedule.open
+        ]
+        if not prediction_ids:
+            return
+        await self.lock_predictions(prediction_ids)
+        for prediction_id in prediction_ids:
+            lock_schedule.discard(prediction_id)
+
+    @tasks.loop(minutes=5)
+    async def check_ended_predictions(self):
+        """Safety sweep: lock anything a lock timer missed"""
+        if db.pool is None:
+            return
+        await self.lock_predictions()
 
     @update_predictions.before_loop
+    async def before_update_predictions(self):
+        await self.before_tasks()
+        # Load the pools of active predictions into memory
+        try:
+            async with db.pool.acquire() as conn:
+                loaded = await odds_book.rebuild(conn)
+            print(f"Odds book loaded: {loaded} active predictions")
+        except Exception as e:
+            print(f"Failed to load odds book: {e}")
+
     @check_ended_predictions.before_loop
     async def before_tasks(self):
         await self.bot.wait_until_ready()
@@ -608,13 +629,17 @@ class Predictions(commands.Cog):
         pred_id = int(parts[2])
         choice_num = int(parts[3])
 
-        # Get choice text
-        async with db.pool.acquire() as conn:
-            choice_text = await conn.fetchval(
-                "SELECT choice_text FROM prediction_choices WHERE prediction_id = $1 AND choice_number = $2",
-                pred_id,
-                choice_num,
-            )
+        # Get choice text (from the odds book while the prediction is active)
+        pred = odds_book.get(pred_id)
+        if pred:
+            choice_text = dict(pred.choices).get(choice_num)
+        else:
+            async with db.pool.acquire() as conn:
+                choice_text = await conn.fetchval(
+                    "SELECT choice_text FROM prediction_choices WHERE prediction_id = $1 AND choice_number = $2",
+                    pred_id,
+                    choice_num,
+                )
 
         if not choice_text:
             await inter.response.send_message("Invalid choice.", ephemeral=True)
@@ -682,19 +707,18 @@ class Predictions(commands.Cog):
             await conn.execute(
                 "UPDATE predictions SET status = 'locked' WHERE id = $1", prediction_id
             )
+            lock_schedule.discard(prediction_id)
 
-            (
-                pred_data,
-                choices,
-                pool_by_choice,
-                bettors_by_choice,
-            ) = await get_prediction_data(conn, prediction_id)
+            snapshot = await fetch_prediction(conn, prediction_id)
+            odds_book.put(snapshot)
+            choices = snapshot.choices
+            pool_by_choice = snapshot.pool_by_choice
+            bettors_by_choice = snapshot.bettors_by_choice
 
         # Update the message
         try:
             channel = self.bot.get_channel(pred["channel_id"])
             if channel:
-                msg = await channel.fetch_message(pred["message_id"])
                 creator = inter.guild.get_member(pred["creator_id"])
 
                 embed = build_prediction_embed(
@@ -709,7 +733,7 @@ class Predictions(commands.Cog):
                 )
 
                 view = PredictionView(prediction_id, choices, is_active=False)
-                await msg.edit(embed=embed, view=view)
+                await self.edit_prediction_message(channel, pred["message_id"], embed, view)
         except Exception as e:
             print(f"Error updating locked prediction: {e}")
 
@@ -771,65 +795,43 @@ class Predictions(commands.Cog):
                 await inter.followup.send("Invalid winning choice.", ephemeral=True)
                 return
 
-            # Get all bets
-            all_bets = await conn.fetch(
-                "SELECT user_id, choice_number, amount FROM prediction_bets WHERE prediction_id = $1",
-                prediction_id,
-            )
-
-            # Calculate pool and distribute
-            total_pool = sum(b["amount"] for b in all_bets)
-            winner_bets = [b for b in all_bets if b["choice_number"] == winner]
-            winner_pool = sum(b["amount"] for b in winner_bets)
-
-            # Distribute winnings (10% tax)
-            payouts = []
-            total_tax = 0
-            if winner_pool > 0 and total_pool > 0:
-                for bet in winner_bets:
-                    share = bet["amount"] / winner_pool
-                    raw_winnings = int(share * total_pool)
-                    # Apply 10% tax: floor the received amount
-                    winnings = int(raw_winnings * 0.90)
-                    tax = raw_winnings - winnings
-                    total_tax += tax
-
-                    await conn.execute(
-                        "UPDATE users SET points = points + $1, profit_prediction = profit_prediction + $1 WHERE user_id = $2",
-                        winnings,
-                        bet["user_id"],
-                    )
-                    payouts.append((bet["user_id"], winnings))
-
             # Give 50% of tax to non-mod creator
             creator_member = inter.guild.get_member(pred["creator_id"])
             creator_is_mod = (
                 mod_role and creator_member and mod_role in creator_member.roles
             )
+            creator_percent = 0 if creator_is_mod else CREATOR_TAX_PERCENT
 
-            if not creator_is_mod and total_tax > 0:
-                creator_bonus = int(total_tax * 0.50)
-                if creator_bonus > 0:
-                    await conn.execute(
-                        "UPDATE users SET points = points + $1, profit_prediction = profit_prediction + $1 WHERE user_id = $2",
-                        creator_bonus,
-                        pred["creator_id"],
-                    )
+            # Pay winners (10% tax) and resolve in one statement
+            try:
+                settlement = await settle_result(
+                    conn, prediction_id, winner, creator_percent, inter.author.id
+                )
+            except SettlementConflict:
+                await inter.followup.send(
+                    "This prediction has already been resolved or cancelled.",
+                    ephemeral=True,
+                )
+                return
+            settlement.record()
+            lock_schedule.discard(prediction_id)
 
-            # Update prediction status
-            await conn.execute(
-                "UPDATE predictions SET status = 'resolved', winning_choice = $1 WHERE id = $2",
-                winner,
+            # Bets for the results message
+            all_bets = await conn.fetch(
+                "SELECT user_id, choice_number, amount FROM prediction_bets WHERE prediction_id = $1",
                 prediction_id,
             )
 
             # Update message
-            (
-                pred_data,
-                choices,
-                pool_by_choice,
-                bettors_by_choice,
-            ) = await get_prediction_data(conn, prediction_id)
+            snapshot = await fetch_prediction(conn, prediction_id)
+            odds_book.put(snapshot)
+            choices = snapshot.choices
+            pool_by_choice = snapshot.pool_by_choice
+            bettors_by_choice = snapshot.bettors_by_choice
+
+        total_pool = settlement.total_pool
+        winner_bets = [b for b in all_bets if b["choice_number"] == winner]
+        winnings = settlement.amounts("winner")
 
         # Get winning choice text
         winning_text = next(
@@ -839,7 +841,6 @@ class Predictions(commands.Cog):
         try:
             channel = self.bot.get_channel(pred["channel_id"])
             if channel:
-                msg = await channel.fetch_message(pred["message_id"])
                 creator = inter.guild.get_member(pred["creator_id"])
 
                 embed = build_prediction_embed(
@@ -855,7 +856,7 @@ class Predictions(commands.Cog):
                 )
 
                 view = PredictionView(prediction_id, choices, is_active=False)
-                await msg.edit(embed=embed, view=view)
+                await self.edit_prediction_message(channel, pred["message_id"], embed, view)
 
                 # Send results with all participants tagged
                 winners_list = []
@@ -864,10 +865,7 @@ class Predictions(commands.Cog):
                 for bet in all_bets:
                     if bet["choice_number"] == winner:
                         # Winner - find their payout
-                        payout = next(
-                            (p[1] for p in payouts if p[0] == bet["user_id"]), 0
-                        )
-                        profit = payout - bet["amount"]
+                        profit = winnings.get(bet["user_id"], 0) - bet["amount"]
                         winners_list.append(f"<@{bet['user_id']}> (+{profit:,})")
                     else:
                         # Loser
@@ -921,15 +919,8 @@ class Predictions(commands.Cog):
         # Send announcement to bot channel
         bot_channel = self.bot.get_channel(Config.BOT_CHANNEL_ID)
         if bot_channel:
-            total_tax = (
-                sum(
-                    int((b["amount"] / winner_pool * total_pool) * 0.10)
-                    for b in winner_bets
-                )
-                if winner_pool > 0
-                else 0
-            )
-            total_distributed = sum(p[1] for p in payouts)
+            total_tax = settlement.tax
+            total_distributed = sum(winnings.values())
 
             announce_embed = disnake.Embed(
                 title=f"🎉 Prediction #{prediction_id} Resolved!",
@@ -994,49 +985,26 @@ class Predictions(commands.Cog):
                 )
                 return
 
-            old_winner = pred["winning_choice"]
-
-            # Get all bets to recalculate and revert
-            all_bets = await conn.fetch(
-                "SELECT user_id, choice_number, amount FROM prediction_bets WHERE prediction_id = $1",
-                prediction_id,
-            )
-
-            total_pool = sum(b["amount"] for b in all_bets)
-            winner_bets = [b for b in all_bets if b["choice_number"] == old_winner]
-            winner_pool = sum(b["amount"] for b in winner_bets)
-
-            # Revert winnings
-            if winner_pool > 0 and total_pool > 0:
-                for bet in winner_bets:
-                    share = bet["amount"] / winner_pool
-                    raw_winnings = int(share * total_pool)
-                    winnings = int(raw_winnings * 0.90)
-
-                    await conn.execute(
-                        "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                        winnings,
-                        bet["user_id"],
-                    )
-
-            # Set back to locked
-            await conn.execute(
-                "UPDATE predictions SET status = 'locked', winning_choice = NULL WHERE id = $1",
-                prediction_id,
-            )
+            # Take back exactly what the result paid and set back to locked
+            try:
+                reversal = await reverse_result(conn, prediction_id, inter.author.id)
+            except SettlementConflict:
+                await inter.response.send_message(
+                    "Only resolved predictions can be undone.", ephemeral=True
+                )
+                return
+            reversal.record()
 
             # Update message
-            (
-                pred_data,
-                choices,
-                pool_by_choice,
-                bettors_by_choice,
-            ) = await get_prediction_data(conn, prediction_id)
+            snapshot = await fetch_prediction(conn, prediction_id)
+            odds_book.put(snapshot)
+            choices = snapshot.choices
+            pool_by_choice = snapshot.pool_by_choice
+            bettors_by_choice = snapshot.bettors_by_choice
 
         try:
             channel = self.bot.get_channel(pred["channel_id"])
             if channel:
-                msg = await channel.fetch_message(pred["message_id"])
                 creator = inter.guild.get_member(pred["creator_id"])
 
                 embed = build_prediction_embed(
@@ -1051,7 +1019,7 @@ class Predictions(commands.Cog):
                 )
 
                 view = PredictionView(prediction_id, choices, is_active=False)
-                await msg.edit(embed=embed, view=view)
+                await self.edit_prediction_message(channel, pred["message_id"], embed, view)
         except Exception as e:
             print(f"Error updating undone prediction: {e}")
 
@@ -1091,41 +1059,6 @@ class Predictions(commands.Cog):
                 )
                 return
 
-            # If resolved, first undo the winnings
-            if pred["status"] == "resolved":
-                old_winner = pred["winning_choice"]
-                all_bets = await conn.fetch(
-                    "SELECT user_id, choice_number, amount FROM prediction_bets WHERE prediction_id = $1",
-                    prediction_id,
-                )
-                total_pool = sum(b["amount"] for b in all_bets)
-                winner_bets = [b for b in all_bets if b["choice_number"] == old_winner]
-                winner_pool = sum(b["amount"] for b in winner_bets)
-
-                if winner_pool > 0 and total_pool > 0:
-                    for bet in winner_bets:
-                        share = bet["amount"] / winner_pool
-                        raw_winnings = int(share * total_pool)
-                        winnings = int(raw_winnings * 0.90)
-                        await conn.execute(
-                            "UPDATE users SET points = points - $1 WHERE user_id = $2",
-                            winnings,
-                            bet["user_id"],
-                        )
-
-            # Refund all bets
-            all_bets = await conn.fetch(
-                "SELECT user_id, amount FROM prediction_bets WHERE prediction_id = $1",
-                prediction_id,
-            )
-
-            for bet in all_bets:
-                await conn.execute(
-                    "UPDATE users SET points = points + $1 WHERE user_id = $2",
-                    bet["amount"],
-                    bet["user_id"],
-                )
-
             # Refund creation cost to creator (if not mod)
             cost_row = await conn.fetchval(
                 "SELECT value FROM bot_settings WHERE key = 'prediction_cost'"
@@ -1137,30 +1070,39 @@ class Predictions(commands.Cog):
             if creator_member:
                 creator_was_mod = mod_role and mod_role in creator_member.roles
 
-            if not creator_was_mod:
-                await conn.execute(
-                    "UPDATE users SET points = points + $1 WHERE user_id = $2",
-                    cost,
-                    pred["creator_id"],
-                )
+            creator_refund = 0 if creator_was_mod else cost
 
-            # Update status
-            await conn.execute(
-                "UPDATE predictions SET status = 'cancelled' WHERE id = $1",
-                prediction_id,
-            )
+            # Undo the winnings if resolved, then refund every bet and the cost
+            settlements = []
+            try:
+                async with conn.transaction():
+                    if pred["status"] == "resolved":
+                        settlements.append(
+                            await reverse_result(conn, prediction_id, inter.author.id)
+                        )
+                    settlement = await settle_cancel(
+                        conn, prediction_id, creator_refund, inter.author.id
+                    )
+                    settlements.append(settlement)
+            except SettlementConflict:
+                await inter.response.send_message(
+                    "This prediction is already cancelled.", ephemeral=True
+                )
+                return
+            for settled in settlements:
+                settled.record()
+            lock_schedule.discard(prediction_id)
+            refunded_bets = settlement.count("refund")
 
-            (
-                pred_data,
-                choices,
-                pool_by_choice,
-                bettors_by_choice,
-            ) = await get_prediction_data(conn, prediction_id)
+            snapshot = await fetch_prediction(conn, prediction_id)
+            odds_book.put(snapshot)
+            choices = snapshot.choices
+            pool_by_choice = snapshot.pool_by_choice
+            bettors_by_choice = snapshot.bettors_by_choice
 
         try:
             channel = self.bot.get_channel(pred["channel_id"])
             if channel:
-                msg = await channel.fetch_message(pred["message_id"])
                 creator = inter.guild.get_member(pred["creator_id"])
 
                 embed = build_prediction_embed(
@@ -1175,7 +1117,7 @@ class Predictions(commands.Cog):
                 )
 
                 view = PredictionView(prediction_id, choices, is_active=False)
-                await msg.edit(embed=embed, view=view)
+                await self.edit_prediction_message(channel, pred["message_id"], embed, view)
 
                 # Archive thread if message is in a thread
                 if isinstance(channel, disnake.Thread):
@@ -1184,7 +1126,7 @@ class Predictions(commands.Cog):
             print(f"Error updating cancelled prediction: {e}")
 
         await inter.response.send_message(
-            f"✅ Prediction #{prediction_id} cancelled. All {len(all_bets)} bets refunded. Creation cost refunded to creator.",
+            f"✅ Prediction #{prediction_id} cancelled. All {refunded_bets} bets refunded. Creation cost refunded to creator.",
             ephemeral=True,
         )
 
@@ -1216,11 +1158,11 @@ class Predictions(commands.Cog):
 
     @commands.slash_command(description="Show active predictions")
     async def predictions(self, inter: disnake.ApplicationCommandInteraction):
-        """List all active predictions"""
-        async with db.pool.acquire() as conn:
-            active = await conn.fetch(
-                "SELECT id, title, status, ends_at FROM predictions WHERE status IN ('betting', 'locked') ORDER BY id"
-            )
+        """List all active predictions (from the odds book)"""
+        if not odds_book.ready:
+            async with db.pool.acquire() as conn:
+                await odds_book.rebuild(conn)
+        active = odds_book.active()
 
         if not active:
             await inter.response.send_message("No active predictions.", ephemeral=True)
@@ -1231,16 +1173,56 @@ class Predictions(commands.Cog):
         )
 
         for pred in active:
-            status_emoji = "⏳" if pred["status"] == "betting" else "🔒"
+            status_emoji = "⏳" if pred.status == "betting" else "🔒"
             time_info = ""
-            if pred["status"] == "betting":
-                time_left = pred["ends_at"] - datetime.datetime.now()
+            if pred.status == "betting":
+                time_left = pred.ends_at - datetime.datetime.now()
                 minutes = max(0, int(time_left.total_seconds() // 60))
                 time_info = f" ({minutes}m left)"
 
             embed.add_field(
-                name=f"{status_emoji} #{pred['id']}: {pred['title']}",
-                value=f"Status: {pred['status'].title()}{time_info}",
+                name=f"{status_emoji} #{pred.id}: {pred.title}",
+                value=f"Status: {pred.status.title()}{time_info} • Pool: {pred.total_pool:,} {Config.POINT_NAME}",
+                inline=False,
+            )
+
+        await inter.response.send_message(embed=embed, ephemeral=True)
+
+    @commands.slash_command(description="Show how the odds of an active prediction moved")
+    async def predodds(
+        self,
+        inter: disnake.ApplicationCommandInteraction,
+        prediction_id: int = commands.Param(description="Prediction ID"),
+    ):
+        """Return per choice at the first sample vs now, with a sparkline of the movement"""
+        pred = odds_book.get(prediction_id)
+        if pred is None:
+            await inter.response.send_message(
+                f"❌ Prediction #{prediction_id} is not active.", ephemeral=True
+            )
+            return
+
+        samples = odds_book.line(prediction_id)
+        if not samples:
+            await inter.response.send_message(
+                "❌ Odds history is disabled (PREDICTION_ODDS_HISTORY=0).", ephemeral=True
+            )
+            return
+
+        series = [returns(pools, pred.choices) for _, pools in samples]
+        embed = disnake.Embed(
+            title=f"📈 #{pred.id}: {pred.title}",
+            description=f"{len(samples)} samples since {samples[0][0].strftime('%H:%M')} • "
+            f"Pool: {pred.total_pool:,} {Config.POINT_NAME}",
+            color=disnake.Color.purple(),
+        )
+        for number, text in pred.choices:
+            first, now = series[0][number], series[-1][number]
+            first_text = f"{first:.2f}x" if first else "—"
+            now_text = f"{now:.2f}x" if now else "—"
+            embed.add_field(
+                name=f"{number}. {text}",
+                value=f"{first_text} → **{now_text}**\n`{sparkline([point[number] for point in series])}`",
                 inline=False,
             )
 
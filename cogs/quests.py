@@ -4,6 +4,7 @@ import disnake
 from disnake.ext import commands
 
 from core.database import db
+from core.economy import ledger
 
 
 class Quests(commands.Cog):
@@ -40,6 +41,7 @@ class Quests(commands.Cog):
                     now,
                     ctx.author.id,
                 )
+            ledger.record(ctx.author.id, "daily_claim", reward)
 
             await ctx.send(f"You claimed {reward} points!")
 
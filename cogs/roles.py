@@ -6,18 +6,40 @@ from disnake.ext import commands, tasks
 
 from core.config import Config
 from core.database import db
+from core.timers import timers
 
 
 class Roles(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        timers.register("temp_role_expire", self.expire_temp_roles)
         self.check_temp_roles.start()
 
     def cog_unload(self):
         self.check_temp_roles.cancel()
 
-    @tasks.loop(seconds=30)  # Check every 30 seconds for testing
+    async def expire_temp_roles(self, payloads: list):
+        """Timer handler: remove temp roles whose expiry has been reached"""
+        async with db.pool.acquire() as conn:
+            # Roles extended since the timer was set are skipped (a newer timer exists)
+            expired = await conn.fetch(
+                """
+                SELECT t.* FROM temp_roles t
+                JOIN UNNEST($1::BIGINT[], $2::BIGINT[]) AS d(user_id, role_id)
+                  ON t.user_id = d.user_id AND t.role_id = d.role_id
+                WHERE t.expires_at <= $3
+                """,
+                [p["user_id"] for p in payloads],
+                [p["role_id"] for p in payloads],
+                datetime.datetime.now(),
+            )
+
+            for record in expired:
+                await self.remove_expired_role(conn, record)
+
+    @tasks.loop(minutes=10)
     async def check_temp_roles(self):
+        """Safety sweep for expired temp roles that have no timer"""
         if db.pool is None:
             return
 
@@ -28,40 +50,44 @@ class Roles(commands.Cog):
             )
 
             for record in expired:
-                guild = self.bot.guilds[0]
-                member = guild.get_member(record["user_id"])
-                role = guild.get_role(record["role_id"])
-
-                # Always delete the record from database
-                await conn.execute(
-                    "DELETE FROM temp_roles WHERE user_id = $1 AND role_id = $2",
-                    record["user_id"],
-                    record["role_id"],
-                )
+                await self.remove_expired_role(conn, record)
+
+    async def remove_expired_role(self, conn, record):
+        """Delete an expired temp_roles record and take the role away"""
+        guild = self.bot.guilds[0]
+        member = guild.get_member(record["user_id"])
+        role = guild.get_role(record["role_id"])
+
+        # Always delete the record from database
+        await conn.execute(
+            "DELETE FROM temp_roles WHERE user_id = $1 AND role_id = $2",
+            record["user_id"],
+            record["role_id"],
+        )
 
-                if member and role:
-                    # Only remove and notify if user still has the role
-                    if role in member.roles:
-                        await member.remove_roles(role)
-                        print(f"Removed expired role {role.name} from {member.name}")
-
-                        # Notify in bot channel
-                        channel = self.bot.get_channel(Config.BOT_CHANNEL_ID)
-                        if channel:
-                            embed = disnake.Embed(
-                                title="⏰ Role Expired",
-                                description=f"The **{role.name}** role has expired for {member.mention}",
-                                color=disnake.Color.orange(),
-                            )
-                            await channel.send(embed=embed)
-                    else:
-                        print(
-                            f"Role {role.name} already removed from {member.name} (possibly by mod)"
-                        )
-                else:
-                    print(
-                        f"Cleaned up expired role record: user={record['user_id']}, role={record['role_id']}"
+        if member and role:
+            # Only remove and notify if user still has the role
+            if role in member.roles:
+                await member.remove_roles(role)
+                print(f"Removed expired role {role.name} from {member.name}")
+
+                # Notify in bot channel
+                channel = self.bot.get_channel(Config.BOT_CHANNEL_ID)
+                if channel:
+                    embed = disnake.Embed(
+                        title="⏰ Role Expired",
+                        description=f"The **{role.name}** role has expired for {member.mention}",
+                        color=disnake.Color.orange(),
                     )
+                    await channel.send(embed=embed)
+            else:
+                print(
+                    f"Role {role.name} already removed from {member.name} (possibly by mod)"
+                )
+        else:
+            print(
+                f"Cleaned up expired role record: user={record['user_id']}, role={record['role_id']}"
+            )
 
     @check_temp_roles.before_loop
     async def before_check(self):
@@ -168,6 +194,11 @@ class Roles(commands.Cog):
                     FIRST_ROLE_ID,
                     expires_at,
                 )
+            await timers.schedule(
+                "temp_role_expire",
+                DURATION_MINUTES * 60,
+                {"user_id": member.id, "role_id": FIRST_ROLE_ID},
+            )
 
             try:
                 await user.send(
@@ -189,6 +220,11 @@ class Roles(commands.Cog):
                     SECOND_ROLE_ID,
                     expires_at,
                 )
+            await timers.schedule(
+                "temp_role_expire",
+                DURATION_MINUTES * 60,
+                {"user_id": member.id, "role_id": SECOND_ROLE_ID},
+            )
 
             try:
                 await user.send(
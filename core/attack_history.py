@@ -0,0 +1,68 @@
+"""
+Attack History Maintenance
+attack_history is range-partitioned by month (migration 0011). The daily
+retention job makes sure the upcoming partitions exist and drops whole
+partitions that fell out of the retention window, instead of deleting rows.
+"""
+
+import datetime
+import re
+
+from core.config import Config
+
+PARTITIONS_AHEAD = 2  # Months created in advance of the current one
+_PARTITION_NAME = re.compile(r"^attack_history_(\d{4})_(\d{2})$")
+
+SUMMARY_SQL = """
+    SELECT attacker_id,
+           COUNT(*) AS total,
+           COUNT(*) FILTER (WHERE success) AS successful,
+           COALESCE(SUM(points_lost) FILTER (WHERE success), 0) AS points_lost,
+           COALESCE(SUM(points_gained) FILTER (WHERE NOT success), 0) AS points_gained
+    FROM attack_history
+    WHERE target_id = $1 AND timestamp > NOW() - INTERVAL '24 hours'
+    GROUP BY attacker_id
+    ORDER BY total DESC, MAX(timestamp) DESC
+"""
+
+
+def _add_months(day: datetime.date, months: int) -> datetime.date:
+    month_index = day.year * 12 + day.month - 1 + months
+    return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+
+async def attacks_against(conn, target_id: int) -> list:
+    """Per-attacker totals for attacks against a user in the last 24 hours"""
+    return await conn.fetch(SUMMARY_SQL, target_id)
+
+
+async def run_retention(conn, business_date: datetime.date) -> dict:
+    """attack_history_retention job: create upcoming partitions, drop expired ones"""
+    this_month = business_date.replace(day=1)
+    for months in range(PARTITIONS_AHEAD + 1):
+        await conn.execute(
+            "SELECT attack_history_ensure_partition($1)", _add_months(this_month, months)
+        )
+
+    # Keep the current month plus the configured number of full months before it
+    cutoff = _add_months(this_month, -Config.ATTACK_HISTORY_RETENTION_MONTHS)
+    partitions = await conn.fetch(
+        """
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'attack_history'::regclass
+        """
+    )
+    dropped = []
+    for row in partitions:
+        match = _PARTITION_NAME.match(row["relname"])
+        if not match:
+            continue
+        month = datetime.date(int(match.group(1)), int(match.group(2)), 1)
+        if month < cutoff:
+            await conn.execute(f'DROP TABLE IF EXISTS "{row["relname"]}"')
+            dropped.append(row["relname"])
+
+    if dropped:
+        print(f"Dropped attack_history partitions: {', '.join(sorted(dropped))}")
+    return {"rows": len(dropped), "dropped": sorted(dropped), "cutoff": cutoff}
@@ -0,0 +1,407 @@
+"""
+Attack Resolution
+Attack rules shared by /attack, /multiattack and /pierce, plus the
+transaction that applies an outcome.
+
+Both users' rows are locked in user_id order and read with one SELECT,
+the outcome is decided against the locked balances, and the balance
+changes, tax and attack_history row are written with one statement.
+Concurrent attacks on the same users queue on the row locks instead of
+spending the same balance twice. apply_attack_batch() does the same for
+many attacks at once (multiattack hits due in the same tick).
+"""
+
+import random
+from collections import defaultdict
+from functools import lru_cache
+
+from core.database import db
+from core.economy import PROFIT_COLUMNS, ledger
+
+TAX_RATE = 0.05
+DEFENSE_LOSS_CAP = 100000  # Max points a user can lose to attacks per day
+ATTACK_GAIN_CAP = 100000  # Max points a user can steal per day
+HIGH_STAKES = 100  # Attacks above this count as high stakes in the stats
+COUNTER_WIN_CHANCE = 0.20
+PIERCE_MULTIPLIER = 10
+
+READ_SQL = """
+    SELECT user_id, points,
+           COALESCE(cumulative_defense_losses, 0) AS cumulative_defense_losses,
+           COALESCE(cumulative_attack_gains, 0) AS cumulative_attack_gains
+    FROM users
+    WHERE user_id = ANY($1::BIGINT[])
+    ORDER BY user_id
+"""
+LOCK_SQL = READ_SQL + "    FOR UPDATE\n"
+
+
+class AttackRejected(Exception):
+    """Raised by a decide callback to abort the attack (nothing is written)"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason  # "attacker_points", "target_points", "defense_cap", "gains_cap"
+
+
+class Combatant:
+    """Locked snapshot of one user's row"""
+
+    __slots__ = ("user_id", "points", "defense_losses", "attack_gains")
+
+    def __init__(self, user_id, points=0, defense_losses=0, attack_gains=0):
+        self.user_id = user_id
+        self.points = points or 0
+        self.defense_losses = defense_losses
+        self.attack_gains = attack_gains
+
+
+class AttackOutcome:
+    __slots__ = (
+        "attack_type",
+        "success",
+        "amount",
+        "win_chance",
+        "attacker_delta",
+        "attack_gains_delta",
+        "attacker_profit",
+        "target_delta",
+        "defense_losses_delta",
+        "target_profit",
+        "tax",
+        "points_gained",
+        "points_lost",
+        "shield_reduced",
+        "attacker_points",
+        "target_points",
+    )
+
+    def __init__(self, attack_type, success, amount, win_chance=None):
+        self.attack_type = attack_type
+        self.success = success
+        self.amount = amount
+        self.win_chance = win_chance
+        self.attacker_delta = 0
+        self.attack_gains_delta = 0
+        self.attacker_profit = None  # profit_* column credited with attacker_delta
+        self.target_delta = 0
+        self.defense_losses_delta = 0
+        self.target_profit = None  # profit_* column credited with target_delta
+        self.tax = 0
+        self.points_gained = 0  # attack_history columns
+        self.points_lost = 0
+        self.shield_reduced = False
+        self.attacker_points = None  # Balances after the attack
+        self.target_points = None
+
+    @property
+    def target_points_before(self) -> int:
+        return self.target_points - self.target_delta
+
+    def steal(self, stake: int, taken: int, profit_column: str):
+        """Attacker takes `taken` from the target, minus tax"""
+        self.tax = int(taken * TAX_RATE)
+        self.attacker_delta = taken - self.tax
+        self.attack_gains_delta = taken
+        self.attacker_profit = profit_column
+        self.target_delta = -taken
+        self.defense_losses_delta = taken
+        self.points_gained = self.attacker_delta
+        self.points_lost = stake if self.attack_type == "regular" else taken
+        return self
+
+    def lose(self, loss: int, profit_column: str):
+        """Attacker loses `loss` to the target, minus tax"""
+        self.tax = int(loss * TAX_RATE)
+        self.attacker_delta = -loss
+        self.attack_gains_delta = -self.amount
+        self.target_delta = loss - self.tax
+        self.defense_losses_delta = -self.target_delta
+        self.target_profit = profit_column
+        self.points_gained = self.target_delta
+        self.points_lost = loss
+        return self
+
+
+def win_chance(target_points: int, is_countered: bool = False) -> float:
+    """Chance a regular attack succeeds against a target with this many points"""
+    if is_countered:
+        # Counter active: flat rate regardless of target's wealth
+        return COUNTER_WIN_CHANCE
+    chance = 0.45
+    # Rich target bonus: +15% when attacking players with >3000 points
+    if target_points > 3000:
+        chance += 0.15
+    # Super rich target bonus: +10% more when attacking players with >10000 points
+    if target_points > 10000:
+        chance += 0.10
+    return max(0.0, min(1.0, chance))
+
+
+def check_stakes(attacker: Combatant, target: Combatant, amount: int, defense_cap: bool = True):
+    """Raise AttackRejected unless both users can cover the stake"""
+    if attacker.points < amount:
+        raise AttackRejected("attacker_points")
+    if target.points < amount:
+        raise AttackRejected("target_points")
+    if defense_cap and target.defense_losses >= DEFENSE_LOSS_CAP:
+        raise AttackRejected("defense_cap")
+
+
+def regular_attack(
+    attacker: Combatant,
+    target: Combatant,
+    amount: int,
+    has_shield: bool = False,
+    has_dodge: bool = False,
+    is_countered: bool = False,
+    roll=random.random,
+) -> AttackOutcome:
+    """Decide a regular attack (dodge makes it fail with a 2x penalty)"""
+    if has_dodge:
+        return AttackOutcome("dodge", False, amount, 0.0).lose(amount * 2, "profit_dodge")
+
+    chance = win_chance(target.points, is_countered)
+    if roll() >= chance:
+        return AttackOutcome("regular", False, amount, chance).lose(amount, "profit_defense")
+
+    if attacker.attack_gains >= ATTACK_GAIN_CAP:
+        raise AttackRejected("gains_cap")
+    stake = min(amount, ATTACK_GAIN_CAP - attacker.attack_gains)
+
+    # +10% bonus against targets with >10k points
+    taken = stake
+    if target.points > 10000:
+        taken += int(stake * 0.10)
+
+    # Shield: attacker only gets 75%
+    outcome = AttackOutcome("regular", True, stake, chance)
+    if has_shield:
+        taken = int(taken * 0.75)
+        outcome.shield_reduced = True
+    return outcome.steal(stake, taken, "profit_attack")
+
+
+def pierce_attack(attacker: Combatant, target: Combatant, amount: int, has_dodge: bool) -> AttackOutcome:
+    """Pierce always beats a dodge (10x) and always fails without one"""
+    if has_dodge:
+        outcome = AttackOutcome("pierce", True, amount, 1.0)
+        return outcome.steal(amount, amount * PIERCE_MULTIPLIER, "profit_pierce")
+    return AttackOutcome("pierce", False, amount, 0.0).lose(amount, "profit_pierce")
+
+
+async def load_combatants(conn, user_ids, lock: bool = False) -> dict:
+    """Read users as {user_id: Combatant}; lock=True takes row locks in user_id order"""
+    rows = await conn.fetch(LOCK_SQL if lock else READ_SQL, list(user_ids))
+    return {
+        row["user_id"]: Combatant(
+            row["user_id"],
+            row["points"],
+            row["cumulative_defense_losses"],
+            row["cumulative_attack_gains"],
+        )
+        for row in rows
+    }
+
+
+@lru_cache(maxsize=None)
+def _apply_sql(attacker_profit, target_profit) -> str:
+    for column in (attacker_profit, target_profit):
+        if column is not None and column not in PROFIT_COLUMNS:
+            raise ValueError(f"Unknown profit column: {column}")
+    attacker_extra = f", {attacker_profit} = {attacker_profit} + $3" if attacker_profit else ""
+    target_extra = f", {target_profit} = {target_profit} + $9" if target_profit else ""
+    return f"""
+        WITH attacker AS (
+            UPDATE users SET
+                points = points + $3,
+                cumulative_attack_gains = cumulative_attack_gains + $4,
+                attack_attempts_low = attack_attempts_low + $5,
+                attack_wins_low = attack_wins_low + $6,
+                attack_attempts_high = attack_attempts_high + $7,
+                attack_wins_high = attack_wins_high + $8{attacker_extra}
+            WHERE user_id = $1
+            RETURNING points
+        ), target AS (
+            UPDATE users SET
+                points = points + $9,
+                cumulative_defense_losses = cumulative_defense_losses + $10{target_extra}
+            WHERE user_id = $2
+            RETURNING points
+        ), tax AS (
+            INSERT INTO bot_settings (key, value) VALUES ('tax_pool', $11::INTEGER::TEXT)
+            ON CONFLICT (key) DO UPDATE SET value = (COALESCE(CAST(bot_settings.value AS INTEGER), 0) + $11::INTEGER)::TEXT
+        ), history AS (
+            INSERT INTO attack_history (attacker_id, target_id, attack_type, amount, success, points_gained, points_lost)
+            VALUES ($1, $2, $12, $13, $14, $15, $16)
+        )
+        SELECT (SELECT points FROM attacker) AS attacker_points,
+               (SELECT points FROM target) AS target_points
+    """
+
+
+async def resolve_attack(attacker_id: int, target_id: int, decide) -> AttackOutcome:
+    """
+    Lock both users, decide the outcome and apply it in one transaction
+
+    decide(attacker, target) gets the locked Combatant snapshots and returns
+    an AttackOutcome, or raises AttackRejected to abort without writing.
+    """
+    async with db.pool.acquire() as conn:
+        async with conn.transaction():
+            snapshot = await load_combatants(conn, [attacker_id, target_id], lock=True)
+            attacker = snapshot.get(attacker_id) or Combatant(attacker_id)
+            target = snapshot.get(target_id) or Combatant(target_id)
+
+            outcome = decide(attacker, target)
+
+            high = outcome.amount > HIGH_STAKES
+            win = 1 if outcome.success else 0
+            row = await conn.fetchrow(
+                _apply_sql(outcome.attacker_profit, outcome.target_profit),
+                attacker_id,
+                target_id,
+                outcome.attacker_delta,
+                outcome.attack_gains_delta,
+                0 if high else 1,
+                0 if high else win,
+                1 if high else 0,
+                win if high else 0,
+                outcome.target_delta,
+                outcome.defense_losses_delta,
+                outcome.tax,
+                outcome.attack_type,
+                outcome.amount,
+                outcome.success,
+                outcome.points_gained,
+                outcome.points_lost,
+            )
+
+    outcome.attacker_points = row["attacker_points"]
+    outcome.target_points = row["target_points"]
+    ledger.record_attack(attacker_id, target_id, outcome)
+    return outcome
+
+
+_BATCH_PROFIT_SETS = ",\n".join(
+    f"{col} = {col} + d.{col}" for col in PROFIT_COLUMNS
+)
+_BATCH_PROFIT_ARRAYS = ", ".join(
+    f"${i}::INTEGER[]" for i in range(10, 10 + len(PROFIT_COLUMNS))
+)
+_HISTORY_ARG = 10 + len(PROFIT_COLUMNS)
+
+BATCH_APPLY_SQL = f"""
+    WITH users_update AS (
+        UPDATE users SET
+            points = points + d.points,
+            cumulative_attack_gains = cumulative_attack_gains + d.attack_gains,
+            cumulative_defense_losses = cumulative_defense_losses + d.defense_losses,
+            attack_attempts_low = attack_attempts_low + d.attempts_low,
+            attack_wins_low = attack_wins_low + d.wins_low,
+            attack_attempts_high = attack_attempts_high + d.attempts_high,
+            attack_wins_high = attack_wins_high + d.wins_high,
+            {_BATCH_PROFIT_SETS}
+        FROM UNNEST(
+            $1::BIGINT[], $2::INTEGER[], $3::INTEGER[], $4::INTEGER[],
+            $5::INTEGER[], $6::INTEGER[], $7::INTEGER[], $8::INTEGER[], {_BATCH_PROFIT_ARRAYS}
+        ) AS d(user_id, points, attack_gains, defense_losses,
+               attempts_low, wins_low, attempts_high, wins_high, {", ".join(PROFIT_COLUMNS)})
+        WHERE users.user_id = d.user_id
+    ), tax AS (
+        INSERT INTO bot_settings (key, value) VALUES ('tax_pool', $9::INTEGER::TEXT)
+        ON CONFLICT (key) DO UPDATE SET value = (COALESCE(CAST(bot_settings.value AS INTEGER), 0) + $9::INTEGER)::TEXT
+    )
+    INSERT INTO attack_history (attacker_id, target_id, attack_type, amount, success, points_gained, points_lost)
+    SELECT * FROM UNNEST(
+        ${_HISTORY_ARG}::BIGINT[], ${_HISTORY_ARG + 1}::BIGINT[], ${_HISTORY_ARG + 2}::TEXT[],
+        ${_HISTORY_ARG + 3}::INTEGER[], ${_HISTORY_ARG + 4}::BOOLEAN[],
+        ${_HISTORY_ARG + 5}::INTEGER[], ${_HISTORY_ARG + 6}::INTEGER[]
+    )
+"""
+
+_BATCH_FIELDS = (
+    "points",
+    "attack_gains",
+    "defense_losses",
+    "attempts_low",
+    "wins_low",
+    "attempts_high",
+    "wins_high",
+) + PROFIT_COLUMNS
+
+
+async def apply_attack_batch(conn, hits) -> list:
+    """
+    Resolve many attacks inside the caller's transaction
+
+    hits: list of (attacker_id, target_id, decide). All involved users are
+    locked with one SELECT, each decide sees the balances left by the
+    previous hits, and everything is written with one statement.
+    Returns one AttackOutcome or AttackRejected per hit, in order. Ledger
+    rows wait for the caller's ledger.transaction() to commit.
+    """
+    if not hits:
+        return []
+
+    user_ids = sorted({uid for attacker_id, target_id, _ in hits for uid in (attacker_id, target_id)})
+    snapshot = await load_combatants(conn, user_ids, lock=True)
+
+    results = []
+    deltas = defaultdict(lambda: dict.fromkeys(_BATCH_FIELDS, 0))
+    tax = 0
+    history = ([], [], [], [], [], [], [])
+    for attacker_id, target_id, decide in hits:
+        attacker = snapshot.setdefault(attacker_id, Combatant(attacker_id))
+        target = snapshot.setdefault(target_id, Combatant(target_id))
+        try:
+            outcome = decide(attacker, target)
+        except AttackRejected as e:
+            results.append(e)
+            continue
+
+        # Later hits in the batch see this hit's effect
+        attacker.points += outcome.attacker_delta
+        attacker.attack_gains += outcome.attack_gains_delta
+        target.points += outcome.target_delta
+        target.defense_losses += outcome.defense_losses_delta
+        outcome.attacker_points = attacker.points
+        outcome.target_points = target.points
+
+        a = deltas[attacker_id]
+        t = deltas[target_id]
+        a["points"] += outcome.attacker_delta
+        a["attack_gains"] += outcome.attack_gains_delta
+        t["points"] += outcome.target_delta
+        t["defense_losses"] += outcome.defense_losses_delta
+        tier = "high" if outcome.amount > HIGH_STAKES else "low"
+        a[f"attempts_{tier}"] += 1
+        if outcome.success:
+            a[f"wins_{tier}"] += 1
+        if outcome.attacker_profit:
+            a[outcome.attacker_profit] += outcome.attacker_delta
+        if outcome.target_profit:
+            t[outcome.target_profit] += outcome.target_delta
+        tax += outcome.tax
+
+        for column, value in zip(history, (
+            attacker_id,
+            target_id,
+            outcome.attack_type,
+            outcome.amount,
+            outcome.success,
+            outcome.points_gained,
+            outcome.points_lost,
+        )):
+            column.append(value)
+        results.append(outcome)
+
+    if history[0]:
+        ids = list(deltas)
+        columns = [[deltas[uid][field] for uid in ids] for field in _BATCH_FIELDS]
+        counters, profits = columns[: -len(PROFIT_COLUMNS)], columns[-len(PROFIT_COLUMNS) :]
+        await conn.execute(BATCH_APPLY_SQL, ids, *counters, tax, *profits, *history)
+        for (attacker_id, target_id, _), result in zip(hits, results):
+            if not isinstance(result, AttackRejected):
+                ledger.record_attack(attacker_id, target_id, result, conn)
+    return results
@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta, timezone
 
 from dotenv import load_dotenv
 
@@ -6,6 +7,9 @@ from dotenv import load_dotenv
 load_dotenv(".env.secret")
 load_dotenv(".env")
 
+# Bangkok timezone (UTC+7)
+BANGKOK_TZ = timezone(timedelta(hours=7))
+
 
 class Config:
     DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
@@ -25,7 +29,14 @@ class Config:
     BASE_POINTS = 10
     DIMINISHING_FACTOR = 0.8
     COOLDOWN_SECONDS = 15
+    # Per-user chat state cache (cooldown / daily cap pre-filter)
+    CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", 100000))
+    CHAT_CACHE_TTL = int(os.getenv("CHAT_CACHE_TTL", 3600))  # seconds
     PREDICTION_COST = int(os.getenv("PREDICTION_COST", 30))
+    # Pool samples kept per active prediction for /predodds (0 = off)
+    PREDICTION_ODDS_HISTORY = int(os.getenv("PREDICTION_ODDS_HISTORY", 200))
+    # Monthly attack_history partitions kept before the current month
+    ATTACK_HISTORY_RETENTION_MONTHS = int(os.getenv("ATTACK_HISTORY_RETENTION_MONTHS", 3))
 
     # SOOP Notification (disabled by default)
     SOOP_CLIENT_ID = os.getenv("SOOP_CLIENT_ID", "")
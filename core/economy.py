@@ -0,0 +1,497 @@
+"""
+Economy Helpers
+Shared point-movement primitives for the cogs, and the points ledger.
+
+Every change to users.points is also recorded as a ledger row (kind,
+counterparty, signed amount, reference id). Rows are appended to an
+in-memory buffer and written with COPY by a background task (on a size
+or time threshold, and on shutdown), so recording a movement costs no
+round trip. A periodic rollup folds new ledger rows into ledger_balances,
+from which balances and profit_* totals can be derived.
+
+Set-based jobs (daily tax, stash interest) insert their ledger rows in
+the same statement instead; every ledger writer holds the shared ledger
+lock so the rollup never skips a row that commits late.
+
+debit/credit/transfer and the stash moves are single guarded statements
+(UPDATE ... WHERE points >= $n RETURNING), so a balance can't be spent
+twice. Check-then-act flows can also hold user_locks() to queue a hot
+user's concurrent clicks in-process instead of on row locks.
+
+Callers that move points inside a transaction open it with
+ledger.transaction(conn): the helpers' ledger rows (and the listeners
+they notify) are held until it commits and dropped if it rolls back.
+"""
+
+import asyncio
+import contextlib
+import datetime
+import time
+import weakref
+from collections import defaultdict
+
+from core.database import db
+
+# users columns a payout may also add its delta to
+PROFIT_COLUMNS = (
+    "profit_attack",
+    "profit_defense",
+    "profit_prediction",
+    "profit_guildwar",
+    "profit_beg",
+    "profit_trap",
+    "profit_dodge",
+    "profit_pierce",
+)
+
+TAX_POOL_ID = 0  # Ledger account of the tax pool (bot_settings 'tax_pool')
+LEDGER_LOCK_KEY = 7_310_002  # Shared by ledger writers, exclusive for the rollup
+LEDGER_COLUMNS = ("user_id", "kind", "amount", "counterparty_id", "ref_id", "profit_column", "created_at")
+
+# Flush when this many rows are buffered, or every FLUSH_INTERVAL seconds
+FLUSH_SIZE = 1000
+FLUSH_INTERVAL = 5.0
+ROLLUP_INTERVAL = 60.0
+
+_PROFIT_SUMS = ",\n".join(
+    f"COALESCE(SUM(delta) FILTER (WHERE profit_column = '{col}'), 0) AS {col}"
+    for col in PROFIT_COLUMNS
+)
+_PROFIT_UPDATES = ",\n".join(
+    f"{col} = COALESCE(users.{col}, 0) + EXCLUDED.{col}" for col in PROFIT_COLUMNS
+)
+
+BULK_PAYOUT_SQL = f"""
+    INSERT INTO users (user_id, points, {", ".join(PROFIT_COLUMNS)})
+    SELECT user_id, SUM(delta), {_PROFIT_SUMS}
+    FROM UNNEST($1::BIGINT[], $2::INTEGER[], $3::TEXT[]) AS d(user_id, delta, profit_column)
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        points = COALESCE(users.points, 0) + EXCLUDED.points,
+        {_PROFIT_UPDATES}
+    RETURNING user_id, points
+"""
+
+
+async def bulk_payout(conn, payouts, kind: str, ref_id: int = None, counterparty_id: int = None) -> dict:
+    """
+    Apply many point changes in one statement
+
+    payouts: iterable of (user_id, delta, profit_column or None). A user may
+    appear more than once; deltas are summed. Missing users are created.
+    Each payout is recorded in the ledger under `kind`.
+    Returns {user_id: {"delta": total_delta, "points": new_points}}.
+    """
+    user_ids, deltas, columns = [], [], []
+    totals = defaultdict(int)
+    for user_id, delta, profit_column in payouts:
+        if profit_column is not None and profit_column not in PROFIT_COLUMNS:
+            raise ValueError(f"Unknown profit column: {profit_column}")
+        user_ids.append(user_id)
+        deltas.append(delta)
+        columns.append(profit_column)
+        totals[user_id] += delta
+
+    if not user_ids:
+        return {}
+
+    rows = await conn.fetch(BULK_PAYOUT_SQL, user_ids, deltas, columns)
+    for user_id, delta, profit_column in zip(user_ids, deltas, columns):
+        ledger.record_in(conn, user_id, kind, delta, counterparty_id, ref_id, profit_column)
+    return {
+        row["user_id"]: {"delta": totals[row["user_id"]], "points": row["points"]}
+        for row in rows
+    }
+
+
+_LEDGER_PROFIT_SUMS = ",\n".join(
+    f"COALESCE(SUM(amount) FILTER (WHERE profit_column = '{col}'), 0)" for col in PROFIT_COLUMNS
+)
+_LEDGER_PROFIT_UPDATES = ",\n".join(
+    f"{col} = ledger_balances.{col} + EXCLUDED.{col}" for col in PROFIT_COLUMNS
+)
+
+ROLLUP_SQL = f"""
+    INSERT INTO ledger_balances (user_id, points, {", ".join(PROFIT_COLUMNS)}, updated_at)
+    SELECT user_id, SUM(amount), {_LEDGER_PROFIT_SUMS}, NOW()
+    FROM ledger
+    WHERE id > $1 AND id <= $2
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO UPDATE SET
+        points = ledger_balances.points + EXCLUDED.points,
+        {_LEDGER_PROFIT_UPDATES},
+        updated_at = NOW()
+"""
+
+
+async def lock_ledger_shared(conn):
+    """Take the shared ledger lock for the current transaction (before inserting ledger rows)"""
+    await conn.execute("SELECT pg_advisory_xact_lock_shared($1)", LEDGER_LOCK_KEY)
+
+
+class Ledger:
+    def __init__(self):
+        self.buffer = []  # [row tuple in LEDGER_COLUMNS order]
+        self.recorded = 0
+        self.rows_flushed = 0
+        self.flush_count = 0
+        self.flush_failures = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.rollup_count = 0
+        self.rollup_failures = 0
+        self.last_rollup_rows = 0
+        self.last_rollup_ms = 0.0
+        self.listeners = []  # fn(user_id, amount) called for every recorded movement
+        self._pending = {}  # {conn: [record() args]} of open ledger.transaction() blocks
+        self._flush_event = None
+        self._task = None
+        self._lock = asyncio.Lock()  # One flush/rollup at a time
+
+    def subscribe(self, fn):
+        """Call fn(user_id, amount) whenever a movement is recorded"""
+        self.listeners.append(fn)
+
+    def record(
+        self,
+        user_id: int,
+        kind: str,
+        amount: int,
+        counterparty_id: int = None,
+        ref_id: int = None,
+        profit_column: str = None,
+    ):
+        """Buffer one movement of `amount` points (signed) for user_id"""
+        if not amount:
+            return
+        self.buffer.append(
+            (user_id, kind, amount, counterparty_id, ref_id, profit_column, datetime.datetime.now())
+        )
+        self.recorded += 1
+        for fn in self.listeners:
+            fn(user_id, amount)
+        if len(self.buffer) >= FLUSH_SIZE and self._flush_event is not None:
+            self._flush_event.set()
+
+    def record_in(
+        self,
+        conn,
+        user_id: int,
+        kind: str,
+        amount: int,
+        counterparty_id: int = None,
+        ref_id: int = None,
+        profit_column: str = None,
+    ):
+        """record(), held until conn's open ledger.transaction() commits (right away if none is open)"""
+        rows = self._pending.get(conn)
+        if rows is None:
+            self.record(user_id, kind, amount, counterparty_id, ref_id, profit_column)
+        else:
+            rows.append((user_id, kind, amount, counterparty_id, ref_id, profit_column))
+
+    @contextlib.asynccontextmanager
+    async def transaction(self, conn):
+        """conn.transaction() whose record_in() rows are recorded once it commits"""
+        outer = self._pending.get(conn)
+        rows = self._pending[conn] = []
+        try:
+            async with conn.transaction():
+                yield
+        finally:
+            if outer is None:
+                self._pending.pop(conn, None)
+            else:
+                self._pending[conn] = outer
+        # Committed, or released into the enclosing block (which commits them)
+        if outer is not None:
+            outer.extend(rows)
+        else:
+            for row in rows:
+                self.record(*row)
+
+    def record_attack(self, attacker_id: int, target_id: int, outcome, conn=None):
+        """Buffer the attacker, target and tax pool rows of an AttackOutcome"""
+        kind = "pierce" if outcome.attack_type == "pierce" else "attack"
+        self.record_in(conn, attacker_id, kind, outcome.attacker_delta, target_id, None, outcome.attacker_profit)
+        self.record_in(conn, target_id, kind, outcome.target_delta, attacker_id, None, outcome.target_profit)
+        self.record_in(conn, TAX_POOL_ID, kind, outcome.tax, attacker_id)
+
+    async def flush(self) -> int:
+        """COPY all buffered rows into the ledger table, returns number written"""
+        async with self._lock:
+            if not self.buffer:
+                return 0
+            pending = self.buffer
+            self.buffer = []
+
+            started = time.perf_counter()
+            try:
+                async with db.pool.acquire() as conn, conn.transaction():
+                    await lock_ledger_shared(conn)
+                    await conn.copy_records_to_table("ledger", records=pending, columns=LEDGER_COLUMNS)
+            except Exception as e:
+                # Put the rows back so the next flush retries them
+                self.flush_failures += 1
+                self.buffer = pending + self.buffer
+                print(f"Error flushing ledger: {e}")
+                return 0
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flush_count += 1
+            self.rows_flushed += len(pending)
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            return len(pending)
+
+    async def rollup(self) -> int:
+        """Fold ledger rows added since the last rollup into ledger_balances, returns rows folded"""
+        async with self._lock:
+            started = time.perf_counter()
+            try:
+                async with db.pool.acquire() as conn, conn.transaction():
+                    # Wait for in-flight ledger writers so no lower id commits after us
+                    await conn.execute("SELECT pg_advisory_xact_lock($1)", LEDGER_LOCK_KEY)
+                    last_id = await conn.fetchval(
+                        "SELECT last_ledger_id FROM ledger_rollup WHERE id = 1 FOR UPDATE"
+                    )
+                    upto, rows = await conn.fetchrow(
+                        "SELECT COALESCE(MAX(id), $1), COUNT(*) FROM ledger WHERE id > $1", last_id
+                    )
+                    if rows:
+                        await conn.execute(ROLLUP_SQL, last_id, upto)
+                    await conn.execute(
+                        "UPDATE ledger_rollup SET last_ledger_id = $1, rolled_up_at = NOW() WHERE id = 1",
+                        upto,
+                    )
+            except Exception as e:
+                self.rollup_failures += 1
+                print(f"Error rolling up ledger: {e}")
+                return 0
+
+            self.rollup_count += 1
+            self.last_rollup_rows = rows
+            self.last_rollup_ms = (time.perf_counter() - started) * 1000
+            return rows
+
+    async def _run(self):
+        """Background task: flush on size threshold or every FLUSH_INTERVAL, roll up every ROLLUP_INTERVAL"""
+        last_rollup = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            await self.flush()
+            if time.monotonic() - last_rollup >= ROLLUP_INTERVAL:
+                await self.rollup()
+                last_rollup = time.monotonic()
+
+    def start(self):
+        """Start the background flush task on the running loop (idempotent)"""
+        if self._task is not None and not self._task.done():
+            return
+        self._flush_event = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task, write everything still buffered and roll it up"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if db.pool:
+            await self.flush()
+            await self.rollup()
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self.buffer),
+            "recorded": self.recorded,
+            "rows_flushed": self.rows_flushed,
+            "flush_count": self.flush_count,
+            "flush_failures": self.flush_failures,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+            "rollup_count": self.rollup_count,
+            "rollup_failures": self.rollup_failures,
+            "last_rollup_rows": self.last_rollup_rows,
+            "last_rollup_ms": self.last_rollup_ms,
+        }
+
+
+ledger = Ledger()
+
+
+class InsufficientPoints(Exception):
+    """Raised by a guarded debit when the balance doesn't cover the amount"""
+
+    def __init__(self, balance, needed: int):
+        super().__init__(f"balance {balance} is less than {needed}")
+        self.balance = balance  # None if the user has no row yet
+        self.needed = needed
+
+
+class StashFull(Exception):
+    """Raised by deposit_to_stash when the deposit would exceed the cap"""
+
+    def __init__(self, stashed: int, cap: int):
+        super().__init__(f"stash {stashed} is at the {cap} cap")
+        self.stashed = stashed
+        self.cap = cap
+
+
+_user_locks = weakref.WeakValueDictionary()  # {user_id: asyncio.Lock}, dropped once unused
+
+
+def user_lock(user_id: int) -> asyncio.Lock:
+    """In-process lock for one user (shared by everyone currently holding or waiting on it)"""
+    lock = _user_locks.get(user_id)
+    if lock is None:
+        lock = _user_locks[user_id] = asyncio.Lock()
+    return lock
+
+
+@contextlib.asynccontextmanager
+async def user_locks(*user_ids):
+    """Hold the in-process locks of several users, taken in user_id order"""
+    locks = [user_lock(user_id) for user_id in sorted(set(user_ids))]
+    async with contextlib.AsyncExitStack() as stack:
+        for lock in locks:
+            await stack.enter_async_context(lock)
+        yield
+
+
+async def _points(conn, user_id: int):
+    return await conn.fetchval("SELECT points FROM users WHERE user_id = $1", user_id)
+
+
+async def debit(conn, user_id: int, amount: int, kind: str, counterparty_id: int = None, ref_id: int = None) -> int:
+    """Take amount from user_id if they have it, returns the new balance (raises InsufficientPoints)"""
+    points = await conn.fetchval(
+        "UPDATE users SET points = points - $1 WHERE user_id = $2 AND points >= $1 RETURNING points",
+        amount,
+        user_id,
+    )
+    if points is None:
+        # Failure path only: read the balance for the error message
+        raise InsufficientPoints(await _points(conn, user_id), amount)
+    ledger.record_in(conn, user_id, kind, -amount, counterparty_id, ref_id)
+    return points
+
+
+async def credit(
+    conn,
+    user_id: int,
+    amount: int,
+    kind: str,
+    counterparty_id: int = None,
+    ref_id: int = None,
+    profit_column: str = None,
+) -> int:
+    """Give amount to user_id (creating the user if needed), returns the new balance"""
+    profit_set = ""
+    if profit_column is not None:
+        if profit_column not in PROFIT_COLUMNS:
+            raise ValueError(f"Unknown profit column: {profit_column}")
+        profit_set = f", {profit_column} = COALESCE(users.{profit_column}, 0) + $2"
+    points = await conn.fetchval(
+        f"""
+        INSERT INTO users (user_id, points) VALUES ($1, $2)
+        ON CONFLICT (user_id) DO UPDATE SET points = COALESCE(users.points, 0) + $2{profit_set}
+        RETURNING points
+        """,
+        user_id,
+        amount,
+    )
+    ledger.record_in(conn, user_id, kind, amount, counterparty_id, ref_id, profit_column)
+    return points
+
+
+TRANSFER_SQL = """
+    WITH sender AS (
+        UPDATE users SET points = points - $3, total_sent = COALESCE(total_sent, 0) + $3
+        WHERE user_id = $1 AND points >= $3
+        RETURNING points
+    ), receiver AS (
+        INSERT INTO users (user_id, points, total_received)
+        SELECT $2, $4, $4 FROM sender
+        ON CONFLICT (user_id) DO UPDATE SET
+            points = COALESCE(users.points, 0) + $4,
+            total_received = COALESCE(users.total_received, 0) + $4
+        RETURNING points
+    ), tax AS (
+        INSERT INTO bot_settings (key, value)
+        SELECT 'tax_pool', $5::INTEGER::TEXT FROM sender WHERE $5::INTEGER > 0
+        ON CONFLICT (key) DO UPDATE SET value = (COALESCE(CAST(bot_settings.value AS INTEGER), 0) + $5::INTEGER)::TEXT
+    )
+    SELECT (SELECT points FROM sender) AS sender_points,
+           (SELECT points FROM receiver) AS receiver_points
+"""
+
+
+async def transfer(
+    conn, sender_id: int, receiver_id: int, amount: int, kind: str, tax: int = 0, ref_id: int = None
+) -> tuple:
+    """
+    Move amount from sender to receiver in one statement
+
+    The receiver gets amount - tax, the tax goes to the tax pool. Tracks
+    total_sent/total_received. Returns (sender_points, receiver_points),
+    raises InsufficientPoints if the sender can't cover amount.
+    """
+    if sender_id == receiver_id:
+        raise ValueError("Cannot transfer points to the same user")
+    row = await conn.fetchrow(TRANSFER_SQL, sender_id, receiver_id, amount, amount - tax, tax)
+    if row["sender_points"] is None:
+        raise InsufficientPoints(await _points(conn, sender_id), amount)
+    ledger.record_in(conn, sender_id, kind, -amount, receiver_id, ref_id)
+    ledger.record_in(conn, receiver_id, kind, amount - tax, sender_id, ref_id)
+    ledger.record_in(conn, TAX_POOL_ID, kind, tax, sender_id, ref_id)
+    return row["sender_points"], row["receiver_points"]
+
+
+async def deposit_to_stash(conn, user_id: int, amount: int, cap: int) -> tuple:
+    """Move points into the stash, returns (points, stashed) (raises InsufficientPoints or StashFull)"""
+    row = await conn.fetchrow(
+        """
+        UPDATE users SET points = points - $1, stashed_points = COALESCE(stashed_points, 0) + $1
+        WHERE user_id = $2 AND points >= $1 AND COALESCE(stashed_points, 0) + $1 <= $3
+        RETURNING points, stashed_points
+        """,
+        amount,
+        user_id,
+        cap,
+    )
+    if row is None:
+        current = await conn.fetchrow(
+            "SELECT points, COALESCE(stashed_points, 0) AS stashed_points FROM users WHERE user_id = $1",
+            user_id,
+        )
+        if current is None or (current["points"] or 0) < amount:
+            raise InsufficientPoints(current and (current["points"] or 0), amount)
+        raise StashFull(current["stashed_points"], cap)
+    ledger.record_in(conn, user_id, "stash_deposit", -amount)
+    return row["points"], row["stashed_points"]
+
+
+async def withdraw_from_stash(conn, user_id: int, amount: int) -> tuple:
+    """Move points out of the stash, returns (points, stashed) (raises InsufficientPoints with the stash balance)"""
+    row = await conn.fetchrow(
+        """
+        UPDATE users SET points = points + $1, stashed_points = stashed_points - $1
+        WHERE user_id = $2 AND stashed_points >= $1
+        RETURNING points, stashed_points
+        """,
+        amount,
+        user_id,
+    )
+    if row is None:
+        stashed = await conn.fetchval("SELECT stashed_points FROM users WHERE user_id = $1", user_id)
+        raise InsufficientPoints(stashed, amount)
+    ledger.record_in(conn, user_id, "stash_withdraw", amount)
+    return row["points"], row["stashed_points"]
@@ -0,0 +1,85 @@
+"""
+Embed Refresher
+Change detection for live embeds (prediction messages). Each message
+keeps the fingerprint of what it last showed; a refresh whose fingerprint
+matches is skipped instead of spending an edit. Refresh requests for the
+same message within one window (a burst of bets) share a single edit.
+"""
+
+import asyncio
+import time
+
+EDIT_WINDOW = 5.0
+
+
+class EmbedRefresher:
+    def __init__(self, window: float = EDIT_WINDOW):
+        self.window = window
+        self.handler = None  # async fn(key) that refreshes one message
+        self.fingerprints = {}  # {key: fingerprint last shown}
+        self.last_edit = {}  # {key: monotonic time of the last edit}
+        self.pending = {}  # {key: asyncio.Task} of scheduled refreshes
+        self.performed = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def request(self, key):
+        """Refresh a message soon, at most once per window"""
+        if self.handler is None:
+            return
+        if key in self.pending:
+            self.coalesced += 1
+            return
+        delay = max(0.0, self.last_edit.get(key, 0.0) + self.window - time.monotonic())
+        self.pending[key] = asyncio.get_running_loop().create_task(self._run(key, delay))
+
+    async def _run(self, key, delay: float):
+        await asyncio.sleep(delay)
+        # Requests from here on schedule the next refresh
+        self.pending.pop(key, None)
+        try:
+            await self.handler(key)
+        except Exception as e:
+            self.failures += 1
+            print(f"Error refreshing embed {key}: {e}")
+
+    def changed(self, key, fingerprint) -> bool:
+        """False (and counted as skipped) when the message already shows this fingerprint"""
+        if self.fingerprints.get(key) == fingerprint:
+            self.skipped += 1
+            return False
+        return True
+
+    def edited(self, key, fingerprint):
+        self.fingerprints[key] = fingerprint
+        self.last_edit[key] = time.monotonic()
+        self.performed += 1
+
+    def forget(self, key):
+        """Drop a message that is no longer refreshed (locked, resolved, ...)"""
+        self.fingerprints.pop(key, None)
+        self.last_edit.pop(key, None)
+        task = self.pending.pop(key, None)
+        if task:
+            task.cancel()
+
+    def stop(self):
+        for task in self.pending.values():
+            task.cancel()
+        self.pending.clear()
+
+    def stats(self) -> dict:
+        attempts = self.performed + self.skipped
+        return {
+            "tracked": len(self.fingerprints),
+            "pending": len(self.pending),
+            "performed": self.performed,
+            "skipped": self.skipped,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "skip_rate": self.skipped / attempts if attempts else 0.0,
+        }
+
+
+prediction_embeds = EmbedRefresher()
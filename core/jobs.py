@@ -0,0 +1,164 @@
+"""
+Daily Job Scheduler
+Runs business-date jobs (daily tax, interest, ...) at most once per date.
+
+Each run takes a per-job advisory lock, checks the job_runs table and
+commits the job's work together with its job_runs checkpoint, so a
+duplicate or concurrent run for the same date is skipped. Ledger rows
+the job records are held until that commit. Dates missed
+while the bot was down are replayed in order on startup.
+"""
+
+import datetime
+import time
+
+from core.database import db
+from core.economy import ledger
+
+MAX_REPLAY_DAYS = 7  # Don't replay more than a week of missed runs
+
+
+class JobStats:
+    __slots__ = ("runs", "skipped", "failures", "total_ms", "max_ms", "last_ms", "last_rows", "total_rows")
+
+    def __init__(self):
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+        self.last_rows = 0
+        self.total_rows = 0
+
+
+class JobScheduler:
+    def __init__(self):
+        self.jobs = {}  # {job_name: async fn(conn, business_date) -> dict with "rows"}
+        self.stats = {}  # {job_name: JobStats}
+
+    def register(self, name: str, fn):
+        """Register a job; fn runs inside the checkpoint transaction"""
+        self.jobs[name] = fn
+        self.stats.setdefault(name, JobStats())
+
+    async def run(self, name: str, business_date: datetime.date):
+        """
+        Run a job for a business date
+
+        Returns the job's result dict, or None if it already ran for that date.
+        Raises if the job fails (the failure is recorded in job_runs).
+        """
+        fn = self.jobs[name]
+        stats = self.stats[name]
+        started_at = datetime.datetime.now()
+        started = time.perf_counter()
+
+        async with db.pool.acquire() as conn:
+            try:
+                async with ledger.transaction(conn):
+                    # Serialize runs of this job across connections/processes
+                    await conn.execute(
+                        "SELECT pg_advisory_xact_lock(hashtext('job:' || $1))", name
+                    )
+                    status = await conn.fetchval(
+                        "SELECT status FROM job_runs WHERE job = $1 AND business_date = $2",
+                        name,
+                        business_date,
+                    )
+                    if status == "success":
+                        stats.skipped += 1
+                        return None
+
+                    result = await fn(conn, business_date)
+                    rows = result.get("rows", 0)
+                    duration_ms = (time.perf_counter() - started) * 1000
+
+                    # Checkpoint commits atomically with the job's own writes
+                    await conn.execute(
+                        """
+                        INSERT INTO job_runs (job, business_date, status, started_at, finished_at, duration_ms, rows_touched, error)
+                        VALUES ($1, $2, 'success', $3, $4, $5, $6, NULL)
+                        ON CONFLICT (job, business_date) DO UPDATE SET
+                            status = 'success', started_at = $3, finished_at = $4,
+                            duration_ms = $5, rows_touched = $6, error = NULL
+                        """,
+                        name,
+                        business_date,
+                        started_at,
+                        datetime.datetime.now(),
+                        int(duration_ms),
+                        rows,
+                    )
+            except Exception as e:
+                duration_ms = (time.perf_counter() - started) * 1000
+                stats.failures += 1
+                await conn.execute(
+                    """
+                    INSERT INTO job_runs (job, business_date, status, started_at, finished_at, duration_ms, rows_touched, error)
+                    VALUES ($1, $2, 'failed', $3, $4, $5, 0, $6)
+                    ON CONFLICT (job, business_date) DO UPDATE SET
+                        status = 'failed', started_at = $3, finished_at = $4,
+                        duration_ms = $5, rows_touched = 0, error = $6
+                    """,
+                    name,
+                    business_date,
+                    started_at,
+                    datetime.datetime.now(),
+                    int(duration_ms),
+                    str(e),
+                )
+                raise
+
+        stats.runs += 1
+        stats.last_ms = duration_ms
+        stats.total_ms += duration_ms
+        stats.max_ms = max(stats.max_ms, duration_ms)
+        stats.last_rows = rows
+        stats.total_rows += rows
+        return result
+
+    async def missed_dates(self, name: str, today: datetime.date) -> list:
+        """Business dates after the last successful run, up to and including today"""
+        async with db.pool.acquire() as conn:
+            last_date = await conn.fetchval(
+                "SELECT MAX(business_date) FROM job_runs WHERE job = $1 AND status = 'success'",
+                name,
+            )
+
+        # Never ran before: nothing to catch up on
+        if last_date is None or last_date >= today:
+            return []
+
+        first = max(last_date + datetime.timedelta(days=1), today - datetime.timedelta(days=MAX_REPLAY_DAYS - 1))
+        days = (today - first).days + 1
+        return [first + datetime.timedelta(days=i) for i in range(days)]
+
+    async def replay_missed(self, name: str, today: datetime.date) -> list:
+        """Run a job for every missed business date in order, returns [(date, result)]"""
+        results = []
+        for business_date in await self.missed_dates(name, today):
+            print(f"Replaying missed job {name} for {business_date}")
+            result = await self.run(name, business_date)
+            if result is not None:
+                results.append((business_date, result))
+        return results
+
+    def metrics(self) -> dict:
+        """Runtime metrics per job"""
+        return {
+            name: {
+                "runs": s.runs,
+                "skipped": s.skipped,
+                "failures": s.failures,
+                "last_ms": s.last_ms,
+                "avg_ms": s.total_ms / s.runs if s.runs else 0,
+                "max_ms": s.max_ms,
+                "last_rows": s.last_rows,
+                "total_rows": s.total_rows,
+            }
+            for name, s in self.stats.items()
+        }
+
+
+jobs = JobScheduler()
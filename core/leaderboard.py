@@ -0,0 +1,83 @@
+"""
+Leaderboard Cache
+Top users by points, read with one indexed LIMIT query that leaves out
+the mod accounts in SQL (the set of mod IDs is kept up to date by the
+Points cog). The result is cached for CACHE_TTL seconds, and economy
+writes that could change it drop the cache: a cached user's balance
+moving, or anyone gaining points.
+"""
+
+import time
+
+from core.database import db
+from core.economy import TAX_POOL_ID, ledger
+
+CACHE_TTL = 30.0
+TOP_N = 10
+
+TOP_SQL = """
+    SELECT user_id, points FROM users
+    WHERE points IS NOT NULL AND user_id <> ALL($1::BIGINT[])
+    ORDER BY points DESC
+    LIMIT $2
+"""
+
+
+class Leaderboard:
+    def __init__(self, size: int = TOP_N, ttl: float = CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.excluded = frozenset()  # Mod user IDs
+        self.rows = None  # [(user_id, points)] or None when not cached
+        self.top_ids = frozenset()
+        self.cached_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def set_excluded(self, user_ids):
+        """Replace the set of users left out of the leaderboard"""
+        user_ids = frozenset(user_ids)
+        if user_ids != self.excluded:
+            self.excluded = user_ids
+            self.invalidate()
+
+    def invalidate(self):
+        if self.rows is not None:
+            self.rows = None
+            self.invalidations += 1
+
+    def on_movement(self, user_id: int, amount: int):
+        """Ledger listener: drop the cache if this movement could reorder the top"""
+        if self.rows is None or user_id == TAX_POOL_ID:
+            return
+        if user_id in self.top_ids or amount > 0:
+            self.invalidate()
+
+    async def top(self) -> list:
+        """[(user_id, points)] for the top users, highest first"""
+        if self.rows is not None and time.monotonic() - self.cached_at < self.ttl:
+            self.hits += 1
+            return self.rows
+
+        self.misses += 1
+        async with db.pool.acquire() as conn:
+            records = await conn.fetch(TOP_SQL, list(self.excluded), self.size)
+        self.rows = [(row["user_id"], row["points"]) for row in records]
+        self.top_ids = frozenset(user_id for user_id, _ in self.rows)
+        self.cached_at = time.monotonic()
+        return self.rows
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "excluded": len(self.excluded),
+        }
+
+
+leaderboard = Leaderboard()
+ledger.subscribe(leaderboard.on_movement)
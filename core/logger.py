@@ -1,55 +1,184 @@
 """
-JSON File Logger
-Logs to JSON files, split per cog, 1 file per day, keeps 30 days
+JSON Lines File Logger
+Logs to newline-delimited JSON files, split per cog, 1 file per day, keeps 30 days
+
+Entries are buffered in memory and appended to disk by a background task
+(on a size or time threshold, and on shutdown), so logging an event costs
+the same no matter how many events were already written that day.
+Legacy `cog_name_YYYY-MM-DD.json` array files are still readable.
 """
 
+import asyncio
+import atexit
 import json
-import os
+import threading
+from collections import defaultdict
 from datetime import datetime, timedelta
 from pathlib import Path
 
 LOGS_DIR = Path("logs")
 MAX_DAYS = 30
 
+# Flush when this many entries are buffered, or every FLUSH_INTERVAL seconds
+FLUSH_SIZE = 500
+FLUSH_INTERVAL = 5.0
+
+_buffer = []  # [(log_file, json_line)]
+_buffer_lock = threading.Lock()
+_write_lock = threading.Lock()
+_flush_event = None
+_flush_task = None
+
 
-def get_log_file(cog_name: str) -> Path:
+def get_log_file(cog_name: str, day: str = None) -> Path:
     """Get the log file path for a cog (creates directory if needed)"""
     LOGS_DIR.mkdir(exist_ok=True)
-    today = datetime.now().strftime("%Y-%m-%d")
-    return LOGS_DIR / f"{cog_name}_{today}.json"
+    day = day or datetime.now().strftime("%Y-%m-%d")
+    return LOGS_DIR / f"{cog_name}_{day}.jsonl"
+
+
+def get_legacy_log_file(cog_name: str, day: str) -> Path:
+    """Get the old JSON-array log file path for a cog"""
+    return LOGS_DIR / f"{cog_name}_{day}.json"
 
 
 def log(cog_name: str, event: str, data: dict = None):
     """
-    Log an event to JSON file
+    Log an event (buffered, written to disk by the background flusher)
 
     Args:
         cog_name: Name of the cog (e.g., "spam_detector", "points")
         event: Event type (e.g., "link_detected", "user_banned")
         data: Additional data to log
     """
-    log_file = get_log_file(cog_name)
-
+    now = datetime.now()
     entry = {
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now.isoformat(),
         "event": event,
         "data": data or {},
     }
+    line = json.dumps(entry, ensure_ascii=False, default=str)
+    log_file = get_log_file(cog_name, now.strftime("%Y-%m-%d"))
+
+    with _buffer_lock:
+        _buffer.append((log_file, line))
+        size = len(_buffer)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # No event loop (scripts, shutdown) - write straight away
+        flush_logs()
+        return
+
+    start_log_flusher()
+    if size >= FLUSH_SIZE:
+        _flush_event.set()
+
+
+def flush_logs() -> int:
+    """Append all buffered entries to their files, returns number written"""
+    # Held from taking the entries until they are on disk, so readers see each entry once
+    with _write_lock:
+        with _buffer_lock:
+            if not _buffer:
+                return 0
+            pending = _buffer[:]
+            _buffer.clear()
 
-    # Read existing logs or start fresh
-    logs = []
-    if log_file.exists():
+        by_file = defaultdict(list)
+        for log_file, line in pending:
+            by_file[log_file].append(line)
+
+        for log_file, lines in by_file.items():
+            try:
+                LOGS_DIR.mkdir(exist_ok=True)
+                with open(log_file, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+            except OSError as e:
+                print(f"Failed to write log file {log_file}: {e}")
+
+    return len(pending)
+
+
+async def _flush_loop():
+    """Background task: flush on size threshold or every FLUSH_INTERVAL"""
+    while True:
         try:
-            with open(log_file, "r", encoding="utf-8") as f:
-                logs = json.load(f)
+            await asyncio.wait_for(_flush_event.wait(), timeout=FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _flush_event.clear()
+        await asyncio.to_thread(flush_logs)
+
+
+def start_log_flusher():
+    """Start the background flush task on the running loop (idempotent)"""
+    global _flush_event, _flush_task
+    if _flush_task is not None and not _flush_task.done():
+        return
+    _flush_event = asyncio.Event()
+    _flush_task = asyncio.get_running_loop().create_task(_flush_loop())
+
+
+async def close_logger():
+    """Stop the background flusher and write everything still buffered"""
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+    await asyncio.to_thread(flush_logs)
+
+
+# Last-chance flush if the process exits without close_logger()
+atexit.register(flush_logs)
+
+
+def read_logs(cog_name: str, day: str = None) -> list:
+    """
+    Read a cog's log entries for a day (YYYY-MM-DD, default today)
+
+    Loads both the old JSON-array file and the JSON Lines file, plus entries
+    still in the buffer (read in place, so no flush runs on the caller's loop).
+    """
+    day = day or datetime.now().strftime("%Y-%m-%d")
+    entries = []
+
+    legacy_file = get_legacy_log_file(cog_name, day)
+    if legacy_file.exists():
+        try:
+            with open(legacy_file, "r", encoding="utf-8") as f:
+                entries.extend(json.load(f))
         except (json.JSONDecodeError, IOError):
-            logs = []
+            pass
 
-    logs.append(entry)
+    log_file = LOGS_DIR / f"{cog_name}_{day}.jsonl"
 
-    # Write back
-    with open(log_file, "w", encoding="utf-8") as f:
-        json.dump(logs, f, ensure_ascii=False, indent=2)
+    # No flush can move entries from the buffer to the file while we read both
+    with _write_lock:
+        lines = []
+        if log_file.exists():
+            with open(log_file, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        with _buffer_lock:
+            buffered = [line for buffered_file, line in _buffer if buffered_file == log_file]
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entries.append(json.loads(line))
+        except json.JSONDecodeError:
+            # Skip a partially written line
+            pass
+
+    entries.extend(json.loads(line) for line in buffered)
+    return entries
 
 
 def cleanup_old_logs():
@@ -59,14 +188,15 @@ def cleanup_old_logs():
 
     cutoff = datetime.now() - timedelta(days=MAX_DAYS)
 
-    for log_file in LOGS_DIR.glob("*.json"):
-        try:
-            # Extract date from filename (cog_name_YYYY-MM-DD.json)
-            date_str = log_file.stem.split("_")[-1]
-            file_date = datetime.strptime(date_str, "%Y-%m-%d")
-
-            if file_date < cutoff:
-                log_file.unlink()
-        except (ValueError, IndexError):
-            # Skip files with unexpected naming
-            pass
+    for pattern in ("*.json", "*.jsonl"):
+        for log_file in LOGS_DIR.glob(pattern):
+            try:
+                # Extract date from filename (cog_name_YYYY-MM-DD.json[l])
+                date_str = log_file.stem.split("_")[-1]
+                file_date = datetime.strptime(date_str, "%Y-%m-%d")
+
+                if file_date < cutoff:
+                    log_file.unlink()
+            except (ValueError, IndexError):
+                # Skip files with unexpected naming
+                pass
@@ -0,0 +1,90 @@
+"""
+Schema Migrations
+Applies the numbered SQL files in migrations/ (0001_initial_schema.sql,
+0002_..., ...) that the database has not seen yet, in order.
+
+Applied versions are recorded in the schema_version table. A warm start
+is a single version query; only when files are pending is the advisory
+lock taken, so concurrent instances never apply the same file twice.
+"""
+
+import re
+import time
+from pathlib import Path
+
+import asyncpg
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+MIGRATION_LOCK_KEY = 7_310_001  # pg_advisory_lock key for schema changes
+
+_FILENAME = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+def discover_migrations(directory: Path = MIGRATIONS_DIR) -> list:
+    """Numbered migration files sorted by version, returns [(version, name, path)]"""
+    migrations = []
+    seen = {}
+    for path in directory.glob("*.sql"):
+        match = _FILENAME.match(path.name)
+        if not match:
+            print(f"Skipping unnumbered migration file: {path.name}")
+            continue
+        version = int(match.group(1))
+        if version in seen:
+            raise RuntimeError(f"Duplicate migration version {version}: {seen[version]} and {path.name}")
+        seen[version] = path.name
+        migrations.append((version, match.group(2), path))
+    return sorted(migrations)
+
+
+async def current_version(conn) -> int:
+    """Highest applied version (0 if schema_version doesn't exist yet)"""
+    try:
+        return await conn.fetchval("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    except asyncpg.UndefinedTableError:
+        return 0
+
+
+async def run_migrations(pool, directory: Path = MIGRATIONS_DIR) -> list:
+    """Apply pending migrations, returns the versions that were applied"""
+    migrations = discover_migrations(directory)
+    latest = migrations[-1][0] if migrations else 0
+
+    async with pool.acquire() as conn:
+        # Warm start: one query and we're done
+        if await current_version(conn) >= latest:
+            return []
+
+        await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_KEY)
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT NOW()
+                )
+            """)
+            # Another instance may have migrated while we waited for the lock
+            applied = {
+                row["version"]
+                for row in await conn.fetch("SELECT version FROM schema_version")
+            }
+
+            done = []
+            for version, name, path in migrations:
+                if version in applied:
+                    continue
+                started = time.perf_counter()
+                async with conn.transaction():
+                    await conn.execute(path.read_text(encoding="utf-8"))
+                    await conn.execute(
+                        "INSERT INTO schema_version (version, name) VALUES ($1, $2)",
+                        version,
+                        name,
+                    )
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                print(f"Applied migration {path.name} ({elapsed_ms:.0f} ms)")
+                done.append(version)
+            return done
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_KEY)
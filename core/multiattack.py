@@ -0,0 +1,137 @@
+"""
+Multiattack Runs
+Multiattack progress lives in the multiattack_runs table, and each run's
+next hit sits on the shared timer wheel (core.timers). All hits due in
+the same tick, across every user, are resolved in one transaction by the
+Points cog. Runs survive restarts.
+"""
+
+import datetime
+
+from core.attacks import AttackRejected
+
+HIT_KIND = "multiattack_hit"
+
+RUN_FIELDS = (
+    "id",
+    "attacker_id",
+    "target_id",
+    "attacker_name",
+    "target_name",
+    "amount",
+    "times",
+    "delay_seconds",
+    "hits_done",
+    "successful",
+    "failed",
+    "skipped",
+    "countered",
+    "total_gained",
+    "total_lost",
+    "next_hit_at",
+    "interaction_token",
+)
+
+SAVE_SQL = """
+    UPDATE multiattack_runs AS r SET
+        hits_done = d.hits_done,
+        successful = d.successful,
+        failed = d.failed,
+        skipped = d.skipped,
+        countered = d.countered,
+        total_gained = d.total_gained,
+        total_lost = d.total_lost,
+        next_hit_at = d.next_hit_at
+    FROM UNNEST(
+        $1::BIGINT[], $2::INTEGER[], $3::INTEGER[], $4::INTEGER[], $5::INTEGER[],
+        $6::INTEGER[], $7::INTEGER[], $8::INTEGER[], $9::TIMESTAMP[]
+    ) AS d(id, hits_done, successful, failed, skipped, countered, total_gained, total_lost, next_hit_at)
+    WHERE r.id = d.id
+"""
+
+
+class MultiattackRun:
+    __slots__ = RUN_FIELDS
+
+    def __init__(self, row):
+        for field in RUN_FIELDS:
+            setattr(self, field, row[field])
+
+    @property
+    def finished(self) -> bool:
+        return self.hits_done >= self.times
+
+    def record(self, result, is_countered: bool, now: datetime.datetime):
+        """Count one hit (an AttackOutcome or AttackRejected) and schedule the next"""
+        self.hits_done += 1
+        if is_countered:
+            self.countered += 1
+        if isinstance(result, AttackRejected):
+            # Attack couldn't be performed (defense cap, not enough points, ...)
+            self.skipped += 1
+        elif result.success:
+            self.successful += 1
+            self.total_gained += result.attacker_delta
+        else:
+            self.failed += 1
+            self.total_lost += -result.attacker_delta
+        self.next_hit_at = now + datetime.timedelta(seconds=self.delay_seconds)
+
+
+async def create_run(conn, attacker, target, amount: int, times: int, delay: int, token: str) -> MultiattackRun:
+    """Store a new run whose first hit is due immediately"""
+    row = await conn.fetchrow(
+        f"""
+        INSERT INTO multiattack_runs
+            (attacker_id, target_id, attacker_name, target_name, amount, times,
+             delay_seconds, next_hit_at, interaction_token)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+        RETURNING {", ".join(RUN_FIELDS)}
+        """,
+        attacker.id,
+        target.id,
+        attacker.display_name,
+        target.display_name,
+        amount,
+        times,
+        delay,
+        datetime.datetime.now(),
+        token,
+    )
+    return MultiattackRun(row)
+
+
+async def lock_runs(conn, run_ids: list) -> list:
+    """Lock and load runs by id (in id order)"""
+    rows = await conn.fetch(
+        f"SELECT {', '.join(RUN_FIELDS)} FROM multiattack_runs WHERE id = ANY($1::BIGINT[]) ORDER BY id FOR UPDATE",
+        run_ids,
+    )
+    return [MultiattackRun(row) for row in rows]
+
+
+async def save_runs(conn, runs: list):
+    """Write back progress for unfinished runs and drop finished ones"""
+    active = [run for run in runs if not run.finished]
+    finished = [run.id for run in runs if run.finished]
+    if active:
+        await conn.execute(
+            SAVE_SQL,
+            [run.id for run in active],
+            [run.hits_done for run in active],
+            [run.successful for run in active],
+            [run.failed for run in active],
+            [run.skipped for run in active],
+            [run.countered for run in active],
+            [run.total_gained for run in active],
+            [run.total_lost for run in active],
+            [run.next_hit_at for run in active],
+        )
+    if finished:
+        await conn.execute("DELETE FROM multiattack_runs WHERE id = ANY($1::BIGINT[])", finished)
+
+
+async def load_pending_hits(conn) -> list:
+    """Timer source: the next hit of every stored run"""
+    rows = await conn.fetch("SELECT id, next_hit_at FROM multiattack_runs")
+    return [(row["next_hit_at"], {"run_id": row["id"]}) for row in rows]
@@ -0,0 +1,125 @@
+"""
+Live Odds Book
+Pool and bettor count per choice of every active (betting or locked)
+prediction, held in memory so the prediction embeds and /predictions
+render without a query. Loaded from Postgres on start, updated right
+after each accepted bet commits, and replaced with a fresh snapshot
+whenever a moderation command changes a prediction.
+
+Each prediction also keeps a bounded series of pool samples (one per
+bet) so /predodds can show how the odds moved.
+"""
+
+import datetime
+from collections import deque
+
+from core.config import Config
+from core.predictions import fetch_predictions
+
+ACTIVE_STATUSES = ("betting", "locked")
+PAYOUT_RATE = 0.90  # Return shown after the 10% tax
+SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+
+
+def returns(pools: dict, choices) -> dict:
+    """{choice_number: after-tax return ratio, None if nobody bet on it}"""
+    total = sum(pools.values())
+    return {
+        number: total / pools[number] * PAYOUT_RATE if pools.get(number) else None
+        for number, _ in choices
+    }
+
+
+def sparkline(values: list) -> str:
+    """One block per value scaled between the min and max (a space for None)"""
+    known = [value for value in values if value is not None]
+    if not known:
+        return " " * len(values)
+    low, high = min(known), max(known)
+    span = high - low or 1
+    top = len(SPARK_BLOCKS) - 1
+    return "".join(
+        " " if value is None else SPARK_BLOCKS[round((value - low) / span * top)]
+        for value in values
+    )
+
+
+class OddsBook:
+    def __init__(self, history_size: int = Config.PREDICTION_ODDS_HISTORY):
+        self.history_size = history_size
+        self.predictions = {}  # {prediction_id: PredictionSnapshot}
+        self.history = {}  # {prediction_id: deque of (sampled_at, {choice: pool})}
+        self.ready = False
+        self.bets_applied = 0
+
+    async def rebuild(self, conn) -> int:
+        """Load every active prediction with its pools, returns how many"""
+        snapshots = await fetch_predictions(conn, ACTIVE_STATUSES)
+        self.predictions = {}
+        active_ids = {snapshot.id for snapshot in snapshots}
+        self.history = {key: series for key, series in self.history.items() if key in active_ids}
+        for snapshot in snapshots:
+            self.put(snapshot)
+        self.ready = True
+        return len(snapshots)
+
+    def put(self, snapshot):
+        """Add or replace a prediction (inactive ones are dropped)"""
+        if snapshot is None:
+            return
+        if snapshot.status not in ACTIVE_STATUSES:
+            self.discard(snapshot.id)
+            return
+        self.predictions[snapshot.id] = snapshot
+        if snapshot.id not in self.history:
+            self._sample(snapshot)
+
+    def discard(self, prediction_id: int):
+        self.predictions.pop(prediction_id, None)
+        self.history.pop(prediction_id, None)
+
+    def get(self, prediction_id: int):
+        return self.predictions.get(prediction_id)
+
+    def active(self, status: str = None) -> list:
+        """Active predictions (optionally of one status) in id order"""
+        return [
+            pred
+            for _, pred in sorted(self.predictions.items())
+            if status is None or pred.status == status
+        ]
+
+    def set_status(self, prediction_id: int, status: str):
+        pred = self.predictions.get(prediction_id)
+        if pred is None:
+            return
+        if status in ACTIVE_STATUSES:
+            pred.status = status
+        else:
+            self.discard(prediction_id)
+
+    def apply_bet(self, prediction_id: int, choice_number: int, amount: int, new_bettor: bool):
+        """Add a committed bet to its choice's pool"""
+        pred = self.predictions.get(prediction_id)
+        if pred is None:
+            return
+        pred.pool_by_choice[choice_number] = pred.pool_by_choice.get(choice_number, 0) + amount
+        if new_bettor:
+            pred.bettors_by_choice[choice_number] = pred.bettors_by_choice.get(choice_number, 0) + 1
+        self.bets_applied += 1
+        self._sample(pred)
+
+    def _sample(self, pred):
+        if self.history_size <= 0:
+            return
+        series = self.history.get(pred.id)
+        if series is None:
+            series = self.history[pred.id] = deque(maxlen=self.history_size)
+        series.append((datetime.datetime.now(), dict(pred.pool_by_choice)))
+
+    def line(self, prediction_id: int) -> list:
+        """[(sampled_at, {choice: pool})] oldest first"""
+        return list(self.history.get(prediction_id, ()))
+
+
+odds_book = OddsBook()
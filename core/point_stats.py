@@ -0,0 +1,72 @@
+"""
+Point Analysis
+Quartiles, mean and the fixed-width histogram behind /pointanalysis,
+computed in Postgres in one round trip (percentile_cont and a GROUP BY
+on the bin number) instead of pulling every balance into Python.
+Results are cached per economy snapshot: any recorded point movement
+(or a daily engine run) drops the cache.
+"""
+
+import time
+
+from core.economy import ledger
+
+MAX_BINS = 50
+
+ANALYSIS_SQL = """
+    WITH wealth AS (
+        SELECT COALESCE(points, 0) + CASE WHEN $2 THEN COALESCE(stashed_points, 0) ELSE 0 END AS value
+        FROM users
+        WHERE points IS NOT NULL
+    ),
+    bins AS (
+        SELECT FLOOR(value / $1::NUMERIC)::BIGINT AS bin, COUNT(*) AS users
+        FROM wealth
+        GROUP BY 1
+    )
+    SELECT
+        (SELECT COUNT(*) FROM wealth) AS users,
+        (SELECT AVG(value) FROM wealth) AS mean,
+        (SELECT percentile_cont(ARRAY[0.25, 0.5, 0.75]) WITHIN GROUP (ORDER BY value) FROM wealth) AS quartiles,
+        ARRAY(SELECT bin FROM bins ORDER BY bin) AS bins,
+        ARRAY(SELECT users FROM bins ORDER BY bin) AS counts
+"""
+
+
+class PointAnalysis:
+    def __init__(self):
+        self.cache = {}  # {(bin_width, include_stash): result}
+
+    def invalidate(self):
+        self.cache.clear()
+
+    def on_movement(self, user_id: int, amount: int):
+        """Ledger listener: balances moved, the cached snapshot is stale"""
+        if self.cache:
+            self.cache.clear()
+
+    async def analyze(self, conn, bin_width: int, include_stash: bool) -> dict:
+        """Statistics and [(bin_start, count)] histogram of user balances"""
+        key = (bin_width, include_stash)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
+        row = await conn.fetchrow(ANALYSIS_SQL, bin_width, include_stash)
+        result = {
+            "users": row["users"],
+            "mean": float(row["mean"]) if row["mean"] is not None else 0.0,
+            "quartiles": row["quartiles"] or [0.0, 0.0, 0.0],
+            "histogram": [(bin * bin_width, count) for bin, count in zip(row["bins"], row["counts"])],
+            "bin_width": bin_width,
+            "include_stash": include_stash,
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+            "computed_at": time.monotonic(),
+        }
+        self.cache[key] = result
+        return result
+
+
+point_stats = PointAnalysis()
+ledger.subscribe(point_stats.on_movement)
@@ -0,0 +1,136 @@
+"""
+Prediction Snapshots
+A prediction together with its choices, pool and bettor count per choice,
+loaded for any number of predictions in a single query. Bets are summed
+per choice through idx_prediction_bets_choice, so the cost no longer
+grows with four queries per prediction.
+
+Betting deadlines are timers on the shared wheel (core.timers): each
+prediction locks at its ends_at, seeded from the predictions table on
+start and placed when a prediction is created. Timers can't be cancelled:
+a stale one is dropped against lock_schedule.open before any query, and
+lock_predictions' status = 'betting' guard backs that up.
+"""
+
+from core.timers import timers
+
+LOCK_KIND = "prediction_lock"
+
+PREDICTION_FIELDS = (
+    "id",
+    "title",
+    "creator_id",
+    "status",
+    "winning_choice",
+    "ends_at",
+    "message_id",
+    "channel_id",
+    "max_bet",
+)
+
+SNAPSHOT_SQL = f"""
+    SELECT {", ".join("p." + field for field in PREDICTION_FIELDS)},
+           c.choice_numbers, c.choice_texts, c.pools, c.bettors
+    FROM predictions p
+    CROSS JOIN LATERAL (
+        SELECT ARRAY_AGG(pc.choice_number ORDER BY pc.choice_number) AS choice_numbers,
+               ARRAY_AGG(pc.choice_text ORDER BY pc.choice_number) AS choice_texts,
+               ARRAY_AGG(COALESCE(s.pool, 0) ORDER BY pc.choice_number) AS pools,
+               ARRAY_AGG(s.bettors ORDER BY pc.choice_number) AS bettors
+        FROM prediction_choices pc
+        CROSS JOIN LATERAL (
+            SELECT SUM(b.amount) AS pool, COUNT(*) AS bettors
+            FROM prediction_bets b
+            WHERE b.prediction_id = pc.prediction_id AND b.choice_number = pc.choice_number
+        ) s
+        WHERE pc.prediction_id = p.id
+    ) c
+    WHERE {{where}}
+    ORDER BY p.id
+"""
+
+BY_STATUS_SQL = SNAPSHOT_SQL.format(where="p.status = ANY($1::TEXT[])")
+BY_ID_SQL = SNAPSHOT_SQL.format(where="p.id = ANY($1::INTEGER[])")
+
+
+class PredictionSnapshot:
+    __slots__ = PREDICTION_FIELDS + ("choices", "pool_by_choice", "bettors_by_choice")
+
+    def __init__(self, row):
+        for field in PREDICTION_FIELDS:
+            setattr(self, field, row[field])
+        numbers = row["choice_numbers"] or []
+        self.choices = list(zip(numbers, row["choice_texts"] or []))
+        # Only choices with bets, like the old per-choice GROUP BY results
+        self.pool_by_choice = {}
+        self.bettors_by_choice = {}
+        for number, pool, bettors in zip(numbers, row["pools"] or [], row["bettors"] or []):
+            if bettors:
+                self.pool_by_choice[number] = int(pool)
+                self.bettors_by_choice[number] = bettors
+
+    @property
+    def total_pool(self) -> int:
+        return sum(self.pool_by_choice.values())
+
+
+def new_snapshot(prediction_id: int, title: str, creator_id: int, ends_at, channel_id, message_id, max_bet, choices):
+    """Snapshot of a prediction that was just created (no bets yet), without a query"""
+    return PredictionSnapshot(
+        {
+            "id": prediction_id,
+            "title": title,
+            "creator_id": creator_id,
+            "status": "betting",
+            "winning_choice": None,
+            "ends_at": ends_at,
+            "message_id": message_id,
+            "channel_id": channel_id,
+            "max_bet": max_bet,
+            "choice_numbers": [number for number, _ in choices],
+            "choice_texts": [text for _, text in choices],
+            "pools": [0] * len(choices),
+            "bettors": [0] * len(choices),
+        }
+    )
+
+
+class LockSchedule:
+    def __init__(self):
+        self.open = {}  # {prediction_id: ends_at} of predictions taking bets
+
+    def schedule(self, prediction_id: int, ends_at):
+        """Lock a new prediction at ends_at"""
+        self.open[prediction_id] = ends_at
+        timers.place(LOCK_KIND, ends_at, {"prediction_id": prediction_id})
+
+    def discard(self, prediction_id: int):
+        """Forget a prediction that stopped taking bets (its timer skips the database)"""
+        self.open.pop(prediction_id, None)
+
+    async def load(self, conn) -> list:
+        """Timer source: the deadline of every betting prediction"""
+        rows = await conn.fetch("SELECT id, ends_at FROM predictions WHERE status = 'betting'")
+        self.open = {row["id"]: row["ends_at"] for row in rows}
+        return [(row["ends_at"], {"prediction_id": row["id"]}) for row in rows]
+
+
+async def fetch_predictions(conn, statuses=("betting",)) -> list:
+    """Snapshots of every prediction in the given statuses, in id order"""
+    rows = await conn.fetch(BY_STATUS_SQL, list(statuses))
+    return [PredictionSnapshot(row) for row in rows]
+
+
+async def fetch_predictions_by_id(conn, prediction_ids) -> list:
+    """Snapshots of the given predictions (missing ids are skipped)"""
+    rows = await conn.fetch(BY_ID_SQL, list(prediction_ids))
+    return [PredictionSnapshot(row) for row in rows]
+
+
+async def fetch_prediction(conn, prediction_id: int):
+    """Snapshot of one prediction, None if it doesn't exist"""
+    snapshots = await fetch_predictions_by_id(conn, [prediction_id])
+    return snapshots[0] if snapshots else None
+
+
+lock_schedule = LockSchedule()
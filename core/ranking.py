@@ -0,0 +1,113 @@
+"""
+Rank Index
+Every user's balance held in a sorted list keyed by (-points, user_id), so
+/rank and leaderboard pages are O(log n) lookups instead of ORDER BY over
+the users table. Built from one bulk read at startup, kept current by
+ledger movements and rebuilt after the daily engine (its set-based
+updates bypass ledger.record). Mod accounts are left out of the order.
+"""
+
+import time
+
+from sortedcontainers import SortedList
+
+from core.economy import TAX_POOL_ID, ledger
+
+PAGE_SIZE = 10
+
+
+class RankIndex:
+    def __init__(self):
+        self.points = {}  # {user_id: points} for every user with points
+        self.order = SortedList()  # (-points, user_id) of ranked (non-mod) users
+        self.excluded = frozenset()  # Mod user IDs
+        self.ready = False
+        self.movements = 0
+        self.corrections = 0
+        self.rebuilds = 0
+        self.last_rebuild_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    async def rebuild(self, conn) -> int:
+        """Reload every balance with one query, returns number of users"""
+        started = time.perf_counter()
+        rows = await conn.fetch("SELECT user_id, points FROM users WHERE points IS NOT NULL")
+        self.points = {row["user_id"]: row["points"] for row in rows}
+        self.order = SortedList(
+            (-points, user_id) for user_id, points in self.points.items() if user_id not in self.excluded
+        )
+        self.ready = True
+        self.rebuilds += 1
+        self.last_rebuild_ms = (time.perf_counter() - started) * 1000
+        return len(self.points)
+
+    def set_excluded(self, user_ids):
+        """Replace the set of users left out of the ranking"""
+        user_ids = frozenset(user_ids)
+        for user_id in self.excluded - user_ids:
+            if user_id in self.points:
+                self.order.add((-self.points[user_id], user_id))
+        for user_id in user_ids - self.excluded:
+            if user_id in self.points:
+                self.order.discard((-self.points[user_id], user_id))
+        self.excluded = user_ids
+
+    def set_points(self, user_id: int, points: int) -> bool:
+        """Move a user to a new balance, returns False if it was already there"""
+        old = self.points.get(user_id)
+        if old == points:
+            return False
+        if user_id not in self.excluded:
+            if old is not None:
+                self.order.discard((-old, user_id))
+            self.order.add((-points, user_id))
+        self.points[user_id] = points
+        return True
+
+    def correct(self, user_id: int, points: int):
+        """Sync one user with a balance read from the database"""
+        if self.ready and points is not None and self.set_points(user_id, points):
+            self.corrections += 1
+
+    def on_movement(self, user_id: int, amount: int):
+        """Ledger listener: apply a point movement to the user's position"""
+        if not self.ready or user_id == TAX_POOL_ID:
+            return
+        self.movements += 1
+        self.set_points(user_id, self.points.get(user_id, 0) + amount)
+
+    def rank(self, user_id: int):
+        """1-based rank of a user, None if they are unranked (no points or a mod)"""
+        points = self.points.get(user_id)
+        if points is None or user_id in self.excluded:
+            return None
+        return self.order.index((-points, user_id)) + 1
+
+    def at(self, rank: int):
+        """(user_id, points) of the user at a 1-based rank"""
+        negative_points, user_id = self.order[rank - 1]
+        return user_id, -negative_points
+
+    def page(self, page: int, size: int = PAGE_SIZE) -> list:
+        """[(rank, user_id, points)] for a 1-based page of the ranking"""
+        start = (page - 1) * size
+        return [
+            (start + offset + 1, user_id, -negative_points)
+            for offset, (negative_points, user_id) in enumerate(self.order.islice(start, start + size))
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "ranked": len(self.order),
+            "users": len(self.points),
+            "movements": self.movements,
+            "corrections": self.corrections,
+            "rebuilds": self.rebuilds,
+            "last_rebuild_ms": self.last_rebuild_ms,
+        }
+
+
+ranking = RankIndex()
+ledger.subscribe(ranking.on_movement)
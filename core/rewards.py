@@ -0,0 +1,433 @@
+"""
+Chat Reward Accumulator
+Applies the chat earning rules (cooldown, daily cap, luck) in memory and
+writes the per-user results to the users table in batches.
+
+A crash loses at most the rewards earned since the last flush.
+"""
+
+import asyncio
+import datetime
+import random
+import sys
+import time
+from collections import OrderedDict
+from datetime import timezone
+
+from core.config import BANGKOK_TZ, Config
+from core.database import db
+from core.economy import ledger
+
+FIRST_MESSAGE_POINTS = 1000  # First message of the day (Bangkok time)
+MESSAGE_POINTS = 100
+DAILY_CAP = 2500
+
+FLUSH_SQL = """
+    UPDATE users AS u
+    SET points = u.points + d.points,
+        last_message_at = d.last_message_at,
+        daily_earned = d.daily_earned,
+        daily_earned_date = d.daily_earned_date
+    FROM UNNEST($1::BIGINT[], $2::INTEGER[], $3::TIMESTAMP[], $4::INTEGER[], $5::DATE[])
+        AS d(user_id, points, last_message_at, daily_earned, daily_earned_date)
+    WHERE u.user_id = d.user_id
+"""
+
+
+def base_reward(last_message_at, daily_earned, daily_earned_date, now, today_bangkok):
+    """
+    Points a message can earn before luck, and the daily earned it counts against
+
+    Returns (0, daily_earned) when the user is on cooldown or at the daily cap.
+    """
+    # Get daily earned (reset if new day in Bangkok timezone)
+    if daily_earned_date is None or daily_earned_date < today_bangkok:
+        daily_earned = 0
+
+    if last_message_at is None:
+        points_to_add = FIRST_MESSAGE_POINTS
+        daily_earned = 0
+    else:
+        # Convert last message to Bangkok timezone to check date
+        if last_message_at.tzinfo is None:
+            last_msg_bangkok = last_message_at.replace(tzinfo=timezone.utc).astimezone(
+                BANGKOK_TZ
+            )
+        else:
+            last_msg_bangkok = last_message_at.astimezone(BANGKOK_TZ)
+
+        if last_msg_bangkok.date() < today_bangkok:
+            points_to_add = FIRST_MESSAGE_POINTS
+            daily_earned = 0  # Reset daily earned for new day
+        else:
+            # Regular message, check cooldown
+            elapsed = (now - last_message_at.replace(tzinfo=None)).total_seconds()
+            if elapsed < Config.COOLDOWN_SECONDS:
+                return 0, daily_earned
+            points_to_add = MESSAGE_POINTS
+
+    # Check daily cap (points per day from chatting)
+    if daily_earned + points_to_add > DAILY_CAP:
+        points_to_add = max(DAILY_CAP - daily_earned, 0)
+
+    return points_to_add, daily_earned
+
+
+class ChatState:
+    """What the reward rules need to know about a user"""
+
+    __slots__ = ("points", "last_message_at", "daily_earned", "daily_earned_date")
+
+    def __init__(self, points, last_message_at, daily_earned, daily_earned_date):
+        self.points = points
+        self.last_message_at = last_message_at
+        self.daily_earned = daily_earned
+        self.daily_earned_date = daily_earned_date
+
+
+class PendingReward:
+    """Unflushed result for one user: a points delta plus the latest chat fields"""
+
+    __slots__ = ("points", "last_message_at", "daily_earned", "daily_earned_date")
+
+    def __init__(self):
+        self.points = 0
+        self.last_message_at = None
+        self.daily_earned = 0
+        self.daily_earned_date = None
+
+
+class CachedChatState:
+    """Cached chat fields for one user"""
+
+    __slots__ = ("last_message_at", "daily_earned", "daily_earned_date", "expires_at")
+
+    def __init__(self, last_message_at, daily_earned, daily_earned_date, expires_at):
+        self.last_message_at = last_message_at
+        self.daily_earned = daily_earned
+        self.daily_earned_date = daily_earned_date
+        self.expires_at = expires_at
+
+
+class ChatStateCache:
+    """
+    Bounded per-user cache of last_message_at, daily_earned and daily_earned_date
+
+    Entries expire ttl seconds after they were last written. Writes move an
+    entry to the end, so the front of the OrderedDict is always the next to
+    expire and also the least recently written (evicted when full).
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # {user_id: CachedChatState}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id: int):
+        """Get a user's cached state, or None on miss/expiry"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[user_id]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def put(self, user_id: int, last_message_at, daily_earned, daily_earned_date):
+        """Store the latest written values for a user"""
+        expires_at = time.monotonic() + self.ttl
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self._entries[user_id] = CachedChatState(
+                last_message_at, daily_earned, daily_earned_date, expires_at
+            )
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        else:
+            entry.last_message_at = last_message_at
+            entry.daily_earned = daily_earned
+            entry.daily_earned_date = daily_earned_date
+            entry.expires_at = expires_at
+            self._entries.move_to_end(user_id)
+
+    def discard(self, user_id: int):
+        """Drop a user's entry (call after writing these fields elsewhere)"""
+        self._entries.pop(user_id, None)
+
+    def evict_expired(self) -> int:
+        """Remove expired entries from the front, returns number removed"""
+        now = time.monotonic()
+        removed = 0
+        while self._entries:
+            user_id, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now:
+                break
+            del self._entries[user_id]
+            removed += 1
+        self.expirations += removed
+        return removed
+
+    def memory_bytes(self) -> int:
+        """Approximate memory used by the cache (container, entries and values)"""
+        total = sys.getsizeof(self._entries)
+        for user_id, entry in self._entries.items():
+            total += sys.getsizeof(user_id) + sys.getsizeof(entry)
+            total += sys.getsizeof(entry.daily_earned) + sys.getsizeof(entry.expires_at)
+            if entry.last_message_at is not None:
+                total += sys.getsizeof(entry.last_message_at)
+            if entry.daily_earned_date is not None:
+                total += sys.getsizeof(entry.daily_earned_date)
+        return total
+
+    def stats(self) -> dict:
+        """Hit/miss counts and memory use"""
+        lookups = self.hits + self.misses
+        memory = self.memory_bytes()
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "memory_bytes": memory,
+            "bytes_per_entry": memory / len(self._entries) if self._entries else 0,
+        }
+
+
+class ChatRewardAccumulator:
+    def __init__(self):
+        self.states = {}  # {user_id: ChatState} loaded during the current flush window
+        self.pending = {}  # {user_id: PendingReward} waiting to be written
+        # Outlives flush windows, so cooldown/cap hits skip the DB entirely
+        self.cache = ChatStateCache(Config.CHAT_CACHE_SIZE, Config.CHAT_CACHE_TTL)
+        self._flush_lock = asyncio.Lock()
+
+        # Counters
+        self.messages_seen = 0
+        self.messages_filtered = 0
+        self.messages_rewarded = 0
+        self.flush_count = 0
+        self.flush_failures = 0
+        self.rows_flushed = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    async def _load_state(self, user_id: int, now, today_bangkok):
+        """Fetch a user's chat state, inserting new users. Returns (state, is_new)"""
+        async with db.pool.acquire() as conn:
+            user = await conn.fetchrow(
+                "SELECT points, last_message_at, daily_earned, daily_earned_date FROM users WHERE user_id = $1",
+                user_id,
+            )
+            if user:
+                return (
+                    ChatState(
+                        user["points"] or 0,
+                        user["last_message_at"],
+                        user["daily_earned"] or 0,
+                        user["daily_earned_date"],
+                    ),
+                    False,
+                )
+
+            # First time user ever - 1000 points welcome bonus
+            # This does NOT count towards daily earned cap
+            inserted = await conn.execute(
+                "INSERT INTO users (user_id, points, last_message_at, daily_earned, daily_earned_date) VALUES ($1, $2, $3, 0, $4) ON CONFLICT (user_id) DO NOTHING",
+                user_id,
+                FIRST_MESSAGE_POINTS,
+                now,
+                today_bangkok,
+            )
+            state = ChatState(FIRST_MESSAGE_POINTS, now, 0, today_bangkok)
+            return state, inserted == "INSERT 0 1"
+
+    async def record_message(self, user_id: int, is_booster: bool = False) -> bool:
+        """
+        Apply the chat reward rules for one message
+
+        Returns True if this was the user's first message ever (welcome bonus
+        was granted), so the caller can announce it.
+        """
+        self.messages_seen += 1
+        now = datetime.datetime.now()
+        today_bangkok = datetime.datetime.now(BANGKOK_TZ).date()
+
+        state = self.states.get(user_id)
+        if state is None:
+            # Reject cooldown/daily cap messages without a DB round trip
+            cached = self.cache.get(user_id)
+            if cached is not None:
+                points_to_add, _ = base_reward(
+                    cached.last_message_at,
+                    cached.daily_earned,
+                    cached.daily_earned_date,
+                    now,
+                    today_bangkok,
+                )
+                if points_to_add <= 0:
+                    self.messages_filtered += 1
+                    return False
+
+            state, is_new = await self._load_state(user_id, now, today_bangkok)
+            # Another message from the same user may have loaded it meanwhile
+            if user_id in self.states:
+                state = self.states[user_id]
+            else:
+                self.states[user_id] = state
+                self.cache.put(
+                    user_id,
+                    state.last_message_at,
+                    state.daily_earned,
+                    state.daily_earned_date,
+                )
+            if is_new:
+                return True
+
+        points_to_add, daily_earned = base_reward(
+            state.last_message_at,
+            state.daily_earned,
+            state.daily_earned_date,
+            now,
+            today_bangkok,
+        )
+        if points_to_add <= 0:
+            self.messages_filtered += 1
+            return False
+
+        # Original amount counts towards the cap, before luck modifiers
+        points_for_daily_cap = points_to_add
+
+        # Apply critical/bad luck based on current points
+        if state.points < 500:
+            # 20% chance for critical (2x points)
+            if random.random() < 0.20:
+                points_to_add *= 2
+        elif state.points >= 1500:
+            # 50% chance for bad luck (0 points) - rich tax
+            if random.random() < 0.50:
+                points_to_add = 0
+
+        # Server boosters: 50% chance for extra 0.5x
+        if points_to_add > 0 and is_booster and random.random() < 0.50:
+            points_to_add += int(points_to_add * 0.5)
+
+        # Bad luck still counts toward the cap and the cooldown
+        state.points += points_to_add
+        state.last_message_at = now
+        state.daily_earned = daily_earned + points_for_daily_cap
+        state.daily_earned_date = today_bangkok
+        self.cache.put(
+            user_id, state.last_message_at, state.daily_earned, state.daily_earned_date
+        )
+
+        reward = self.pending.get(user_id)
+        if reward is None:
+            reward = self.pending[user_id] = PendingReward()
+        reward.points += points_to_add
+        reward.last_message_at = state.last_message_at
+        reward.daily_earned = state.daily_earned
+        reward.daily_earned_date = state.daily_earned_date
+
+        self.messages_rewarded += 1
+        return False
+
+    async def flush(self) -> int:
+        """Write all pending rewards in one statement, returns rows written"""
+        if db.pool is None:
+            return 0
+
+        self.cache.evict_expired()
+
+        async with self._flush_lock:
+            if not self.pending:
+                # Nothing in flight, so the DB is the source of truth again
+                self.states.clear()
+                return 0
+
+            batch = self.pending
+            self.pending = {}
+
+            user_ids = list(batch)
+            rewards = [batch[uid] for uid in user_ids]
+            started = time.perf_counter()
+            try:
+                async with db.pool.acquire() as conn:
+                    await conn.execute(
+                        FLUSH_SQL,
+                        user_ids,
+                        [r.points for r in rewards],
+                        [r.last_message_at for r in rewards],
+                        [r.daily_earned for r in rewards],
+                        [r.daily_earned_date for r in rewards],
+                    )
+            except Exception as e:
+                # Put the batch back so the next flush retries it
+                self.flush_failures += 1
+                for uid, reward in batch.items():
+                    newer = self.pending.get(uid)
+                    if newer is None:
+                        self.pending[uid] = reward
+                    else:
+                        newer.points += reward.points
+                print(f"Error flushing chat rewards: {e}")
+                return 0
+
+            for user_id, reward in zip(user_ids, rewards):
+                ledger.record(user_id, "chat", reward.points)
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flush_count += 1
+            self.rows_flushed += len(user_ids)
+            self.last_batch_size = len(user_ids)
+            self.max_batch_size = max(self.max_batch_size, len(user_ids))
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+            # Forget states that are now fully persisted, so points used by
+            # the luck rules are re-read from the DB next window
+            for uid in list(self.states):
+                if uid not in self.pending:
+                    del self.states[uid]
+
+            return len(user_ids)
+
+    def stats(self) -> dict:
+        """Flush latency and batch-size counters"""
+        return {
+            "messages_seen": self.messages_seen,
+            "messages_filtered": self.messages_filtered,
+            "messages_rewarded": self.messages_rewarded,
+            "pending_users": len(self.pending),
+            "flush_count": self.flush_count,
+            "flush_failures": self.flush_failures,
+            "rows_flushed": self.rows_flushed,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_size,
+            "avg_batch_size": (
+                self.rows_flushed / self.flush_count if self.flush_count else 0
+            ),
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+            "avg_flush_ms": (
+                self.total_flush_ms / self.flush_count if self.flush_count else 0
+            ),
+        }
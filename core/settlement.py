@@ -0,0 +1,208 @@
+"""
+Prediction Settlement
+/predresult, /predundo and /predcancel move points through the statements
+below. Each one is a single statement (one round trip, atomic on its own):
+it flips the prediction's status, computes every payout in integer
+arithmetic from prediction_bets, applies them to users and stores them in
+prediction_payouts. The status guard in the same statement means a
+prediction can't be settled twice.
+
+Undo doesn't recompute anything: it applies the negation of the stored
+payouts, so it is an exact inverse of the result it reverses. Callers
+record the ledger rows with Settlement.record() once their transaction
+has committed.
+"""
+
+from core.economy import ledger
+
+PAYOUT_PERCENT = 90  # Winners receive 90% of their share of the pool (10% tax)
+CREATOR_TAX_PERCENT = 50  # Share of the tax paid to a non-mod creator
+
+# Shared tail: record the payouts, apply them to users, return them
+_APPLY_PAYOUTS = """
+    recorded AS (
+        INSERT INTO prediction_payouts (settlement_id, user_id, amount, role, profit_column)
+        SELECT settlement.id, payouts.user_id, payouts.amount, payouts.role, payouts.profit_column
+        FROM settlement, payouts
+        WHERE payouts.amount <> 0
+    ),
+    paid AS (
+        INSERT INTO users (user_id, points, profit_prediction)
+        SELECT user_id, SUM(amount),
+               COALESCE(SUM(amount) FILTER (WHERE profit_column = 'profit_prediction'), 0)
+        FROM payouts
+        WHERE amount <> 0
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            points = COALESCE(users.points, 0) + EXCLUDED.points,
+            profit_prediction = COALESCE(users.profit_prediction, 0) + EXCLUDED.profit_prediction
+    )
+"""
+
+_RETURN_PAYOUTS = """
+    ARRAY(SELECT user_id FROM payouts WHERE amount <> 0 ORDER BY role, user_id) AS user_ids,
+    ARRAY(SELECT amount FROM payouts WHERE amount <> 0 ORDER BY role, user_id) AS amounts,
+    ARRAY(SELECT role FROM payouts WHERE amount <> 0 ORDER BY role, user_id) AS roles,
+    ARRAY(SELECT profit_column FROM payouts WHERE amount <> 0 ORDER BY role, user_id) AS profit_columns
+"""
+
+RESULT_SQL = f"""
+    WITH pred AS (
+        UPDATE predictions SET status = 'resolved', winning_choice = $2
+        WHERE id = $1 AND status IN ('betting', 'locked')
+        RETURNING id, creator_id
+    ),
+    bets AS (
+        SELECT b.user_id, b.choice_number, b.amount::BIGINT AS amount
+        FROM prediction_bets b
+        JOIN pred ON pred.id = b.prediction_id
+    ),
+    pools AS (
+        SELECT COALESCE(SUM(amount), 0)::BIGINT AS total_pool,
+               COALESCE(SUM(amount) FILTER (WHERE choice_number = $2), 0)::BIGINT AS winner_pool
+        FROM bets
+    ),
+    shares AS (
+        SELECT bets.user_id, bets.amount * pools.total_pool / pools.winner_pool AS raw
+        FROM bets, pools
+        WHERE bets.choice_number = $2 AND pools.winner_pool > 0
+    ),
+    payouts AS (
+        SELECT user_id, raw * $3::INTEGER / 100 AS amount,
+               'winner'::TEXT AS role, 'profit_prediction'::TEXT AS profit_column
+        FROM shares
+        UNION ALL
+        SELECT pred.creator_id, COALESCE(SUM(raw - raw * $3::INTEGER / 100), 0)::BIGINT * $4::INTEGER / 100,
+               'creator', 'profit_prediction'
+        FROM pred LEFT JOIN shares ON TRUE
+        GROUP BY pred.creator_id
+    ),
+    settlement AS (
+        INSERT INTO prediction_settlements (prediction_id, kind, winning_choice, total_pool, settled_by)
+        SELECT pred.id, 'result', $2, pools.total_pool, $5 FROM pred, pools
+        RETURNING id
+    ),
+    {_APPLY_PAYOUTS}
+    SELECT settlement.id, pools.total_pool, pools.winner_pool,
+           (SELECT COALESCE(SUM(raw - raw * $3::INTEGER / 100), 0)::BIGINT FROM shares) AS tax,
+           {_RETURN_PAYOUTS}
+    FROM settlement, pools
+"""
+
+REVERSE_SQL = f"""
+    WITH pred AS (
+        UPDATE predictions SET status = $2, winning_choice = NULL
+        WHERE id = $1 AND status = 'resolved'
+        RETURNING id
+    ),
+    reversed AS (
+        UPDATE prediction_settlements SET reversed_at = NOW()
+        WHERE prediction_id IN (SELECT id FROM pred) AND kind = 'result' AND reversed_at IS NULL
+        RETURNING id, total_pool
+    ),
+    payouts AS (
+        SELECT p.user_id, -p.amount AS amount, p.role, p.profit_column
+        FROM prediction_payouts p
+        JOIN reversed ON reversed.id = p.settlement_id
+    ),
+    settlement AS (
+        INSERT INTO prediction_settlements (prediction_id, kind, total_pool, settled_by)
+        SELECT pred.id, 'undo', COALESCE((SELECT MAX(total_pool) FROM reversed), 0), $3 FROM pred
+        RETURNING id
+    ),
+    {_APPLY_PAYOUTS}
+    SELECT settlement.id, COALESCE((SELECT MAX(total_pool) FROM reversed), 0) AS total_pool,
+           0::BIGINT AS winner_pool, 0::BIGINT AS tax,
+           {_RETURN_PAYOUTS}
+    FROM settlement
+"""
+
+CANCEL_SQL = f"""
+    WITH pred AS (
+        UPDATE predictions SET status = 'cancelled'
+        WHERE id = $1 AND status IN ('betting', 'locked')
+        RETURNING id, creator_id
+    ),
+    payouts AS (
+        SELECT b.user_id, b.amount::BIGINT AS amount, 'refund'::TEXT AS role, NULL::TEXT AS profit_column
+        FROM prediction_bets b
+        JOIN pred ON pred.id = b.prediction_id
+        UNION ALL
+        SELECT creator_id, $2::BIGINT, 'cost_refund', NULL FROM pred
+    ),
+    settlement AS (
+        INSERT INTO prediction_settlements (prediction_id, kind, total_pool, settled_by)
+        SELECT pred.id, 'cancel',
+               (SELECT COALESCE(SUM(amount), 0) FROM payouts WHERE role = 'refund')::BIGINT, $3
+        FROM pred
+        RETURNING id, total_pool
+    ),
+    {_APPLY_PAYOUTS}
+    SELECT settlement.id, settlement.total_pool, 0::BIGINT AS winner_pool, 0::BIGINT AS tax,
+           {_RETURN_PAYOUTS}
+    FROM settlement
+"""
+
+
+class SettlementConflict(Exception):
+    """Raised when the prediction's status doesn't allow the settlement (already settled, ...)"""
+
+    def __init__(self, prediction_id: int, reason: str):
+        super().__init__(f"prediction {prediction_id}: {reason}")
+        self.prediction_id = prediction_id
+        self.reason = reason
+
+
+class Settlement:
+    __slots__ = ("id", "prediction_id", "ledger_kind", "total_pool", "winner_pool", "tax", "payouts")
+
+    def __init__(self, prediction_id: int, ledger_kind: str, row):
+        self.id = row["id"]
+        self.prediction_id = prediction_id
+        self.ledger_kind = ledger_kind
+        self.total_pool = row["total_pool"]
+        self.winner_pool = row["winner_pool"]
+        self.tax = row["tax"]
+        # [(user_id, amount, role, profit_column)]
+        self.payouts = list(zip(row["user_ids"], row["amounts"], row["roles"], row["profit_columns"]))
+
+    def amounts(self, role: str) -> dict:
+        """{user_id: total amount} of the payouts with this role"""
+        totals = {}
+        for user_id, amount, payout_role, _ in self.payouts:
+            if payout_role == role:
+                totals[user_id] = totals.get(user_id, 0) + amount
+        return totals
+
+    def count(self, role: str) -> int:
+        """Number of payouts with this role (a refund per bet, ...)"""
+        return sum(1 for _, _, payout_role, _ in self.payouts if payout_role == role)
+
+    def record(self):
+        """Buffer a ledger row for every payout"""
+        for user_id, amount, _, profit_column in self.payouts:
+            ledger.record(user_id, self.ledger_kind, amount, None, self.prediction_id, profit_column)
+
+
+async def settle_result(conn, prediction_id: int, winner: int, creator_percent: int, settled_by: int) -> Settlement:
+    """Resolve a betting/locked prediction and pay the winners (and creator bonus)"""
+    row = await conn.fetchrow(RESULT_SQL, prediction_id, winner, PAYOUT_PERCENT, creator_percent, settled_by)
+    if row is None:
+        raise SettlementConflict(prediction_id, "not betting or locked")
+    return Settlement(prediction_id, "prediction_payout", row)
+
+
+async def reverse_result(conn, prediction_id: int, settled_by: int, status: str = "locked") -> Settlement:
+    """Undo a resolved prediction by applying the inverse of its recorded payouts"""
+    row = await conn.fetchrow(REVERSE_SQL, prediction_id, status, settled_by)
+    if row is None:
+        raise SettlementConflict(prediction_id, "not resolved")
+    return Settlement(prediction_id, "prediction_undo", row)
+
+
+async def settle_cancel(conn, prediction_id: int, creator_refund: int, settled_by: int) -> Settlement:
+    """Cancel a betting/locked prediction, refunding every bet and the creation cost"""
+    row = await conn.fetchrow(CANCEL_SQL, prediction_id, creator_refund, settled_by)
+    if row is None:
+        raise SettlementConflict(prediction_id, "not betting or locked")
+    return Settlement(prediction_id, "prediction_refund", row)
@@ -0,0 +1,103 @@
+"""
+Attack Simulation
+Monte Carlo preview for /test_attack. The payoffs of a win and a loss are
+taken from core.attacks.regular_attack (the function the live attack
+uses) and only the rolls are simulated, vectorized with NumPy.
+"""
+
+import time
+
+import numpy as np
+
+from core.attacks import AttackRejected, regular_attack
+
+DEFAULT_TRIALS = 200_000
+AMOUNT_TIERS = (50, 100, 150, 200, 250)
+
+
+def attack_payoffs(attacker, target, amount: int, has_shield: bool, is_countered: bool):
+    """(win_chance, attacker delta on a win, attacker delta on a loss) from the live rules"""
+    lose = regular_attack(
+        attacker, target, amount, has_shield=has_shield, is_countered=is_countered, roll=lambda: 1.0
+    )
+    try:
+        win = regular_attack(
+            attacker, target, amount, has_shield=has_shield, is_countered=is_countered, roll=lambda: 0.0
+        )
+        win_delta = win.attacker_delta
+    except AttackRejected:
+        # Daily gain cap reached: a win would be refused
+        win_delta = 0
+    return lose.win_chance, win_delta, lose.attacker_delta
+
+
+def simulate_tier(
+    rng,
+    attacker,
+    target,
+    amount: int,
+    attacks: int,
+    trials: int,
+    has_shield: bool = False,
+    has_dodge: bool = False,
+    is_countered: bool = False,
+) -> dict:
+    """Simulate `trials` sessions of `attacks` attacks at one stake"""
+    chance, win_delta, loss_delta = attack_payoffs(attacker, target, amount, has_shield, is_countered)
+
+    # Exact per-attack moments of the two-outcome payoff
+    ev = chance * win_delta + (1 - chance) * loss_delta
+    variance = chance * (1 - chance) * (win_delta - loss_delta) ** 2
+
+    wins = rng.random((trials, attacks), dtype=np.float32) < chance
+    deltas = np.where(wins, win_delta, loss_delta).astype(np.int64)
+    if has_dodge:
+        # The first attack runs into the dodge (2x loss), which is then used up
+        deltas[:, 0] = regular_attack(attacker, target, amount, has_dodge=True).attacker_delta
+
+    balance = attacker.points + np.cumsum(deltas, axis=1)
+    # Bankrupt: can no longer cover the stake at some point in the session
+    broke = balance < amount
+    went_broke = broke.any(axis=1)
+    first_broke = broke.argmax(axis=1)
+    final = np.where(went_broke, balance[np.arange(trials), first_broke], balance[:, -1])
+    net = final - attacker.points
+
+    return {
+        "amount": amount,
+        "win_chance": chance,
+        "win_delta": win_delta,
+        "loss_delta": loss_delta,
+        "ev": ev,
+        "variance": variance,
+        "session_mean": float(net.mean()),
+        "session_std": float(net.std()),
+        "bankrupt_probability": float(went_broke.mean()),
+    }
+
+
+def simulate_attacks(
+    attacker,
+    target,
+    amounts=AMOUNT_TIERS,
+    attacks: int = 10,
+    trials: int = DEFAULT_TRIALS,
+    has_shield: bool = False,
+    has_dodge: bool = False,
+    is_countered: bool = False,
+    seed=None,
+) -> dict:
+    """Run the simulation for every affordable amount tier, returns tiers and timing"""
+    started = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    tiers = [
+        simulate_tier(rng, attacker, target, amount, attacks, trials, has_shield, has_dodge, is_countered)
+        for amount in amounts
+        if attacker.points >= amount and target.points >= amount
+    ]
+    return {
+        "tiers": tiers,
+        "attacks": attacks,
+        "trials": trials,
+        "elapsed_ms": (time.perf_counter() - started) * 1000,
+    }
@@ -0,0 +1,197 @@
+"""
+TTL State Store
+Cooldowns and short-lived buffs (shields, dodges, counters, ...) keyed by
+namespace. Each namespace behaves like a dict of {key: started_at} whose
+entries expire ttl seconds after they were set; expiry is driven by one
+deadline heap shared by all namespaces.
+
+Namespaces marked persist are written to the state_entries table on
+shutdown and restored on startup, so active buffs survive deploys.
+"""
+
+import datetime
+import heapq
+import itertools
+import json
+import sys
+
+
+class StateEntry:
+    __slots__ = ("started_at", "expires_at", "seq")
+
+    def __init__(self, started_at, expires_at, seq):
+        self.started_at = started_at
+        self.expires_at = expires_at
+        self.seq = seq
+
+
+class TTLNamespace:
+    """Dict-like view of one namespace: {key: started_at}, expired keys are invisible"""
+
+    def __init__(self, store, name: str, ttl: float, persist: bool):
+        self.store = store
+        self.name = name
+        self.ttl = ttl
+        self.persist = persist
+        self.entries = {}  # {key: StateEntry}
+        self.expired = 0
+
+    def _live(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= datetime.datetime.now():
+            del self.entries[key]
+            self.expired += 1
+            return None
+        return entry
+
+    def __contains__(self, key) -> bool:
+        return self._live(key) is not None
+
+    def __getitem__(self, key):
+        entry = self._live(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry.started_at
+
+    def __setitem__(self, key, started_at):
+        self.set(key, started_at)
+
+    def __delitem__(self, key):
+        del self.entries[key]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def set(self, key, started_at, expires_at=None):
+        """Start (or restart) an entry; it expires ttl seconds after started_at"""
+        if expires_at is None:
+            expires_at = started_at + datetime.timedelta(seconds=self.ttl)
+        seq = next(self.store._seq)
+        self.entries[key] = StateEntry(started_at, expires_at, seq)
+        heapq.heappush(self.store.deadlines, (expires_at, seq, self.name, key))
+        self.store.evict_expired()
+
+    def get(self, key, default=None):
+        entry = self._live(key)
+        return default if entry is None else entry.started_at
+
+    def pop(self, key, default=None):
+        """Remove a key, returns its started_at (default if missing or expired)"""
+        entry = self._live(key)
+        if entry is None:
+            return default
+        del self.entries[key]
+        return entry.started_at
+
+    def items(self) -> list:
+        """Live (key, started_at) pairs"""
+        now = datetime.datetime.now()
+        return [(key, e.started_at) for key, e in self.entries.items() if e.expires_at > now]
+
+    def memory_bytes(self) -> int:
+        """Approximate memory used by the namespace (container, keys and entries)"""
+        total = sys.getsizeof(self.entries)
+        for key, entry in self.entries.items():
+            total += sys.getsizeof(key) + sys.getsizeof(entry)
+            total += sys.getsizeof(entry.started_at) + sys.getsizeof(entry.expires_at)
+        return total
+
+
+class StateStore:
+    def __init__(self):
+        self.namespaces = {}  # {name: TTLNamespace}
+        self.deadlines = []  # heap of (expires_at, seq, namespace, key)
+        self._seq = itertools.count()
+
+    def namespace(self, name: str, ttl: float, persist: bool = False) -> TTLNamespace:
+        """Create (or get) a namespace whose entries live ttl seconds"""
+        ns = self.namespaces.get(name)
+        if ns is None:
+            ns = self.namespaces[name] = TTLNamespace(self, name, ttl, persist)
+        return ns
+
+    def evict_expired(self, now=None) -> int:
+        """Drop entries whose deadline has passed, returns number removed"""
+        now = now or datetime.datetime.now()
+        removed = 0
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, seq, name, key = heapq.heappop(self.deadlines)
+            ns = self.namespaces[name]
+            entry = ns.entries.get(key)
+            # Skip heap entries for keys that were reset or removed since
+            if entry is None or entry.seq != seq:
+                continue
+            del ns.entries[key]
+            ns.expired += 1
+            removed += 1
+        return removed
+
+    async def snapshot(self, conn) -> int:
+        """Replace the stored state with the live entries of persisted namespaces"""
+        now = datetime.datetime.now()
+        names, keys, started, expires = [], [], [], []
+        persisted = [ns for ns in self.namespaces.values() if ns.persist]
+        for ns in persisted:
+            for key, entry in ns.entries.items():
+                if entry.expires_at <= now:
+                    continue
+                names.append(ns.name)
+                keys.append(json.dumps(key))
+                started.append(entry.started_at)
+                expires.append(entry.expires_at)
+
+        async with conn.transaction():
+            await conn.execute(
+                "DELETE FROM state_entries WHERE namespace = ANY($1::TEXT[])",
+                [ns.name for ns in persisted],
+            )
+            if names:
+                await conn.execute(
+                    """
+                    INSERT INTO state_entries (namespace, key, started_at, expires_at)
+                    SELECT namespace, key::JSONB, started_at, expires_at
+                    FROM UNNEST($1::TEXT[], $2::TEXT[], $3::TIMESTAMP[], $4::TIMESTAMP[])
+                        AS s(namespace, key, started_at, expires_at)
+                    """,
+                    names,
+                    keys,
+                    started,
+                    expires,
+                )
+        return len(names)
+
+    async def restore(self, conn) -> int:
+        """Load stored entries into their namespaces (the rows are consumed)"""
+        now = datetime.datetime.now()
+        async with conn.transaction():
+            rows = await conn.fetch(
+                "DELETE FROM state_entries RETURNING namespace, key::TEXT AS key, started_at, expires_at"
+            )
+
+        restored = 0
+        for row in rows:
+            ns = self.namespaces.get(row["namespace"])
+            if ns is None or row["expires_at"] <= now:
+                continue
+            key = json.loads(row["key"])
+            if isinstance(key, list):
+                key = tuple(key)
+            ns.set(key, row["started_at"], row["expires_at"])
+            restored += 1
+        return restored
+
+    def stats(self) -> dict:
+        """Entry counts and memory per namespace"""
+        self.evict_expired()
+        return {
+            name: {
+                "entries": len(ns),
+                "expired": ns.expired,
+                "ttl": ns.ttl,
+                "persist": ns.persist,
+                "memory_bytes": ns.memory_bytes(),
+            }
+            for name, ns in self.namespaces.items()
+        }
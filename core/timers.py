@@ -0,0 +1,285 @@
+"""
+Durable Timer Service
+Delayed actions (delete a message, remove a role, ...) are stored in the
+timers table and fired from an in-process hashed timing wheel.
+
+Timers survive restarts: on start every stored timer is loaded and the
+ones that became due while the bot was down fire on the first tick.
+Due timers are handed to their handler in batches per kind, so message
+deletions in the same channel go out as one bulk delete.
+
+Features that keep their own table (e.g. multiattack runs) can put
+in-memory timers on the same wheel with place() and register a source
+that reloads them on start.
+"""
+
+import asyncio
+import datetime
+import json
+import math
+from collections import defaultdict
+
+import disnake
+
+from core.database import db
+
+TICK_SECONDS = 1.0
+WHEEL_SLOTS = 512
+
+
+class Timer:
+    __slots__ = ("id", "kind", "due_tick", "payload", "cancelled")
+
+    def __init__(self, timer_id, kind, due_tick, payload):
+        self.id = timer_id
+        self.kind = kind
+        self.due_tick = due_tick
+        self.payload = payload
+        self.cancelled = False
+
+
+class TimerService:
+    def __init__(self, tick: float = TICK_SECONDS, slots: int = WHEEL_SLOTS):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.timers = {}  # {timer_id: Timer}
+        self.handlers = {}  # {kind: async fn(list of payload dicts)}
+        self.sources = {}  # {kind: async fn(conn) -> [(due_at, payload)]}
+        self.bot = None
+        self._last_tick = None
+        self._task = None
+        self._firing = set()  # In-flight _fire tasks (the loop only keeps weak references)
+
+        self.register("delete_message", self._delete_messages)
+        self.register("delete_response", self._delete_responses)
+        self.register("remove_role", self._remove_roles)
+
+    def _tick_of(self, when: datetime.datetime) -> int:
+        return math.ceil(when.timestamp() / self.tick)
+
+    def _current_tick(self) -> int:
+        # Last tick whose time has fully passed (timers never fire early)
+        return math.floor(datetime.datetime.now().timestamp() / self.tick)
+
+    def _place(self, timer: Timer):
+        # Overdue timers go into the next slot to be processed
+        if self._last_tick is not None and timer.due_tick <= self._last_tick:
+            timer.due_tick = self._last_tick + 1
+        self.slots[timer.due_tick % len(self.slots)].append(timer)
+        if timer.id is not None:
+            self.timers[timer.id] = timer
+
+    def register(self, kind: str, handler, source=None):
+        """
+        Register an async handler called with a list of payloads when timers of this kind are due
+
+        source: async fn(conn) returning [(due_at, payload)] for timers the
+        caller persists itself; they are loaded on start and placed in memory.
+        """
+        self.handlers[kind] = handler
+        if source is not None:
+            self.sources[kind] = source
+
+    def place(self, kind: str, due_at: datetime.datetime, payload: dict):
+        """Put a timer on the wheel without storing it (the caller persists it)"""
+        self._place(Timer(None, kind, self._tick_of(due_at), payload))
+
+    async def start(self, bot):
+        """Load stored timers and start the wheel (safe to call again on reconnect)"""
+        self.bot = bot
+        if self._task is not None and not self._task.done():
+            return
+
+        self._last_tick = self._current_tick()
+        async with db.pool.acquire() as conn:
+            rows = await conn.fetch("SELECT id, kind, due_at, payload FROM timers")
+            sourced = []
+            for kind, source in self.sources.items():
+                try:
+                    sourced.extend((kind, due_at, payload) for due_at, payload in await source(conn))
+                except Exception as e:
+                    print(f"Error loading {kind} timers: {e}")
+
+        for row in rows:
+            if row["id"] in self.timers:
+                continue
+            timer = Timer(
+                row["id"],
+                row["kind"],
+                self._tick_of(row["due_at"]),
+                json.loads(row["payload"]),
+            )
+            self._place(timer)
+        for kind, due_at, payload in sourced:
+            self.place(kind, due_at, payload)
+
+        overdue = sum(1 for t in self.timers.values() if t.due_tick <= self._last_tick + 1)
+        print(f"Timers loaded: {len(self.timers)} ({overdue} overdue), {len(sourced)} from sources")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the wheel (pending timers stay in the table)"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def schedule(self, kind: str, delay: float, payload: dict) -> int | None:
+        """Store a timer that fires after delay seconds, returns its id"""
+        if db.pool is None:
+            print(f"Cannot schedule {kind} timer: database not connected")
+            return None
+
+        due_at = datetime.datetime.now() + datetime.timedelta(seconds=delay)
+        async with db.pool.acquire() as conn:
+            timer_id = await conn.fetchval(
+                "INSERT INTO timers (kind, due_at, payload) VALUES ($1, $2, $3::jsonb) RETURNING id",
+                kind,
+                due_at,
+                json.dumps(payload),
+            )
+        self._place(Timer(timer_id, kind, self._tick_of(due_at), payload))
+        return timer_id
+
+    async def cancel(self, timer_id: int):
+        """Cancel a pending timer"""
+        timer = self.timers.pop(timer_id, None)
+        if timer:
+            timer.cancelled = True
+        async with db.pool.acquire() as conn:
+            await conn.execute("DELETE FROM timers WHERE id = $1", timer_id)
+
+    # Convenience wrappers for the common delayed actions
+
+    async def delete_message_later(self, message: disnake.Message, delay: float):
+        """Delete a message after delay seconds"""
+        await self.schedule(
+            "delete_message",
+            delay,
+            {"channel_id": message.channel.id, "message_id": message.id},
+        )
+
+    async def delete_response_later(self, inter: disnake.Interaction, delay: float):
+        """Delete an interaction's original response (works for ephemeral ones too)"""
+        await self.schedule("delete_response", delay, {"token": inter.token})
+
+    async def remove_role_later(self, member: disnake.Member, role: disnake.Role, delay: float):
+        """Remove a role from a member after delay seconds"""
+        await self.schedule(
+            "remove_role",
+            delay,
+            {"guild_id": member.guild.id, "user_id": member.id, "role_id": role.id},
+        )
+
+    def _advance(self, now_tick: int) -> list:
+        """Process every tick up to now_tick (catches up after lag), returns the due timers"""
+        due = []
+        while self._last_tick < now_tick:
+            self._last_tick += 1
+            slot = self.slots[self._last_tick % len(self.slots)]
+            if not slot:
+                continue
+            keep = []
+            for timer in slot:
+                if timer.cancelled:
+                    continue
+                if timer.due_tick <= self._last_tick:
+                    due.append(timer)
+                else:
+                    keep.append(timer)
+            slot[:] = keep
+
+        for timer in due:
+            self.timers.pop(timer.id, None)
+        return due
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            due = self._advance(self._current_tick())
+            if due:
+                task = asyncio.create_task(self._fire(due))
+                self._firing.add(task)
+                task.add_done_callback(self._fired)
+
+    def _fired(self, task: asyncio.Task):
+        self._firing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error firing timers: {task.exception()}")
+
+    async def _fire(self, due: list):
+        """Run handlers for due timers (batched per kind) and delete their rows"""
+        by_kind = defaultdict(list)
+        for timer in due:
+            by_kind[timer.kind].append(timer.payload)
+
+        for kind, payloads in by_kind.items():
+            handler = self.handlers.get(kind)
+            if handler is None:
+                print(f"No handler for timer kind {kind}, dropping {len(payloads)} timer(s)")
+                continue
+            try:
+                await handler(payloads)
+            except Exception as e:
+                print(f"Error firing {kind} timers: {e}")
+
+        stored_ids = [timer.id for timer in due if timer.id is not None]
+        if not stored_ids:
+            return
+        try:
+            async with db.pool.acquire() as conn:
+                await conn.execute(
+                    "DELETE FROM timers WHERE id = ANY($1::BIGINT[])",
+                    stored_ids,
+                )
+        except Exception as e:
+            print(f"Error deleting fired timers: {e}")
+
+    async def _delete_messages(self, payloads: list):
+        """Delete messages, one bulk delete per channel"""
+        by_channel = defaultdict(list)
+        for payload in payloads:
+            by_channel[payload["channel_id"]].append(payload["message_id"])
+
+        for channel_id, message_ids in by_channel.items():
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                continue
+            try:
+                # Bulk delete (2-100 messages) or a single delete
+                for i in range(0, len(message_ids), 100):
+                    chunk = [disnake.Object(id=m) for m in message_ids[i : i + 100]]
+                    await channel.delete_messages(chunk)
+            except (disnake.Forbidden, disnake.HTTPException):
+                # Bulk delete needs Manage Messages and <14 day old messages
+                for message_id in message_ids:
+                    try:
+                        await channel.get_partial_message(message_id).delete()
+                    except disnake.HTTPException:
+                        pass
+
+    async def _delete_responses(self, payloads: list):
+        """Delete interaction responses (tokens are only valid for 15 minutes)"""
+        for payload in payloads:
+            try:
+                await self.bot.http.delete_original_interaction_response(
+                    self.bot.application_id, payload["token"]
+                )
+            except disnake.HTTPException:
+                pass
+
+    async def _remove_roles(self, payloads: list):
+        """Remove temporary roles"""
+        for payload in payloads:
+            guild = self.bot.get_guild(payload["guild_id"])
+            if guild is None:
+                continue
+            member = guild.get_member(payload["user_id"])
+            role = guild.get_role(payload["role_id"])
+            try:
+                if member and role and role in member.roles:
+                    await member.remove_roles(role)
+            except disnake.HTTPException:
+                pass
+
+
+timers = TimerService()
@@ -0,0 +1,226 @@
+"""
+Trap Trigger Index
+Per-channel Aho-Corasick automaton over active trap triggers, so a message
+is scanned once no matter how many traps are set in the channel.
+Trap expiry is driven by a deadline heap instead of a sweep per message.
+"""
+
+import heapq
+import itertools
+from collections import deque
+
+TRAP_DURATION_SECONDS = 900  # 15 minutes
+
+
+class TriggerAutomaton:
+    """
+    Aho-Corasick automaton over lowercase patterns
+
+    Adding a pattern extends the trie in place and only marks the failure
+    links stale (recomputed on the next search). Removing a pattern just
+    clears its terminal mark; a node is dead once no live pattern passes
+    through it, and the trie is compacted once most of it is dead.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.goto = [{}]  # node -> {char: node}
+        self.fail = [0]
+        self.output = [None]  # node -> pattern ending here (or None)
+        self.dict_link = [0]  # node -> nearest terminal node via fail links (0 = none)
+        self.live = [0]  # node -> live patterns ending at or below it
+        self.patterns = set()
+        self.dead_nodes = 0
+        self.stale = False
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def add(self, pattern: str):
+        """Insert a (lowercase) pattern into the trie"""
+        if pattern in self.patterns:
+            return
+        node = 0
+        for char in pattern:
+            nxt = self.goto[node].get(char)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][char] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(None)
+                self.dict_link.append(0)
+                self.live.append(0)
+            elif self.live[nxt] == 0:
+                # Reviving a node left behind by a removed pattern
+                self.dead_nodes -= 1
+            self.live[nxt] += 1
+            node = nxt
+        self.output[node] = pattern
+        self.patterns.add(pattern)
+        self.stale = True
+
+    def remove(self, pattern: str):
+        """Stop matching a pattern"""
+        if pattern not in self.patterns:
+            return
+        self.patterns.discard(pattern)
+        node = 0
+        for char in pattern:
+            node = self.goto[node][char]
+            self.live[node] -= 1
+            if self.live[node] == 0:
+                self.dead_nodes += 1
+        self.output[node] = None
+        self.stale = True
+
+        # Compact when most of the trie belongs to removed patterns
+        if self.dead_nodes > len(self.goto) // 2:
+            self._compact()
+
+    def _compact(self):
+        """Rebuild the trie from the live patterns only"""
+        patterns = self.patterns
+        self._reset()
+        for pattern in patterns:
+            self.add(pattern)
+
+    def _build_links(self):
+        """Recompute failure and dictionary links (BFS over the trie)"""
+        queue = deque()
+        for child in self.goto[0].values():
+            self.fail[child] = 0
+            self.dict_link[child] = 0
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                f = self.fail[node]
+                while f and char not in self.goto[f]:
+                    f = self.fail[f]
+                f = self.goto[f].get(char, 0)
+                self.fail[child] = f
+                self.dict_link[child] = f if self.output[f] is not None else self.dict_link[f]
+                queue.append(child)
+
+        self.stale = False
+
+    def search(self, text: str) -> set:
+        """Return every pattern that occurs in text (text must be lowercase)"""
+        if not self.patterns:
+            return set()
+        if self.stale:
+            self._build_links()
+
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+
+            hit = node if self.output[node] is not None else self.dict_link[node]
+            while hit:
+                found.add(self.output[hit])
+                hit = self.dict_link[hit]
+        return found
+
+
+class ChannelTraps:
+    """Active traps in one channel"""
+
+    def __init__(self):
+        self.traps = {}  # {trigger_text: (creator_id, created_at, cost)}
+        self.by_lower = {}  # {trigger_lower: trigger_text}
+        self.order = {}  # {trigger_text: seq} - earlier traps win ties
+        self.automaton = TriggerAutomaton()
+
+
+class TrapBook:
+    def __init__(self, duration: int = TRAP_DURATION_SECONDS):
+        self.duration = duration
+        self.channels = {}  # {channel_id: ChannelTraps}
+        self.deadlines = []  # heap of (expires_at, seq, channel_id, trigger_text)
+        self._seq = itertools.count()
+
+    def add(self, channel_id: int, trigger: str, creator_id: int, created_at, cost: int):
+        """Set a trap (caller checks has_trigger first)"""
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            channel = self.channels[channel_id] = ChannelTraps()
+
+        seq = next(self._seq)
+        trigger_lower = trigger.lower()
+        channel.traps[trigger] = (creator_id, created_at, cost)
+        channel.by_lower[trigger_lower] = trigger
+        channel.order[trigger] = seq
+        channel.automaton.add(trigger_lower)
+
+        expires_at = created_at.timestamp() + self.duration
+        heapq.heappush(self.deadlines, (expires_at, seq, channel_id, trigger))
+
+    def remove(self, channel_id: int, trigger: str):
+        """Remove a trap (consumed, countered or expired)"""
+        channel = self.channels.get(channel_id)
+        if channel is None or trigger not in channel.traps:
+            return
+        trigger_lower = trigger.lower()
+        del channel.traps[trigger]
+        del channel.order[trigger]
+        channel.by_lower.pop(trigger_lower, None)
+        channel.automaton.remove(trigger_lower)
+        if not channel.traps:
+            del self.channels[channel_id]
+
+    def expire(self, now) -> int:
+        """Remove traps whose deadline has passed, returns number removed"""
+        now_ts = now.timestamp()
+        removed = 0
+        while self.deadlines and self.deadlines[0][0] < now_ts:
+            _, seq, channel_id, trigger = heapq.heappop(self.deadlines)
+            channel = self.channels.get(channel_id)
+            # Skip heap entries for traps that were already removed
+            if channel is None or channel.order.get(trigger) != seq:
+                continue
+            self.remove(channel_id, trigger)
+            removed += 1
+        return removed
+
+    def has_trigger(self, channel_id: int, trigger: str) -> bool:
+        """Case-insensitive check for an existing trap trigger"""
+        channel = self.channels.get(channel_id)
+        return channel is not None and trigger.lower() in channel.by_lower
+
+    def get(self, channel_id: int, trigger: str):
+        """Exact (case-sensitive) lookup, returns (creator_id, created_at, cost) or None"""
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            return None
+        return channel.traps.get(trigger)
+
+    def count(self, channel_id: int) -> int:
+        channel = self.channels.get(channel_id)
+        return len(channel.traps) if channel else 0
+
+    def match(self, channel_id: int, text: str, author_id: int):
+        """
+        Find the oldest trap in a channel triggered by text, ignoring the
+        author's own traps. Returns (trigger_text, creator_id, cost) or None.
+        """
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            return None
+
+        best = None
+        for trigger_lower in channel.automaton.search(text.lower()):
+            trigger = channel.by_lower[trigger_lower]
+            creator_id, _, cost = channel.traps[trigger]
+            # Don't trigger on trap creator
+            if creator_id == author_id:
+                continue
+            if best is None or channel.order[trigger] < channel.order[best[0]]:
+                best = (trigger, creator_id, cost)
+        return best
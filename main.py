@@ -5,7 +5,9 @@ from disnake.ext import commands
 
 from core.config import Config
 from core.database import db
-from core.logger import cleanup_old_logs
+from core.economy import ledger
+from core.logger import cleanup_old_logs, close_logger, start_log_flusher
+from core.timers import timers
 
 intents = disnake.Intents.default()
 intents.message_content = True
@@ -14,7 +16,29 @@ intents.members = True
 # Set guild for instant slash command sync (0 = global, takes up to 1hr)
 test_guilds = [Config.GUILD_ID] if Config.GUILD_ID else None
 
-bot = commands.Bot(command_prefix="!", intents=intents, test_guilds=test_guilds)
+
+class Bot(commands.Bot):
+    async def close(self):
+        # Let cogs write out their write-behind buffers while the pool is open
+        for cog in list(self.cogs.values()):
+            flush_buffers = getattr(cog, "flush_buffers", None)
+            if flush_buffers:
+                try:
+                    await flush_buffers()
+                except Exception as e:
+                    print(f"Error flushing {cog.qualified_name} on shutdown: {e}")
+        await super().close()
+        await timers.stop()
+        # Write out buffered ledger rows before the pool goes away
+        await ledger.stop()
+        # Write out buffered logs and release the pool on shutdown
+        await close_logger()
+        if db.pool:
+            await db.close()
+            print("Database connection closed")
+
+
+bot = Bot(command_prefix="!", intents=intents, test_guilds=test_guilds)
 
 
 @bot.event
@@ -23,18 +47,17 @@ async def on_ready():
     print(f"Slash commands synced: {len(bot.slash_commands)}")
     await db.connect()
     print("Database connected")
+    ledger.start()
+
+    # Load persisted timers and fire the ones that came due while offline
+    await timers.start(bot)
 
     # Cleanup old log files (keep 30 days)
     cleanup_old_logs()
+    start_log_flusher()
     print("Log cleanup completed")
 
 
-@bot.event
-async def on_close():
-    await db.close()
-    print("Database connection closed")
-
-
 # Load Cogs (skip disabled cogs ending with _disabled.py)
 for filename in os.listdir("./cogs"):
     if (
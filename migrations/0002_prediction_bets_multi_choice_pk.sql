@@ -0,0 +1,11 @@
+-- Allow multiple choices per user: old databases have PK (prediction_id, user_id)
+DO $$
+BEGIN
+    IF (
+        SELECT COUNT(*) FROM information_schema.key_column_usage
+        WHERE table_name = 'prediction_bets' AND constraint_name = 'prediction_bets_pkey'
+    ) = 2 THEN
+        ALTER TABLE prediction_bets DROP CONSTRAINT prediction_bets_pkey;
+        ALTER TABLE prediction_bets ADD PRIMARY KEY (prediction_id, user_id, choice_number);
+    END IF;
+END $$;
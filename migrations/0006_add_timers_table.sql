@@ -0,0 +1,9 @@
+-- Durable delayed actions fired by core.timers
+CREATE TABLE IF NOT EXISTS timers (
+    id BIGSERIAL PRIMARY KEY,
+    kind TEXT NOT NULL,
+    due_at TIMESTAMP NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_timers_due_at ON timers (due_at);
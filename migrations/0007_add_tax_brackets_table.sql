@@ -0,0 +1,8 @@
+-- Progressive daily tax brackets on points + stash
+CREATE TABLE IF NOT EXISTS tax_brackets (
+    min_wealth INTEGER PRIMARY KEY,
+    rate NUMERIC(5, 4) NOT NULL
+);
+INSERT INTO tax_brackets (min_wealth, rate) VALUES
+    (0, 0), (500, 0.05), (1000, 0.10), (2500, 0.15), (5000, 0.20), (7500, 0.20)
+ON CONFLICT (min_wealth) DO NOTHING;
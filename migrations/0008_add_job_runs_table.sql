@@ -0,0 +1,12 @@
+-- One row per (job, business date) for core.jobs
+CREATE TABLE IF NOT EXISTS job_runs (
+    job TEXT NOT NULL,
+    business_date DATE NOT NULL,
+    status TEXT NOT NULL,
+    started_at TIMESTAMP NOT NULL,
+    finished_at TIMESTAMP,
+    duration_ms INTEGER,
+    rows_touched INTEGER DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (job, business_date)
+);
@@ -0,0 +1,21 @@
+-- Multiattack runs in progress, resumed after a restart
+CREATE TABLE IF NOT EXISTS multiattack_runs (
+    id BIGSERIAL PRIMARY KEY,
+    attacker_id BIGINT NOT NULL,
+    target_id BIGINT NOT NULL,
+    attacker_name TEXT NOT NULL,
+    target_name TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    times INTEGER NOT NULL,
+    delay_seconds INTEGER NOT NULL,
+    hits_done INTEGER NOT NULL DEFAULT 0,
+    successful INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    countered INTEGER NOT NULL DEFAULT 0,
+    total_gained INTEGER NOT NULL DEFAULT 0,
+    total_lost INTEGER NOT NULL DEFAULT 0,
+    next_hit_at TIMESTAMP NOT NULL,
+    interaction_token TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
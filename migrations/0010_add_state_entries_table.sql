@@ -0,0 +1,8 @@
+-- Snapshot of persisted cooldowns/buffs (core.state), restored on startup
+CREATE TABLE IF NOT EXISTS state_entries (
+    namespace TEXT NOT NULL,
+    key JSONB NOT NULL,
+    started_at TIMESTAMP NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
@@ -0,0 +1,74 @@
+-- Partition attack_history by month (on "timestamp") and index it for
+-- per-target / per-attacker time range queries. Old partitions are dropped
+-- by the attack_history_retention job.
+
+CREATE OR REPLACE FUNCTION attack_history_ensure_partition(p_month DATE) RETURNS TEXT AS $$
+DECLARE
+    start_month DATE := date_trunc('month', p_month)::DATE;
+    partition_name TEXT := 'attack_history_' || to_char(start_month, 'YYYY_MM');
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF attack_history FOR VALUES FROM (%L) TO (%L)',
+        partition_name,
+        start_month,
+        (start_month + INTERVAL '1 month')::DATE
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    first_month DATE;
+    m DATE;
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'attack_history'::regclass
+    ) THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE attack_history RENAME TO attack_history_unpartitioned;
+    ALTER SEQUENCE IF EXISTS attack_history_id_seq RENAME TO attack_history_unpartitioned_id_seq;
+
+    CREATE TABLE attack_history (
+        id BIGSERIAL,
+        attacker_id BIGINT NOT NULL,
+        target_id BIGINT NOT NULL,
+        attack_type TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        success BOOLEAN NOT NULL,
+        points_gained INTEGER NOT NULL,
+        points_lost INTEGER NOT NULL,
+        timestamp TIMESTAMP NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp);
+
+    -- One partition per month from the oldest row up to two months ahead
+    SELECT date_trunc('month', COALESCE(MIN(timestamp), NOW()))::DATE
+    INTO first_month
+    FROM attack_history_unpartitioned;
+
+    FOR m IN
+        SELECT generate_series(first_month, date_trunc('month', NOW()) + INTERVAL '2 months', INTERVAL '1 month')::DATE
+    LOOP
+        PERFORM attack_history_ensure_partition(m);
+    END LOOP;
+
+    INSERT INTO attack_history (id, attacker_id, target_id, attack_type, amount, success, points_gained, points_lost, timestamp)
+    SELECT id, attacker_id, target_id, attack_type, amount, success, points_gained, points_lost, COALESCE(timestamp, NOW())
+    FROM attack_history_unpartitioned;
+
+    PERFORM setval(
+        pg_get_serial_sequence('attack_history', 'id'),
+        COALESCE((SELECT MAX(id) FROM attack_history), 0) + 1,
+        false
+    );
+
+    DROP TABLE attack_history_unpartitioned;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_attack_history_target_ts
+    ON attack_history (target_id, timestamp) INCLUDE (attacker_id, success, points_gained, points_lost);
+CREATE INDEX IF NOT EXISTS idx_attack_history_attacker_ts
+    ON attack_history (attacker_id, timestamp) INCLUDE (target_id, success, points_gained, points_lost);
@@ -0,0 +1,53 @@
+-- Append-only record of every change to users.points (core.economy.ledger)
+-- amount is the signed change; user_id 0 is the tax pool
+CREATE TABLE IF NOT EXISTS ledger (
+    id BIGSERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    kind TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    counterparty_id BIGINT,
+    ref_id BIGINT,
+    profit_column TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_ledger_user ON ledger (user_id, id);
+
+-- Balances and profit totals derived from the ledger: opening balances
+-- below plus every ledger row up to ledger_rollup.last_ledger_id
+CREATE TABLE IF NOT EXISTS ledger_balances (
+    user_id BIGINT PRIMARY KEY,
+    points BIGINT NOT NULL DEFAULT 0,
+    profit_attack BIGINT NOT NULL DEFAULT 0,
+    profit_defense BIGINT NOT NULL DEFAULT 0,
+    profit_prediction BIGINT NOT NULL DEFAULT 0,
+    profit_guildwar BIGINT NOT NULL DEFAULT 0,
+    profit_beg BIGINT NOT NULL DEFAULT 0,
+    profit_trap BIGINT NOT NULL DEFAULT 0,
+    profit_dodge BIGINT NOT NULL DEFAULT 0,
+    profit_pierce BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS ledger_rollup (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    last_ledger_id BIGINT NOT NULL DEFAULT 0,
+    rolled_up_at TIMESTAMP
+);
+
+INSERT INTO ledger_rollup (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+-- Opening balances: everything that happened before the ledger existed
+INSERT INTO ledger_balances (
+    user_id, points, profit_attack, profit_defense, profit_prediction, profit_guildwar,
+    profit_beg, profit_trap, profit_dodge, profit_pierce
+)
+SELECT user_id, COALESCE(points, 0), COALESCE(profit_attack, 0), COALESCE(profit_defense, 0),
+       COALESCE(profit_prediction, 0), COALESCE(profit_guildwar, 0), COALESCE(profit_beg, 0),
+       COALESCE(profit_trap, 0), COALESCE(profit_dodge, 0), COALESCE(profit_pierce, 0)
+FROM users
+ON CONFLICT (user_id) DO NOTHING;
+
+INSERT INTO ledger_balances (user_id, points)
+SELECT 0, COALESCE(CAST(value AS INTEGER), 0) FROM bot_settings WHERE key = 'tax_pool'
+ON CONFLICT (user_id) DO NOTHING;
@@ -0,0 +1,2 @@
+-- Leaderboard reads (core.leaderboard): top-N by points without sorting the table
+CREATE INDEX IF NOT EXISTS idx_users_points ON users (points DESC) WHERE points IS NOT NULL;
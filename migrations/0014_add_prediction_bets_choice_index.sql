@@ -0,0 +1,2 @@
+-- Per-choice pools and bettor counts (core.predictions): index-only SUM/COUNT per choice
+CREATE INDEX IF NOT EXISTS idx_prediction_bets_choice ON prediction_bets (prediction_id, choice_number) INCLUDE (amount);
@@ -0,0 +1,45 @@
+-- Prediction settlements (core.settlement): every result or cancel records
+-- exactly what it paid, so undoing it applies the stored inverse
+CREATE TABLE IF NOT EXISTS prediction_settlements (
+    id BIGSERIAL PRIMARY KEY,
+    prediction_id INTEGER NOT NULL REFERENCES predictions(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    winning_choice INTEGER,
+    total_pool BIGINT NOT NULL DEFAULT 0,
+    settled_by BIGINT,
+    settled_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    reversed_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_prediction_settlements_open
+    ON prediction_settlements (prediction_id) WHERE reversed_at IS NULL;
+
+CREATE TABLE IF NOT EXISTS prediction_payouts (
+    settlement_id BIGINT NOT NULL REFERENCES prediction_settlements(id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL,
+    amount INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    profit_column TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_prediction_payouts_settlement ON prediction_payouts (settlement_id);
+
+-- Predictions resolved before settlements existed: record the winner
+-- payouts the old /predresult made (90% of the pool share, rounded down)
+WITH legacy AS (
+    INSERT INTO prediction_settlements (prediction_id, kind, winning_choice, total_pool)
+    SELECT p.id, 'result', p.winning_choice,
+           (SELECT COALESCE(SUM(amount), 0) FROM prediction_bets WHERE prediction_id = p.id)
+    FROM predictions p
+    WHERE p.status = 'resolved'
+      AND NOT EXISTS (SELECT 1 FROM prediction_settlements s WHERE s.prediction_id = p.id)
+    RETURNING id, prediction_id, winning_choice, total_pool
+)
+INSERT INTO prediction_payouts (settlement_id, user_id, amount, role, profit_column)
+SELECT l.id, b.user_id, (b.amount * l.total_pool / w.pool) * 90 / 100, 'winner', 'profit_prediction'
+FROM legacy l
+JOIN prediction_bets b ON b.prediction_id = l.prediction_id AND b.choice_number = l.winning_choice
+CROSS JOIN LATERAL (
+    SELECT SUM(amount) AS pool FROM prediction_bets
+    WHERE prediction_id = l.prediction_id AND choice_number = l.winning_choice
+) w;
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from core.economy import Ledger, debit
+
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeConn:
+    async def fetchval(self, query, *args):
+        return 1000
+
+    def transaction(self):
+        return FakeTransaction()
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    fresh = Ledger()
+    monkeypatch.setattr("core.economy.ledger", fresh)
+    return fresh
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_rows_wait_for_the_transaction_to_commit(ledger):
+    moved = []
+    ledger.subscribe(lambda user_id, amount: moved.append((user_id, amount)))
+    conn = FakeConn()
+
+    async def buy():
+        async with ledger.transaction(conn):
+            await debit(conn, 1, 50, "buy_role")
+            assert moved == [] and ledger.buffer == []
+
+    run(buy())
+    assert moved == [(1, -50)]
+    assert len(ledger.buffer) == 1
+
+
+def test_rolled_back_transaction_records_nothing(ledger):
+    conn = FakeConn()
+
+    async def failing():
+        async with ledger.transaction(conn):
+            await debit(conn, 1, 50, "buy_role")
+            raise RuntimeError("insert failed")
+
+    with pytest.raises(RuntimeError):
+        run(failing())
+    assert ledger.buffer == []
+    assert ledger._pending == {}
+
+
+def test_nested_block_commits_with_the_outer_one(ledger):
+    conn = FakeConn()
+
+    async def nested():
+        async with ledger.transaction(conn):
+            async with ledger.transaction(conn):
+                await debit(conn, 1, 10, "inner")
+            assert ledger.buffer == []
+            try:
+                async with ledger.transaction(conn):
+                    await debit(conn, 2, 20, "rolled_back")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+    run(nested())
+    assert [row[:3] for row in ledger.buffer] == [(1, "inner", -10)]
+
+
+def test_without_a_transaction_rows_are_recorded_right_away(ledger):
+    run(debit(FakeConn(), 1, 50, "shield_cost"))
+    assert [row[:3] for row in ledger.buffer] == [(1, "shield_cost", -50)]
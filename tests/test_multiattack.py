@@ -0,0 +1,46 @@
+import datetime
+
+from core.attacks import AttackOutcome, AttackRejected
+from core.multiattack import RUN_FIELDS, MultiattackRun
+
+NOW = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
+
+def new_run(times=3, delay_seconds=30):
+    row = {field: 0 for field in RUN_FIELDS}
+    row.update(id=1, attacker_id=10, target_id=20, amount=100, times=times, delay_seconds=delay_seconds)
+    return MultiattackRun(row)
+
+
+def test_successful_hit_counts_net_gain():
+    run = new_run()
+    run.record(AttackOutcome("regular", True, 100).steal(100, 100, "profit_attack"), False, NOW)
+
+    assert (run.hits_done, run.successful, run.failed, run.skipped) == (1, 1, 0, 0)
+    assert run.total_gained == 95  # 5% tax
+    assert run.next_hit_at == NOW + datetime.timedelta(seconds=30)
+
+
+def test_failed_hit_counts_loss():
+    run = new_run()
+    run.record(AttackOutcome("regular", False, 100).lose(100, "profit_defense"), True, NOW)
+
+    assert (run.hits_done, run.successful, run.failed, run.countered) == (1, 0, 1, 1)
+    assert run.total_lost == 100
+
+
+def test_rejected_hit_is_skipped_but_still_counts():
+    run = new_run(times=1)
+    run.record(AttackRejected("target_points"), False, NOW)
+
+    assert (run.hits_done, run.skipped, run.total_gained, run.total_lost) == (1, 1, 0, 0)
+    assert run.finished
+
+
+def test_finished_after_all_hits():
+    run = new_run(times=2)
+    outcome = AttackOutcome("regular", False, 100).lose(100, "profit_defense")
+    run.record(outcome, False, NOW)
+    assert not run.finished
+    run.record(outcome, False, NOW)
+    assert run.finished
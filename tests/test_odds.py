@@ -0,0 +1,108 @@
+import asyncio
+import datetime
+
+from core.odds import OddsBook, returns, sparkline
+from core.predictions import new_snapshot
+
+ENDS_AT = datetime.datetime(2026, 1, 1, 12, 0, 0)
+CHOICES = [(1, "Yes"), (2, "No")]
+
+
+def snapshot(prediction_id=1, status="betting"):
+    pred = new_snapshot(prediction_id, "Title", 9, ENDS_AT, 100, 200, None, CHOICES)
+    pred.status = status
+    return pred
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def fetch(self, query, *args):
+        return self.rows
+
+
+def test_returns_apply_tax_and_skip_empty_choices():
+    assert returns({1: 100, 2: 300}, CHOICES) == {1: 4 * 0.90, 2: 400 / 300 * 0.90}
+    assert returns({1: 100}, CHOICES) == {1: 0.90, 2: None}
+
+
+def test_sparkline_scales_between_min_and_max():
+    assert sparkline([1, 2, 3]) == "▁▅█"
+    assert sparkline([None, 5, 5]) == " ▁▁"
+    assert sparkline([None]) == " "
+
+
+def test_apply_bet_updates_pools_and_history():
+    book = OddsBook(history_size=3)
+    book.put(snapshot())
+    book.apply_bet(1, 1, 100, True)
+    book.apply_bet(1, 1, 50, False)
+    book.apply_bet(1, 2, 25, True)
+
+    pred = book.get(1)
+    assert pred.pool_by_choice == {1: 150, 2: 25}
+    assert pred.bettors_by_choice == {1: 1, 2: 1}
+    assert pred.total_pool == 175
+    # Bounded: the empty first sample was pushed out
+    assert [pools for _, pools in book.line(1)] == [{1: 100}, {1: 150}, {1: 150, 2: 25}]
+    assert book.bets_applied == 3
+
+
+def test_bet_on_unknown_prediction_is_ignored():
+    book = OddsBook()
+    book.apply_bet(5, 1, 100, True)
+    assert book.get(5) is None
+    assert book.bets_applied == 0
+
+
+def test_status_changes_and_inactive_predictions():
+    book = OddsBook()
+    book.put(snapshot(1))
+    book.put(snapshot(2))
+    book.set_status(1, "locked")
+
+    assert [pred.id for pred in book.active("betting")] == [2]
+    assert [pred.id for pred in book.active()] == [1, 2]
+
+    book.set_status(2, "resolved")
+    book.put(snapshot(1, status="cancelled"))
+    assert book.active() == []
+    assert book.line(1) == []
+
+
+def test_history_disabled():
+    book = OddsBook(history_size=0)
+    book.put(snapshot())
+    book.apply_bet(1, 1, 100, True)
+    assert book.line(1) == []
+    assert book.get(1).total_pool == 100
+
+
+def test_rebuild_drops_history_of_inactive_predictions():
+    book = OddsBook()
+    book.put(snapshot(1))
+    book.put(snapshot(2))
+    book.apply_bet(1, 1, 100, True)
+
+    row = {
+        "id": 1,
+        "title": "Title",
+        "creator_id": 9,
+        "status": "locked",
+        "winning_choice": None,
+        "ends_at": ENDS_AT,
+        "message_id": 200,
+        "channel_id": 100,
+        "max_bet": None,
+        "choice_numbers": [1, 2],
+        "choice_texts": ["Yes", "No"],
+        "pools": [100, 0],
+        "bettors": [1, 0],
+    }
+    assert asyncio.run(book.rebuild(FakeConn([row]))) == 1
+    assert book.ready
+    assert book.get(2) is None and book.line(2) == []
+    # Kept its series, with the reloaded pools
+    assert len(book.line(1)) == 2
+    assert book.get(1).status == "locked"
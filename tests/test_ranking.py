@@ -0,0 +1,85 @@
+import asyncio
+
+from core.economy import TAX_POOL_ID
+from core.ranking import RankIndex
+
+
+class FakeConn:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def fetch(self, query, *args):
+        return self.rows
+
+
+def built(balances, excluded=()):
+    index = RankIndex()
+    index.set_excluded(excluded)
+    rows = [{"user_id": user_id, "points": points} for user_id, points in balances.items()]
+    asyncio.run(index.rebuild(FakeConn(rows)))
+    return index
+
+
+def test_rank_orders_by_points_then_user_id():
+    index = built({1: 100, 2: 300, 3: 100, 4: 200})
+
+    assert [index.rank(user_id) for user_id in (2, 4, 1, 3)] == [1, 2, 3, 4]
+    assert index.at(1) == (2, 300)
+    assert index.rank(99) is None
+
+
+def test_movement_reorders_and_ignores_tax_pool():
+    index = built({1: 100, 2: 300})
+    index.on_movement(1, 250)
+    index.on_movement(TAX_POOL_ID, 1000)
+
+    assert index.rank(1) == 1
+    assert index.at(1) == (1, 350)
+    assert TAX_POOL_ID not in index.points
+    assert index.movements == 1
+
+
+def test_movements_before_rebuild_are_ignored():
+    index = RankIndex()
+    index.on_movement(1, 50)
+    assert index.points == {}
+
+
+def test_new_user_enters_ranking_on_first_movement():
+    index = built({1: 100})
+    index.on_movement(2, 40)
+    assert index.rank(2) == 2
+
+
+def test_excluded_users_are_unranked_but_tracked():
+    index = built({1: 100, 2: 300, 3: 200}, excluded={2})
+
+    assert index.rank(2) is None
+    assert index.rank(3) == 1
+    index.on_movement(2, 50)
+    assert index.points[2] == 350
+
+    # Leaving the mod role puts them back at their current balance
+    index.set_excluded(set())
+    assert index.rank(2) == 1
+    index.set_excluded({3})
+    assert len(index) == 2
+
+
+def test_correct_counts_only_real_changes():
+    index = built({1: 100})
+    index.correct(1, 100)
+    index.correct(1, 120)
+    index.correct(1, None)
+    assert index.corrections == 1
+    assert index.points[1] == 120
+
+
+def test_page():
+    index = built({user_id: user_id * 10 for user_id in range(1, 26)})
+
+    first = index.page(1)
+    assert first[0] == (1, 25, 250)
+    assert len(first) == 10
+    assert index.page(3) == [(21 + i, 5 - i, (5 - i) * 10) for i in range(5)]
+    assert index.page(4) == []
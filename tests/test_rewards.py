@@ -0,0 +1,71 @@
+import datetime
+
+import pytest
+
+from core import rewards
+from core.rewards import ChatStateCache
+
+TODAY = datetime.date(2026, 1, 1)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rewards.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_get_returns_latest_put(clock):
+    cache = ChatStateCache(max_size=10, ttl=60)
+    cache.put(1, None, 5, TODAY)
+    cache.put(1, None, 8, TODAY)
+
+    entry = cache.get(1)
+    assert entry.daily_earned == 8
+    assert len(cache) == 1
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_entry_expires_ttl_after_last_write(clock):
+    cache = ChatStateCache(max_size=10, ttl=60)
+    cache.put(1, None, 5, TODAY)
+
+    clock[0] += 59
+    assert cache.get(1) is not None
+    clock[0] += 1
+    assert cache.get(1) is None
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+
+def test_full_cache_evicts_least_recently_written(clock):
+    cache = ChatStateCache(max_size=2, ttl=60)
+    cache.put(1, None, 1, TODAY)
+    cache.put(2, None, 2, TODAY)
+    # Rewriting 1 moves it behind 2
+    cache.put(1, None, 3, TODAY)
+    cache.put(3, None, 4, TODAY)
+
+    assert cache.get(2) is None
+    assert cache.get(1).daily_earned == 3
+    assert cache.get(3).daily_earned == 4
+    assert cache.evictions == 1
+
+
+def test_evict_expired_stops_at_first_live_entry(clock):
+    cache = ChatStateCache(max_size=10, ttl=60)
+    cache.put(1, None, 1, TODAY)
+    clock[0] += 30
+    cache.put(2, None, 2, TODAY)
+    clock[0] += 30
+
+    assert cache.evict_expired() == 1
+    assert cache.get(2) is not None
+
+
+def test_discard(clock):
+    cache = ChatStateCache(max_size=10, ttl=60)
+    cache.put(1, None, 1, TODAY)
+    cache.discard(1)
+    cache.discard(2)
+    assert cache.get(1) is None
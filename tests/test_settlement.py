@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from core import settlement
+from core.economy import ledger
+from core.settlement import Settlement, SettlementConflict, reverse_result, settle_cancel, settle_result
+
+
+def row(user_ids, amounts, roles, profit_columns, total_pool=0, winner_pool=0, tax=0):
+    return {
+        "id": 7,
+        "total_pool": total_pool,
+        "winner_pool": winner_pool,
+        "tax": tax,
+        "user_ids": user_ids,
+        "amounts": amounts,
+        "roles": roles,
+        "profit_columns": profit_columns,
+    }
+
+
+class FakeConn:
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    async def fetchrow(self, query, *args):
+        self.calls.append(args)
+        return self.result
+
+
+def test_amounts_sum_per_user_and_count_per_payout():
+    # One refund per bet: user 1 bet twice
+    cancel = Settlement(
+        3,
+        "prediction_refund",
+        row([1, 1, 2, 9], [100, 50, 70, 200], ["refund", "refund", "refund", "cost_refund"], [None] * 4),
+    )
+
+    assert cancel.amounts("refund") == {1: 150, 2: 70}
+    assert cancel.count("refund") == 3
+    assert cancel.amounts("cost_refund") == {9: 200}
+    assert cancel.amounts("winner") == {}
+
+
+def test_record_writes_one_ledger_row_per_payout(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(ledger, "record", lambda *args: recorded.append(args))
+    result = Settlement(
+        3,
+        "prediction_payout",
+        row([1, 9], [180, 10], ["winner", "creator"], ["profit_prediction", "profit_prediction"]),
+    )
+
+    result.record()
+    assert recorded == [
+        (1, "prediction_payout", 180, None, 3, "profit_prediction"),
+        (9, "prediction_payout", 10, None, 3, "profit_prediction"),
+    ]
+
+
+def test_settle_result_passes_percentages():
+    conn = FakeConn(row([1], [180], ["winner"], ["profit_prediction"], 200, 100, 20))
+    result = asyncio.run(settle_result(conn, 3, 2, settlement.CREATOR_TAX_PERCENT, 42))
+
+    assert conn.calls == [(3, 2, settlement.PAYOUT_PERCENT, settlement.CREATOR_TAX_PERCENT, 42)]
+    assert (result.total_pool, result.winner_pool, result.tax) == (200, 100, 20)
+    assert result.ledger_kind == "prediction_payout"
+
+
+@pytest.mark.parametrize(
+    "settle, args, reason",
+    [
+        (settle_result, (3, 2, 0, 42), "not betting or locked"),
+        (reverse_result, (3, 42), "not resolved"),
+        (settle_cancel, (3, 0, 42), "not betting or locked"),
+    ],
+)
+def test_status_guard_miss_raises_conflict(settle, args, reason):
+    with pytest.raises(SettlementConflict) as raised:
+        asyncio.run(settle(FakeConn(None), *args))
+    assert raised.value.prediction_id == 3
+    assert raised.value.reason == reason
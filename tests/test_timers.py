@@ -0,0 +1,79 @@
+import datetime
+
+from core.timers import Timer, TimerService
+
+T0 = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
+
+def wheel(slots=8, tick=1.0):
+    service = TimerService(tick=tick, slots=slots)
+    service._last_tick = service._tick_of(T0)
+    return service
+
+
+def place(service, seconds, payload, timer_id=None):
+    timer = Timer(timer_id, "test", service._tick_of(T0 + datetime.timedelta(seconds=seconds)), payload)
+    service._place(timer)
+    return timer
+
+
+def fired(service, seconds):
+    return [timer.payload for timer in service._advance(service._tick_of(T0) + seconds)]
+
+
+def test_tick_of_rounds_up_so_timers_never_fire_early():
+    service = TimerService(tick=1.0)
+    base = service._tick_of(T0)
+    assert service._tick_of(T0 + datetime.timedelta(milliseconds=1)) == base + 1
+    assert service._tick_of(T0 + datetime.timedelta(seconds=1)) == base + 1
+
+
+def test_timers_fire_on_their_tick():
+    service = wheel()
+    place(service, 2, "a")
+    place(service, 3, "b")
+
+    assert fired(service, 1) == []
+    assert fired(service, 2) == ["a"]
+    assert fired(service, 3) == ["b"]
+
+
+def test_timers_beyond_one_revolution_wait_for_their_round():
+    service = wheel(slots=8)
+    # Same slot as a timer 2 ticks out, one full revolution later
+    place(service, 10, "later")
+    place(service, 2, "soon")
+
+    assert fired(service, 2) == ["soon"]
+    assert fired(service, 9) == []
+    assert fired(service, 10) == ["later"]
+
+
+def test_catch_up_fires_everything_missed_after_lag():
+    service = wheel(slots=8)
+    for seconds in (1, 4, 7, 12):
+        place(service, seconds, seconds)
+
+    assert sorted(fired(service, 20)) == [1, 4, 7, 12]
+
+
+def test_overdue_timer_goes_into_the_next_tick():
+    service = wheel()
+    place(service, -30, "late")
+    assert fired(service, 1) == ["late"]
+
+
+def test_cancelled_timer_does_not_fire():
+    service = wheel()
+    timer = place(service, 2, "cancelled", timer_id=5)
+    assert service.timers == {5: timer}
+    timer.cancelled = True
+
+    assert fired(service, 3) == []
+
+
+def test_fired_stored_timers_leave_the_index():
+    service = wheel()
+    place(service, 1, "stored", timer_id=5)
+    fired(service, 1)
+    assert service.timers == {}
@@ -0,0 +1,113 @@
+import datetime
+
+from core.traps import TrapBook, TriggerAutomaton
+
+T0 = datetime.datetime(2026, 1, 1, 12, 0, 0)
+
+
+def automaton(*patterns):
+    a = TriggerAutomaton()
+    for pattern in patterns:
+        a.add(pattern)
+    return a
+
+
+def test_search_finds_overlapping_and_nested_patterns():
+    a = automaton("he", "she", "his", "hers")
+    assert a.search("ushers") == {"he", "she", "hers"}
+    assert a.search("nothing here") == {"he"}
+    assert a.search("xyz") == set()
+
+
+def test_search_after_add_rebuilds_links():
+    a = automaton("abc")
+    assert a.search("xabcx") == {"abc"}
+    a.add("bc")
+    assert a.search("xabcx") == {"abc", "bc"}
+
+
+def test_removed_pattern_stops_matching():
+    a = automaton("hello", "help")
+    a.remove("help")
+    assert a.search("help hello") == {"hello"}
+    assert len(a) == 1
+
+
+def test_dead_nodes_count_only_nodes_no_live_pattern_uses():
+    a = automaton("hello", "help", "hero")
+    a.remove("help")
+    # Only "p" is dead; "h", "e", "l" are still on the path of "hello"
+    assert a.dead_nodes == 1
+    a.remove("hello")
+    assert a.dead_nodes == 4
+    # Re-adding revives the nodes instead of growing the trie
+    nodes = len(a.goto)
+    a.add("hello")
+    assert a.dead_nodes == 1
+    assert len(a.goto) == nodes
+
+
+def test_compaction_keeps_live_patterns():
+    a = automaton("aaaa", "bbbb", "cccc")
+    a.remove("aaaa")
+    a.remove("bbbb")
+    # 8 of 13 nodes dead: compacted down to root + "cccc"
+    assert len(a.goto) == 5
+    assert a.dead_nodes == 0
+    assert a.search("xxccccxx") == {"cccc"}
+    assert a.search("aaaa bbbb") == set()
+
+
+def test_remove_unknown_pattern_is_a_no_op():
+    a = automaton("abc")
+    a.remove("abd")
+    assert a.search("abc") == {"abc"}
+    assert a.dead_nodes == 0
+
+
+def test_match_prefers_oldest_trap_and_skips_own():
+    book = TrapBook()
+    book.add(1, "Apple pie", creator_id=10, created_at=T0, cost=40)
+    book.add(1, "pie", creator_id=11, created_at=T0, cost=50)
+
+    assert book.match(1, "I love APPLE PIE", author_id=99) == ("Apple pie", 10, 40)
+    assert book.match(1, "I love apple pie", author_id=10) == ("pie", 11, 50)
+    assert book.match(1, "nothing", author_id=99) is None
+    assert book.match(2, "apple pie", author_id=99) is None
+
+
+def test_lookups_and_remove():
+    book = TrapBook()
+    book.add(1, "Secret", creator_id=10, created_at=T0, cost=40)
+
+    assert book.has_trigger(1, "secret")
+    assert book.get(1, "Secret") == (10, T0, 40)
+    assert book.get(1, "secret") is None
+    assert book.count(1) == 1
+
+    book.remove(1, "Secret")
+    assert book.count(1) == 0
+    assert 1 not in book.channels
+    assert book.match(1, "secret", author_id=99) is None
+
+
+def test_expire_removes_only_traps_past_their_deadline():
+    book = TrapBook(duration=900)
+    book.add(1, "early", creator_id=10, created_at=T0, cost=40)
+    book.add(1, "later", creator_id=10, created_at=T0 + datetime.timedelta(minutes=10), cost=40)
+
+    assert book.expire(T0 + datetime.timedelta(minutes=15)) == 0
+    assert book.expire(T0 + datetime.timedelta(minutes=16)) == 1
+    assert not book.has_trigger(1, "early")
+    assert book.has_trigger(1, "later")
+
+
+def test_expire_skips_heap_entries_of_replaced_traps():
+    book = TrapBook(duration=900)
+    book.add(1, "trap", creator_id=10, created_at=T0, cost=40)
+    book.remove(1, "trap")
+    book.add(1, "trap", creator_id=11, created_at=T0 + datetime.timedelta(minutes=10), cost=40)
+
+    # The first entry's deadline passed, but it belongs to the removed trap
+    assert book.expire(T0 + datetime.timedelta(minutes=16)) == 0
+    assert book.get(1, "trap")[0] == 11